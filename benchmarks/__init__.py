@@ -0,0 +1,12 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Benchmarks for `wdiffhtml`.
+
+Run them from the source directory, e.g. ``python -m benchmarks.backends``.
+
+The complete suite (see :mod:`benchmarks.suite`) runs with
+``python -m benchmarks run`` and ``python -m benchmarks compare`` checks two
+of its runs for regressions.
+
+"""
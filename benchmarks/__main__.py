@@ -0,0 +1,102 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Command line interface for the benchmark suite.
+
+Run the suite and store the results::
+
+  python -m benchmarks run --sizes 1K 100K 1M --output results.json
+
+Compare two runs (exits with `1` on regressions)::
+
+  python -m benchmarks compare old.json new.json --threshold 0.1
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import shutil
+import sys
+import tempfile
+
+from argparse import ArgumentParser
+
+from .corpora import (
+  KINDS,
+  parse_size,
+)
+from .suite import (
+  compare,
+  load,
+  run_suite,
+  save,
+)
+
+
+def main(argv=None):
+  ap = ArgumentParser(prog='benchmarks')
+  commands = ap.add_subparsers(dest='command')
+  ap_run = commands.add_parser('run', help="run the benchmarks")
+  ap_run.add_argument(
+    '--kinds', nargs='+', choices=KINDS, default=KINDS,
+    help="corpora to use (default: all)"
+  )
+  ap_run.add_argument(
+    '--sizes', nargs='+', default=['1K', '100K', '1M'],
+    help="corpus sizes, up to `100M` (default: 1K 100K 1M)"
+  )
+  ap_run.add_argument(
+    '--backends', nargs='+',
+    help="diff backends (default: all available)"
+  )
+  ap_run.add_argument('--repeat', type=int, default=3)
+  ap_run.add_argument(
+    '--no-cli', action='store_true',
+    help="skip the full CLI runs"
+  )
+  ap_run.add_argument(
+    '--corpus-dir', metavar='DIR',
+    help="keep the generated corpora here (default: a temporary directory)"
+  )
+  ap_run.add_argument(
+    '-o', '--output', default='-', metavar='FILE',
+    help="write the JSON results here (default: STDOUT)"
+  )
+  ap_compare = commands.add_parser('compare', help="compare two runs")
+  ap_compare.add_argument('old')
+  ap_compare.add_argument('new')
+  ap_compare.add_argument(
+    '--threshold', type=float, default=0.1,
+    help="allowed slowdown as a fraction (default: %(default)s)"
+  )
+  args = ap.parse_args(argv)
+  if args.command == 'run':
+    directory = args.corpus_dir or tempfile.mkdtemp()
+    try:
+      results = run_suite(
+        directory, args.kinds, [parse_size(size) for size in args.sizes],
+        args.backends, args.repeat, not args.no_cli
+      )
+    finally:
+      if not args.corpus_dir:
+        shutil.rmtree(directory)
+    save(results, args.output)
+    return 0
+  if args.command == 'compare':
+    rows, regressions = compare(load(args.old), load(args.new), args.threshold)
+    for key, before, after, ratio in rows:
+      mark = ' !' if (key, before, after, ratio) in regressions else ''
+      print(
+        "{:<16} {:>10} {:<16} {:<7} {:>10.4f}s {:>10.4f}s {:>6.2f}x{}".format(
+          key[0], key[1], key[2], key[3] or '-', before, after, ratio, mark
+        )
+      )
+    return 1 if regressions else 0
+  ap.print_help()
+  return 1
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,97 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Compares the per-pair latency of the `wdiff` and the `python` backend.
+
+Usage: ``python -m benchmarks.backends [--repeat N] [--words N ...]``
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+from argparse import ArgumentParser
+from os import path
+
+from wdiffhtml.exceptions import WdiffNotFoundError
+from wdiffhtml.settings import BACKENDS
+from wdiffhtml.utils import (
+  check_for_wdiff,
+  generate_wdiff,
+)
+
+
+VOCABULARY = (
+  'lorem ipsum dolor sit amet consectetur adipisicing elit veniam soluta '
+  'impedit dolores quae doloribus nesciunt sequi accusamus eos incidunt'
+).split()
+
+
+def make_pair(directory, words, changes=0.05, seed=0):
+  """
+  Writes two files with *words* words (a fraction of *changes* modified)
+  into *directory* and returns their paths.
+
+  """
+  rnd = random.Random(seed)
+  org = [rnd.choice(VOCABULARY) for _ in range(words)]
+  new = list(org)
+  for _ in range(int(words * changes)):
+    new[rnd.randrange(words)] = rnd.choice(VOCABULARY).upper()
+  paths = []
+  for name, text in (('org.txt', org), ('new.txt', new)):
+    lines = [' '.join(text[i:i + 12]) for i in range(0, len(text), 12)]
+    filepath = path.join(directory, name)
+    with open(filepath, 'w') as fh:
+      fh.write('\n'.join(lines))
+    paths.append(filepath)
+  return paths
+
+
+def available_backends():
+  """
+  Returns the backends usable on this system.
+
+  """
+  try:
+    check_for_wdiff()
+  except WdiffNotFoundError:
+    return [backend for backend in BACKENDS if backend != 'wdiff']
+  return list(BACKENDS)
+
+
+def main(argv=None):
+  ap = ArgumentParser(description="per pair latency of the diff backends")
+  ap.add_argument('--repeat', type=int, default=20)
+  ap.add_argument(
+    '--words', type=int, nargs='+', default=[100, 1000, 10000]
+  )
+  args = ap.parse_args(argv)
+  backends = available_backends()
+  print("{:>8} {:>8} {:>12}".format('words', 'backend', 'ms / pair'))
+  directory = tempfile.mkdtemp()
+  try:
+    for words in args.words:
+      org_file, new_file = make_pair(directory, words)
+      for backend in backends:
+        timer = timeit.Timer(
+          lambda: generate_wdiff(org_file, new_file, backend=backend)
+        )
+        best = min(timer.repeat(repeat=3, number=args.repeat))
+        print("{:>8} {:>8} {:>12.3f}".format(
+          words, backend, best / args.repeat * 1000
+        ))
+  finally:
+    shutil.rmtree(directory)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
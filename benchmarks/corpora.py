@@ -0,0 +1,134 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Synthetic, reproducible corpora for the benchmarks.
+
+Each corpus is a pair of documents (original and changed version) of a
+given *kind* and approximate size:
+
+`small_edits`
+  Paragraphs of a few lines, about 1% of the sentences changed.
+
+`heavy_rewrite`
+  Same structure, about half of the sentences changed.
+
+`long_lines`
+  A single line without any line breaks, about 1% of the sentences changed.
+
+`many_paragraphs`
+  One short sentence per paragraph, about 1% of the sentences changed.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import random
+
+
+__all__ = [
+  'KINDS',
+  'parse_size',
+  'generate',
+  'write_corpus',
+]
+
+
+KINDS = [
+  'small_edits',
+  'heavy_rewrite',
+  'long_lines',
+  'many_paragraphs',
+]
+
+VOCABULARY = (
+  'lorem ipsum dolor sit amet consectetur adipisicing elit veniam soluta '
+  'impedit dolores quae doloribus nesciunt sequi accusamus eos incidunt '
+  'ducimus aspernatur nulla ipsam odio vitae quas libero inventore '
+  'doloremque explicabo änderung größe übermäßig'
+).split()
+
+UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+  """
+  Returns the number of bytes for a size like `1K`, `10M` or `512`.
+
+  """
+  text = text.strip().upper().rstrip('B')
+  unit = text[-1:] if text[-1:] in UNITS else ''
+  return int(float(text[:len(text) - len(unit)]) * UNITS[unit])
+
+
+def _sentences(rnd, count):
+  """
+  Returns *count* random sentences.
+
+  """
+  sentences = []
+  for _ in range(count):
+    words = [rnd.choice(VOCABULARY) for _ in range(rnd.randint(4, 14))]
+    sentences.append(' '.join(words).capitalize() + '.')
+  return sentences
+
+
+def generate(kind, size, seed=0):
+  """
+  Returns the original and the changed document (as bytes) of a corpus of
+  *kind* with about *size* bytes.
+
+  """
+  rnd = random.Random(seed)
+  pool = _sentences(rnd, 2000)
+  changes = _sentences(rnd, 2000)
+  ratio = 0.5 if kind == 'heavy_rewrite' else 0.01
+  org = []
+  new = []
+  total = 0
+  while total < size:
+    sentence = rnd.choice(pool)
+    org.append(sentence)
+    new.append(rnd.choice(changes) if rnd.random() < ratio else sentence)
+    total += len(sentence.encode('utf-8')) + 1
+  return _layout(kind, org, seed), _layout(kind, new, seed)
+
+
+def _layout(kind, sentences, seed):
+  """
+  Returns the *sentences* joined to a document of *kind*.
+
+  The same *seed* results in the same line and paragraph breaks.
+
+  """
+  if kind == 'long_lines':
+    return ' '.join(sentences).encode('utf-8')
+  if kind == 'many_paragraphs':
+    return '\n\n'.join(sentences).encode('utf-8')
+  rnd = random.Random(seed)
+  parts = []
+  for index, sentence in enumerate(sentences):
+    if index:
+      roll = rnd.random()
+      parts.append('\n\n' if roll < 0.1 else '\n' if roll < 0.4 else ' ')
+    parts.append(sentence)
+  parts.append('\n')
+  return ''.join(parts).encode('utf-8')
+
+
+def write_corpus(directory, kind, size, seed=0):
+  """
+  Writes the corpus of *kind* and *size* to *directory* (if it doesn't
+  exist there yet) and returns the paths of both files.
+
+  """
+  paths = [
+    os.path.join(directory, '{}-{}-{}-{}.txt'.format(kind, size, seed, name))
+    for name in ('org', 'new')
+  ]
+  if not all(os.path.exists(path) for path in paths):
+    for path, data in zip(paths, generate(kind, size, seed)):
+      with open(path, 'wb') as fh:
+        fh.write(data)
+  return paths
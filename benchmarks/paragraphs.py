@@ -0,0 +1,92 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Compares the single pass paragraph wrapper with the former split based one
+(throughput and peak memory) on multi-megabyte documents.
+
+Usage: ``python -m benchmarks.paragraphs [--sizes SIZE ...] [--hard-breaks]``
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import sys
+import time
+import tracemalloc
+
+from argparse import ArgumentParser
+
+from wdiffhtml.utils import (
+  build_paragraph,
+  wrap_paragraphs,
+)
+
+from .corpora import (
+  KINDS,
+  generate,
+  parse_size,
+)
+
+
+def split_paragraphs(content, hard_breaks=False):
+  """
+  The former implementation: split on empty lines, then on line breaks.
+
+  """
+  paras = [para.strip() for para in content.split('\n\n')]
+  return '\n'.join(
+    build_paragraph(para, hard_breaks) for para in paras if para
+  )
+
+
+def measure(func, text, hard_breaks, repeat):
+  """
+  Returns the best duration of *repeat* calls of *func* and the peak of
+  traced memory allocations (in bytes) of one more call.
+
+  """
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func(text, hard_breaks)
+    best = min(best, time.perf_counter() - start)
+  tracemalloc.start()
+  try:
+    func(text, hard_breaks)
+    _, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return best, peak
+
+
+def main(argv=None):
+  ap = ArgumentParser(description="throughput of the paragraph wrapper")
+  ap.add_argument('--sizes', nargs='+', default=['1M', '8M', '32M'])
+  ap.add_argument('--kinds', nargs='+', choices=KINDS, default=KINDS)
+  ap.add_argument('--hard-breaks', action='store_true')
+  ap.add_argument('--repeat', type=int, default=3)
+  args = ap.parse_args(argv)
+  impls = (('split', split_paragraphs), ('scan', wrap_paragraphs))
+  print("{:<16} {:>10} {:<6} {:>10} {:>12}".format(
+    'corpus', 'size', 'impl', 'MB / s', 'peak KiB'
+  ))
+  for kind in args.kinds:
+    for size in args.sizes:
+      text = generate(kind, parse_size(size))[0].decode('utf-8')
+      results = []
+      for name, func in impls:
+        best, peak = measure(func, text, args.hard_breaks, args.repeat)
+        results.append(func(text, args.hard_breaks))
+        print("{:<16} {:>10} {:<6} {:>10.1f} {:>12}".format(
+          kind, size, name, len(text) / best / 1e6, peak // 1024
+        ))
+      if results[0] != results[1]:
+        print("output differs for {} {}".format(kind, size), file=sys.stderr)
+        return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,95 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Measures the cold start latency of the command line interface.
+
+Reports the cumulative import time of the heaviest modules (as measured by
+``python -X importtime``) and the wall time of complete ``wdiffhtml a b``
+runs (with and without ``--wrap-with-html``).
+
+Usage: ``python -m benchmarks.startup [--repeat N] [--top N]``
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import shutil
+import subprocess as sub
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+
+from .backends import make_pair
+
+
+PREFIX = 'import time:'
+
+
+def import_times(module):
+  """
+  Returns a list of `(cumulative µs, module)` tuples for importing *module*
+  in a fresh interpreter (slowest first).
+
+  """
+  cmd = [sys.executable, '-X', 'importtime', '-c', 'import ' + module]
+  proc = sub.Popen(cmd, stderr=sub.PIPE)
+  _, output = proc.communicate()
+  times = []
+  for line in output.decode('utf-8').splitlines():
+    if not line.startswith(PREFIX):
+      continue
+    _, cumulative, name = line[len(PREFIX):].split('|')
+    if cumulative.strip().isdigit():
+      times.append((int(cumulative), name.strip()))
+  return sorted(times, reverse=True)
+
+
+def run_times(args, repeat):
+  """
+  Returns the best wall time (in seconds) of *repeat* runs of the CLI with
+  *args*.
+
+  """
+  cmd = [sys.executable, '-m', 'wdiffhtml'] + args
+  best = None
+  for _ in range(repeat):
+    start = time.time()
+    sub.check_call(cmd, stdout=sub.PIPE)
+    duration = time.time() - start
+    best = duration if best is None else min(best, duration)
+  return best
+
+
+def main(argv=None):
+  ap = ArgumentParser(description="cold start latency of the CLI")
+  ap.add_argument('--repeat', type=int, default=10)
+  ap.add_argument('--top', type=int, default=10)
+  args = ap.parse_args(argv)
+  times = import_times('wdiffhtml.cli')
+  print("slowest imports of `wdiffhtml.cli` (cumulative):")
+  for cumulative, name in times[:args.top]:
+    print("  {:>8.1f} ms  {}".format(cumulative / 1000.0, name))
+  for name in ('jinja2', 'pkg_resources'):
+    loaded = any(module == name for _, module in times)
+    print("  {} imported: {}".format(name, 'yes' if loaded else 'no'))
+  directory = tempfile.mkdtemp()
+  try:
+    org_file, new_file = make_pair(directory, 100)
+    print("best of {} CLI runs:".format(args.repeat))
+    for extra in ([], ['--wrap-with-html']):
+      cmdline = ['--backend', 'python'] + extra + [org_file, new_file]
+      duration = run_times(cmdline, args.repeat)
+      print("  {:>8.1f} ms  wdiffhtml {} a b".format(
+        duration * 1000, ' '.join(cmdline[:-2])
+      ))
+  finally:
+    shutil.rmtree(directory)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
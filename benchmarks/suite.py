@@ -0,0 +1,243 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Times each stage of the diff and render pipeline on synthetic corpora.
+
+Stages:
+
+`resolve`
+  Looking up the `wdiff` command (:func:`utils.find_wdiff`, not memoized).
+
+`diff`
+  Running the diff (per backend), up to the raw output bytes.
+
+`decode`
+  Decoding the raw output to text.
+
+`wrap_paragraphs`
+  Wrapping the paragraphs with `<p>` tags.
+
+`wrap_content`
+  Wrapping the diff in the HTML document.
+
+`cli`
+  A complete ``wdiffhtml --wrap-with-html`` run in a new process.
+
+Each result records the best and mean duration of some runs and the peak
+memory: traced Python allocations (:mod:`tracemalloc`) for the in-process
+stages and the maximum resident set size for the CLI.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+import os
+import platform
+import subprocess as sub
+import sys
+import time
+import tracemalloc
+
+from wdiffhtml import __version__ as version
+from wdiffhtml.exceptions import WdiffNotFoundError
+from wdiffhtml.settings import (
+  BACKENDS,
+  Settings,
+)
+from wdiffhtml.utils import (
+  _iter_diff_bytes,
+  clear_wdiff_cache,
+  find_wdiff,
+  wrap_paragraphs,
+  wrap_content,
+)
+
+from .corpora import write_corpus
+
+
+__all__ = [
+  'run_suite',
+  'compare',
+]
+
+
+def measure(func, repeat):
+  """
+  Returns the best and mean duration of *repeat* calls of *func* and the
+  peak of traced memory allocations (in bytes) of one more call.
+
+  """
+  durations = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    durations.append(time.perf_counter() - start)
+  tracemalloc.start()
+  try:
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return min(durations), sum(durations) / len(durations), peak
+
+
+def measure_cli(args, repeat):
+  """
+  Returns the best and mean duration of *repeat* CLI runs with *args* and
+  the maximum resident set size (in bytes) of those processes.
+
+  """
+  cmd = [sys.executable, '-m', 'wdiffhtml'] + args
+  durations = []
+  peak = 0
+  with open(os.devnull, 'wb') as devnull:
+    for _ in range(repeat):
+      start = time.perf_counter()
+      proc = sub.Popen(cmd, stdout=devnull)
+      _, status, usage = os.wait4(proc.pid, 0)
+      durations.append(time.perf_counter() - start)
+      proc.returncode = os.waitstatus_to_exitcode(status)
+      if proc.returncode:
+        raise sub.CalledProcessError(proc.returncode, cmd)
+      # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+      factor = 1 if sys.platform == 'darwin' else 1024
+      peak = max(peak, usage.ru_maxrss * factor)
+  return min(durations), sum(durations) / len(durations), peak
+
+
+def available_backends():
+  """
+  Returns the backends usable on this system.
+
+  """
+  try:
+    find_wdiff()
+  except WdiffNotFoundError:
+    return [backend for backend in BACKENDS if backend != 'wdiff']
+  return list(BACKENDS)
+
+
+def run_suite(directory, kinds, sizes, backends=None, repeat=3, cli=True):
+  """
+  Runs the benchmarks for all corpora of *kinds* and *sizes* (stored in
+  *directory*) and returns the results as a dictionary.
+
+  """
+  backends = backends or available_backends()
+  results = []
+
+  def record(kind, size, stage, backend, timing):
+    best, mean, peak = timing
+    results.append({
+      'corpus': kind,
+      'size': size,
+      'stage': stage,
+      'backend': backend,
+      'best': best,
+      'mean': mean,
+      'peak_memory': peak,
+    })
+    print(
+      "{:<16} {:>10} {:<16} {:<7} {:>10.4f}s {:>12} B".format(
+        kind, size, stage, backend or '-', best, peak
+      ),
+      file=sys.stderr
+    )
+
+  if 'wdiff' in backends:
+    def resolve():
+      clear_wdiff_cache()
+      find_wdiff()
+    record('-', 0, 'resolve', 'wdiff', measure(resolve, repeat))
+  for kind in kinds:
+    for size in sizes:
+      org_file, new_file = write_corpus(directory, kind, size)
+      raw = None
+      for backend in backends:
+        def diff():
+          return b''.join(_iter_diff_bytes(
+            org_file, new_file, False, True, backend, None
+          ))
+        raw = diff()
+        record(kind, size, 'diff', backend, measure(diff, repeat))
+        if cli:
+          args = [
+            '--backend', backend, '--wrap-with-html', org_file, new_file
+          ]
+          record(kind, size, 'cli', backend, measure_cli(args, repeat))
+      text = raw.decode('utf-8')
+      settings = Settings(org_file, new_file)
+      stages = (
+        ('decode', lambda: raw.decode('utf-8')),
+        ('wrap_paragraphs', lambda: wrap_paragraphs(text)),
+        ('wrap_content', lambda: wrap_content(text, settings)),
+      )
+      for stage, func in stages:
+        record(kind, size, stage, None, measure(func, repeat))
+  return {
+    'meta': {
+      'version': version,
+      'python': platform.python_version(),
+      'platform': platform.platform(),
+      'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+      'repeat': repeat,
+    },
+    'results': results,
+  }
+
+
+def _key(result):
+  return (
+    result['corpus'], result['size'], result['stage'], result['backend']
+  )
+
+
+def compare(old, new, threshold=0.1):
+  """
+  Compares the results *old* and *new* (as returned by :func:`run_suite`).
+
+  Returns a list of `(key, old best, new best, ratio)` tuples for all
+  entries in both and a list of those which got slower by more than
+  *threshold* (a fraction).
+
+  """
+  old_results = dict((_key(result), result) for result in old['results'])
+  rows = []
+  regressions = []
+  for result in new['results']:
+    key = _key(result)
+    if key not in old_results:
+      continue
+    before = old_results[key]['best']
+    after = result['best']
+    ratio = after / before if before else float('inf')
+    row = (key, before, after, ratio)
+    rows.append(row)
+    if ratio > 1 + threshold:
+      regressions.append(row)
+  return rows, regressions
+
+
+def save(results, filename):
+  """
+  Writes *results* as JSON to *filename* (`-` for STDOUT).
+
+  """
+  if filename == '-':
+    json.dump(results, sys.stdout, indent=2)
+    print()
+  else:
+    with open(filename, 'w') as fh:
+      json.dump(results, fh, indent=2)
+
+
+def load(filename):
+  """
+  Returns results read from the JSON file *filename*.
+
+  """
+  with open(filename) as fh:
+    return json.load(fh)
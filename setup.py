@@ -61,6 +61,7 @@ INSTALL_REQUIRES = [
 
 PY2_REQUIRES = [
   'pathlib',
+  'futures',
 ]
 
 EXTRAS_REQUIRE = {
@@ -86,6 +87,7 @@ setup(
   package_data={
     'wdiffhtml': [
       'data/template.jinja',
+      'data/index.jinja',
       'data/styles.css',
       'data/main.js',
       'data/secondary.js',
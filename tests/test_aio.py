@@ -0,0 +1,141 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import asyncio
+import os
+import time
+import subprocess as sub
+import threading
+
+from unittest import TestCase
+
+from testfixtures import (
+  TempDirectory,
+  Replace,
+)
+
+from wdiffhtml.aio import (
+  set_concurrency,
+  get_concurrency,
+  agenerate_wdiff,
+  awdiff,
+)
+from wdiffhtml.cache import DiffCache
+from wdiffhtml.settings import Settings
+from wdiffhtml.utils import (
+  clear_wdiff_cache,
+  diff_texts,
+)
+
+
+# prints the contents of both input files (the last two arguments)
+FAKE_WDIFF = b"""#!/bin/sh
+shift $(($# - 2))
+sleep 0.2
+cat "$1" "$2"
+"""
+
+
+def run(coro):
+  loop = asyncio.new_event_loop()
+  try:
+    return loop.run_until_complete(coro)
+  finally:
+    loop.close()
+
+
+class TestAsyncWdiff(TestCase):
+
+  PAIRS = [
+    (b'Just a test.', b'Just another test.'),
+    (b'A test sentence\nwith lines.', b'A sentence\nwith more lines.'),
+    (b'Same.', b'Same.'),
+  ]
+
+  def setUp(self):
+    self.limit = get_concurrency()
+
+  def tearDown(self):
+    set_concurrency(self.limit)
+    clear_wdiff_cache()
+
+  def test_python(self):
+    async def diffs():
+      return await asyncio.gather(*[
+        agenerate_wdiff(org, new, backend='python')
+        for org, new in self.PAIRS
+      ])
+    exp = [diff_texts(org, new, backend='python') for org, new in self.PAIRS]
+    self.assertEqual(run(diffs()), exp)
+
+  def test_wdiff(self):
+    with TempDirectory() as tempd:
+      cmd = tempd.write('wdiff', FAKE_WDIFF)
+      os.chmod(cmd, 0o755)
+      org_file = tempd.write('org', b'org\n')
+      res = run(agenerate_wdiff(org_file, b'new\n', wdiff_cmd=cmd))
+      self.assertEqual(res, 'org\nnew\n')
+
+  def test_failed_wdiff(self):
+    with TempDirectory() as tempd:
+      cmd = tempd.write('wdiff', b'#!/bin/sh\nexit 2\n')
+      os.chmod(cmd, 0o755)
+      cache = DiffCache(tempd.getpath('cache'))
+      with self.assertRaises(sub.CalledProcessError):
+        run(agenerate_wdiff(b'a', b'b', wdiff_cmd=cmd, cache=cache))
+      self.assertEqual(cache.stats()['entries'], 0)
+
+  def test_limit(self):
+    with TempDirectory() as tempd:
+      cmd = tempd.write('wdiff', FAKE_WDIFF)
+      os.chmod(cmd, 0o755)
+
+      async def diffs():
+        return await asyncio.gather(*[
+          agenerate_wdiff(b'a', b'b', wdiff_cmd=cmd) for _ in range(3)
+        ])
+      set_concurrency(1)
+      start = time.time()
+      self.assertEqual(run(diffs()), ['ab'] * 3)
+      self.assertGreaterEqual(time.time() - start, 0.6)
+
+  def test_invalid_limit(self):
+    with self.assertRaises(ValueError):
+      set_concurrency(0)
+
+  def test_cache(self):
+    with TempDirectory() as tempd:
+      cache = DiffCache(tempd.path)
+      org, new = self.PAIRS[0]
+      for _ in range(2):
+        res = run(agenerate_wdiff(org, new, backend='python', cache=cache))
+        self.assertEqual(res, diff_texts(org, new, backend='python'))
+      self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+  def test_awdiff(self):
+    with TempDirectory() as tempd:
+      org_file = tempd.write('org.txt', b'Just a test.')
+      new_file = tempd.write('new.txt', b'Just another test.')
+      settings = Settings(org_file, new_file)
+      res = run(awdiff(settings, wrap_with_html=True, backend='python'))
+      self.assertIn('<del>a</del> <ins>another</ins>', res)
+      self.assertIn('<html', res)
+
+  def test_awdiff_executor(self):
+    threads = []
+
+    def wrap_content(diff, settings, hard_breaks):
+      threads.append(threading.current_thread())
+      return diff
+    with TempDirectory() as tempd:
+      settings = Settings(
+        tempd.write('org.txt', b'Just a test.'),
+        tempd.write('new.txt', b'Just another test.'),
+      )
+      with Replace('wdiffhtml.aio.wrap_content', wrap_content):
+        run(awdiff(settings, wrap_with_html=True, backend='python'))
+    self.assertEqual(len(threads), 1)
+    self.assertIsNot(threads[0], threading.current_thread())
@@ -0,0 +1,128 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import re
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml.assets import (
+  minify_css,
+  minify_js,
+  load_assets,
+  hashed_name,
+  write_assets,
+  asset_urls,
+)
+from wdiffhtml.batch import (
+  Job,
+  run_batch,
+)
+from wdiffhtml.settings import Settings
+from wdiffhtml.utils import wrap_content
+
+
+CONTEXT = {
+  'css': '/* main */\nbody {\n  color: red;\n}\n\na > b, i { margin: 0 }\n',
+  'js': '// setup\nvar a = 1;\n\n  a += 1;\n',
+  'js2': 'var b;',
+}
+
+
+class TestMinify(TestCase):
+
+  def test_css(self):
+    self.assertEqual(
+      minify_css(CONTEXT['css']), 'body{color: red}a>b,i{margin: 0}'
+    )
+
+  def test_js(self):
+    self.assertEqual(minify_js(CONTEXT['js']), 'var a = 1;\na += 1;')
+
+  def test_js_literals(self):
+    text = (
+      'var a = `\n  // kept\n\n  ${b({c: "`"})}  \n  d`;\n'
+      '  var e = "\\\n  // kept";\n'
+      '  /* `\n  // comment */\n'
+      '  f(`${`nested\n  `}`);\n'
+    )
+    self.assertEqual(minify_js(text), (
+      'var a = `\n  // kept\n\n  ${b({c: "`"})}  \n  d`;\n'
+      'var e = "\\\n  // kept";\n'
+      '/* `\n  // comment */\n'
+      'f(`${`nested\n  `}`);'
+    ))
+
+  def test_load(self):
+    assets = load_assets(CONTEXT, minify=True)
+    self.assertEqual(list(assets), ['css', 'js2', 'js'])
+    self.assertEqual(assets['js2'], 'var b;')
+
+
+class TestAssets(TestCase):
+
+  def test_hashed_name(self):
+    name = hashed_name('styles.css', b'body {}')
+    self.assertTrue(re.match(r'^styles\.[0-9a-f]{12}\.css$', name))
+    self.assertEqual(name, hashed_name('styles.css', b'body {}'))
+    self.assertNotEqual(name, hashed_name('styles.css', b'body{}'))
+
+  def test_write(self):
+    with TempDirectory() as tempd:
+      directory = tempd.getpath('static')
+      paths = write_assets(directory, CONTEXT)
+      self.assertEqual(set(paths), set(['css', 'js', 'js2']))
+      with open(paths['js2']) as fh:
+        self.assertEqual(fh.read(), 'var b;')
+      mtime = os.stat(paths['css']).st_mtime
+      self.assertEqual(write_assets(directory, CONTEXT), paths)
+      self.assertEqual(os.stat(paths['css']).st_mtime, mtime)
+      self.assertNotEqual(
+        write_assets(directory, CONTEXT, minify=True)['css'], paths['css']
+      )
+
+  def test_urls(self):
+    with TempDirectory() as tempd:
+      paths = write_assets(tempd.getpath('static'), CONTEXT)
+      name = os.path.basename(paths['css'])
+      urls = asset_urls(paths, tempd.getpath('docs/a/diff.html'))
+      self.assertEqual(urls['css_url'], '../../static/' + name)
+      urls = asset_urls(paths, base_url='/static/')
+      self.assertEqual(urls['css_url'], '/static/' + name)
+
+  def test_template(self):
+    settings = Settings('a', 'b', css_url='s.css', js_url='m.js', **CONTEXT)
+    html = wrap_content('', settings)
+    self.assertIn('<link rel="stylesheet" href="s.css">', html)
+    self.assertIn('<script src="m.js"></script>', html)
+    self.assertIn('<script>var b;</script>', html)
+    self.assertNotIn('color', html)
+
+  def test_batch(self):
+    with TempDirectory() as tempd:
+      paths = write_assets(tempd.getpath('static'), CONTEXT)
+      org = tempd.write('org', b'Just a test.')
+      new = tempd.write('new', b'Just another test.')
+      jobs = [
+        Job(org, new, tempd.getpath('out1')),
+        Job(org, new, tempd.getpath('sub/out2')),
+      ]
+      tempd.makedir('sub')
+      for result in run_batch(
+        jobs, CONTEXT, wrap_with_html=True, backend='python', workers=1,
+        assets=paths
+      ):
+        self.assertEqual(result.returncode, 0)
+      name = os.path.basename(paths['css'])
+      self.assertIn(
+        'href="static/{}"'.format(name), tempd.read('out1', encoding='utf-8')
+      )
+      self.assertIn(
+        'href="../static/{}"'.format(name),
+        tempd.read('sub/out2', encoding='utf-8')
+      )
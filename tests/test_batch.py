@@ -0,0 +1,139 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from testfixtures import (
+  TempDirectory,
+  Replace,
+)
+
+from wdiffhtml.batch import (
+  Job,
+  read_manifest,
+  run_batch,
+)
+from wdiffhtml.exceptions import ManifestError
+
+
+class TestManifest(TestCase):
+
+  def test_csv(self):
+    manifest = io.StringIO('org,new,output\na,b,c\n\nd,e,f\n')
+    self.assertEqual(
+      read_manifest(manifest), [Job('a', 'b', 'c'), Job('d', 'e', 'f')]
+    )
+
+  def test_jsonl(self):
+    manifest = io.StringIO(
+      '{"org": "a", "new": "b", "output": "c"}\n'
+      '\n'
+      '{"org": "d", "new": "e", "output": "f"}\n'
+    )
+    self.assertEqual(
+      read_manifest(manifest), [Job('a', 'b', 'c'), Job('d', 'e', 'f')]
+    )
+
+  def test_malformed(self):
+    with self.assertRaises(ManifestError):
+      read_manifest(io.StringIO('a,b\n'))
+    with self.assertRaises(ManifestError):
+      read_manifest(io.StringIO('{"org": "a", "new": "b"}\n'))
+
+
+class TestBatch(TestCase):
+
+  def test_run(self):
+    with TempDirectory() as tempd:
+      jobs = [
+        Job(
+          tempd.write('org1', b'Just a test.'),
+          tempd.write('new1', b'Just another test.'),
+          tempd.getpath('out1'),
+        ),
+        Job(
+          tempd.getpath('missing'),
+          tempd.write('new2', b'Just a test.'),
+          tempd.getpath('out2'),
+        ),
+      ]
+      results = {
+        result.job.output: result
+        for result in run_batch(jobs, backend='python', workers=2)
+      }
+      self.assertEqual(results[jobs[0].output].returncode, 0)
+      self.assertEqual(
+        tempd.read('out1', encoding='utf-8'),
+        'Just <del>a</del> <ins>another</ins> test.'
+      )
+      self.assertEqual(results[jobs[1].output].returncode, 3)
+      self.assertTrue(results[jobs[1].output].error)
+      # a failed job leaves no (partial or temporary) output behind
+      self.assertEqual(
+        sorted(os.listdir(tempd.path)), ['new1', 'new2', 'org1', 'out1']
+      )
+
+  def test_unexpected_error(self):
+    with TempDirectory() as tempd:
+      jobs = [
+        Job(
+          tempd.getpath('org\0'),
+          tempd.write('new', b'Just a test.'),
+          tempd.getpath('out'),
+        ),
+      ]
+      results = list(run_batch(jobs, backend='python', workers=1))
+      self.assertEqual(results[0].returncode, 1)
+      self.assertTrue(results[0].error)
+
+  def test_template_error(self):
+    with TempDirectory() as tempd:
+      jobs = [
+        Job(
+          tempd.write('org{}'.format(number), b'Just a test.'),
+          tempd.write('new{}'.format(number), b'Just another test.'),
+          tempd.getpath('out{}'.format(number)),
+        )
+        for number in range(2)
+      ]
+      results = list(run_batch(
+        jobs, context={'template': '{% if %}'}, wrap_with_html=True,
+        backend='python', workers=1
+      ))
+      self.assertEqual([result.returncode for result in results], [1, 1])
+      self.assertTrue(all(result.error for result in results))
+
+  def test_no_initializer(self):
+    with TempDirectory() as tempd, Replace(
+      'wdiffhtml.batch.ProcessPoolExecutor', _OldExecutor
+    ):
+      jobs = [
+        Job(
+          tempd.write('org', b'Just a test.'),
+          tempd.write('new', b'Just another test.'),
+          tempd.getpath('out'),
+        ),
+      ]
+      results = list(run_batch(jobs, backend='python', workers=1))
+      self.assertEqual(results[0].returncode, 0)
+      self.assertEqual(
+        tempd.read('out', encoding='utf-8'),
+        'Just <del>a</del> <ins>another</ins> test.'
+      )
+
+
+class _OldExecutor(ProcessPoolExecutor):
+  """
+  A pool without the *initializer* argument (before Python 3.7).
+
+  """
+
+  def __init__(self, max_workers=None):
+    super(_OldExecutor, self).__init__(max_workers)
@@ -0,0 +1,106 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import time
+import subprocess as sub
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml.cache import DiffCache
+from wdiffhtml.utils import (
+  clear_wdiff_cache,
+  generate_wdiff,
+)
+
+
+# prints some output and fails like `wdiff` does on trouble
+FAILING_WDIFF = b"""#!/bin/sh
+echo partial
+exit 2
+"""
+
+
+class TestDiffCache(TestCase):
+
+  def setUp(self):
+    self.tempd = TempDirectory()
+    self.org_file = self.tempd.write('org', b'Just a test.')
+    self.new_file = self.tempd.write('new', b'Just another test.')
+    self.cache = DiffCache(self.tempd.getpath('cache'))
+
+  def tearDown(self):
+    self.tempd.cleanup()
+    clear_wdiff_cache()
+
+  def diff(self, **kwargs):
+    return generate_wdiff(
+      self.org_file, self.new_file, backend='python', cache=self.cache,
+      **kwargs
+    )
+
+  def test_hit(self):
+    exp = 'Just <del>a</del> <ins>another</ins> test.'
+    self.assertEqual(self.diff(), exp)
+    self.assertEqual(self.diff(), exp)
+    stats = self.cache.stats()
+    self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+    self.assertEqual(stats['entries'], 1)
+
+  def test_key(self):
+    self.diff()
+    self.assertEqual(self.diff(html=False), 'Just [-a-] {+another+} test.')
+    self.tempd.write('new', b'Just one more test.')
+    self.assertEqual(
+      self.diff(), 'Just <del>a</del> <ins>one more</ins> test.'
+    )
+    self.assertEqual(self.cache.misses, 3)
+    self.assertEqual(self.cache.stats()['entries'], 3)
+
+  def test_eviction(self):
+    keys = []
+    for number in range(3):
+      key = '{:064x}'.format(number)
+      list(self.cache.iter_set(key, [b'x' * 10]))
+      os.utime(self.cache.path(key), (time.time(), number))
+      keys.append(key)
+    self.cache.max_size = 20
+    self.cache.evict()
+    self.assertFalse(os.path.exists(self.cache.path(keys[0])))
+    self.assertTrue(os.path.exists(self.cache.path(keys[2])))
+
+  def test_failed_wdiff(self):
+    cmd = self.tempd.write('wdiff', FAILING_WDIFF)
+    os.chmod(cmd, 0o755)
+    for _ in range(2):
+      with self.assertRaises(sub.CalledProcessError) as ctx:
+        generate_wdiff(
+          self.org_file, self.new_file, wdiff_cmd=cmd, cache=self.cache
+        )
+      self.assertEqual(ctx.exception.returncode, 2)
+    self.assertEqual(self.cache.misses, 2)
+    self.assertEqual(self.cache.stats()['entries'], 0)
+
+  def test_tracked_size(self):
+    walks = []
+    entries = self.cache.entries
+
+    def counted_entries():
+      walks.append(None)
+      return entries()
+    self.cache.entries = counted_entries
+    self.cache.max_size = 25
+    keys = ['{:064x}'.format(number) for number in range(3)]
+    for key in keys[:2]:
+      list(self.cache.iter_set(key, [b'x' * 10]))
+    self.assertEqual(len(walks), 1)
+    os.utime(self.cache.path(keys[0]), (time.time(), 0))
+    list(self.cache.iter_set(keys[2], [b'x' * 10]))
+    self.assertEqual(len(walks), 2)
+    self.assertFalse(os.path.exists(self.cache.path(keys[0])))
+    self.assertTrue(os.path.exists(self.cache.path(keys[2])))
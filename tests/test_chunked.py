@@ -0,0 +1,115 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml.chunked import (
+  split_paragraphs,
+  generate_chunked_wdiff,
+)
+from wdiffhtml.inputs import (
+  mapped_input,
+  spool_input,
+)
+from wdiffhtml.utils import (
+  diff_texts,
+  wrap_paragraphs,
+)
+
+
+ORG = """First paragraph,
+  which stays the same.
+
+Second paragraph with a change.
+
+Third paragraph, unchanged.
+
+
+Fourth one gets removed.
+
+Fifth with another change.
+"""
+
+NEW = """First paragraph,
+which stays the same.
+
+Second paragraph with some changes.
+
+Third paragraph, unchanged.
+
+A new paragraph.
+
+Fifth with one more change.
+"""
+
+
+class TestChunked(TestCase):
+
+  def test_split(self):
+    paras, hashes = split_paragraphs(b'\n\n  a\n b \n\n\n \n\nc\n')
+    self.assertEqual(paras, [b'a\n b', b'c'])
+    self.assertEqual(hashes, split_paragraphs(b'a\nb\n\nc')[1])
+
+  def test_identical(self):
+    res = generate_chunked_wdiff(ORG.encode(), ORG.encode(), backend='python')
+    self.assertEqual(wrap_paragraphs(res), wrap_paragraphs(ORG))
+
+  def test_diff(self):
+    for workers in (1, 2):
+      res = generate_chunked_wdiff(
+        ORG.encode(), NEW.encode(), backend='python', workers=workers
+      )
+      exp = diff_texts(ORG, NEW, backend='python')
+      self.assertEqual(wrap_paragraphs(res), wrap_paragraphs(exp))
+      self.assertIn('with <del>a change.</del> <ins>some changes.</ins>', res)
+
+  def test_plain(self):
+    res = generate_chunked_wdiff(
+      ORG.encode(), NEW.encode(), html=False, backend='python'
+    )
+    self.assertIn('[-Fourth one gets removed.-]', res)
+
+  def test_unknown_backend(self):
+    with self.assertRaises(ValueError):
+      generate_chunked_wdiff(b'a', b'b', backend='nope')
+
+
+class TestMaxMemory(TestCase):
+
+  def test_mapped(self):
+    with TempDirectory() as tempd:
+      org = tempd.write('org', ORG.encode())
+      new = tempd.write('new', NEW.encode())
+      exp = generate_chunked_wdiff(org, new, backend='python', workers=1)
+      res = generate_chunked_wdiff(
+        org, new, backend='python', workers=1, max_memory=1024 ** 3
+      )
+      self.assertEqual(res, exp)
+      with mapped_input(tempd.write('empty', b'')) as data:
+        self.assertEqual(data, b'')
+
+  def test_pieces(self):
+    org = b'\n\n'.join(b'para %d here' % i for i in range(20))
+    new = b'\n\n'.join(b'para %d there' % i for i in range(20))
+    exp = generate_chunked_wdiff(org, new, backend='python', workers=1)
+    for workers in (1, 2):
+      res = generate_chunked_wdiff(
+        org, new, backend='python', workers=workers, max_memory=2000
+      )
+      self.assertEqual(res, exp)
+
+  def test_spool(self):
+    with spool_input(io.BytesIO(b'small'), 10) as source:
+      self.assertEqual(source, b'small')
+    with spool_input(io.BytesIO(b'x' * 100), 10) as source:
+      with open(source, 'rb') as fh:
+        self.assertEqual(fh.read(), b'x' * 100)
+    self.assertFalse(os.path.exists(source))
@@ -0,0 +1,56 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+
+from unittest import TestCase
+
+from testfixtures import (
+  TempDirectory,
+  Replace,
+)
+
+from wdiffhtml.cli import (
+  CACHE_DIR,
+  get_cache_dir,
+  parse_commandline,
+  run_cli,
+)
+
+
+class TestRunCli(TestCase):
+
+  def test_missing_file(self):
+    with TempDirectory() as tempd:
+      new_file = tempd.write('new.txt', b'Just a test.')
+      stderr = io.StringIO()
+      with Replace('sys.stderr', stderr):
+        res = run_cli([
+          '--backend', 'python', tempd.getpath('missing.txt'), new_file
+        ])
+    self.assertEqual(res, 3)
+    self.assertIn('missing.txt', stderr.getvalue())
+
+
+class TestCacheOptions(TestCase):
+
+  def test_disabled(self):
+    args = parse_commandline(['org.txt', 'new.txt'])
+    self.assertIsNone(get_cache_dir(args))
+
+  def test_cache(self):
+    args = parse_commandline(['--cache', 'org.txt', 'new.txt'])
+    self.assertEqual((args.org_file, args.new_file), ('org.txt', 'new.txt'))
+    self.assertEqual(get_cache_dir(args), CACHE_DIR)
+
+  def test_cache_dir(self):
+    args = parse_commandline(['--cache-dir', 'cache', 'org.txt', 'new.txt'])
+    self.assertEqual(get_cache_dir(args), 'cache')
+
+  def test_stats_without_cache(self):
+    with Replace('sys.stderr', io.StringIO()):
+      with self.assertRaises(SystemExit):
+        parse_commandline(['--cache-stats', 'org.txt', 'new.txt'])
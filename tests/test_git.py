@@ -0,0 +1,148 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+import subprocess as sub
+
+from unittest import (
+  TestCase,
+  skipIf,
+)
+
+from testfixtures import (
+  TempDirectory,
+  Replace,
+)
+
+from wdiffhtml.batch import run_batch
+from wdiffhtml.cli import run_cli
+from wdiffhtml.exceptions import GitError
+from wdiffhtml.git import (
+  GitRepository,
+  parse_revisions,
+  compare_revisions,
+  git_jobs,
+)
+
+
+def has_git():
+  try:
+    sub.check_output(['git', '--version'])
+  except (OSError, sub.CalledProcessError):
+    return False
+  return True
+
+
+class TestRevisions(TestCase):
+
+  def test_parse(self):
+    self.assertEqual(parse_revisions('v1..v2'), ('v1', 'v2'))
+    self.assertEqual(parse_revisions('v1..'), ('v1', 'HEAD'))
+    self.assertEqual(parse_revisions('v1'), ('v1', 'HEAD'))
+    with self.assertRaises(GitError):
+      parse_revisions('v1...v2')
+
+
+@skipIf(not has_git(), "git is not available")
+class TestGit(TestCase):
+
+  def setUp(self):
+    self.tempd = TempDirectory()
+    self.path = self.tempd.path
+    self.git('init', '-q')
+    self.git('config', 'user.email', 'test@example.com')
+    self.git('config', 'user.name', 'Test')
+    self.tempd.write('docs/a.txt', b'Just a test.')
+    self.tempd.write('docs/same.txt', b'Same.')
+    self.tempd.write('docs/old.txt', b'Old.')
+    self.commit()
+    self.tempd.write('docs/a.txt', b'Just another test.')
+    self.tempd.write('docs/new.txt', b'New.')
+    self.git('rm', '-q', 'docs/old.txt')
+    self.commit()
+
+  def tearDown(self):
+    self.tempd.cleanup()
+
+  def git(self, *args):
+    return sub.check_output(('git', '-C', self.path) + args)
+
+  def commit(self):
+    self.git('add', '.')
+    self.git('commit', '-q', '-m', 'test')
+
+  def test_read_blob(self):
+    with GitRepository(self.path) as repo:
+      ids = repo.blob_ids('HEAD', ['docs'])
+      self.assertEqual(
+        sorted(ids), ['docs/a.txt', 'docs/new.txt', 'docs/same.txt']
+      )
+      blob = repo.read_blob(ids['docs/a.txt'])
+      self.assertEqual(blob, b'Just another test.')
+      self.assertEqual(repo.read_blob(ids['docs/new.txt']), b'New.')
+      with self.assertRaises(GitError):
+        repo.blob_ids('no-such-revision', ['docs'])
+
+  def test_compare(self):
+    with GitRepository(self.path) as repo:
+      tree, org_ids, new_ids = compare_revisions(
+        repo, 'HEAD~1', 'HEAD', ['docs']
+      )
+      self.assertEqual(tree.changed, ['docs/a.txt'])
+      self.assertEqual(tree.added, ['docs/new.txt'])
+      self.assertEqual(tree.removed, ['docs/old.txt'])
+      self.assertEqual(tree.unchanged, ['docs/same.txt'])
+      with self.assertRaises(GitError):
+        compare_revisions(repo, 'HEAD~1', 'HEAD', ['missing'])
+      out = self.tempd.getpath('out')
+      blobs = self.tempd.makedir('blobs')
+      jobs = git_jobs(
+        repo, tree, org_ids, new_ids, 'HEAD~1', 'HEAD', out, blobs
+      )
+      self.assertEqual(repo.read_blob(new_ids['docs/new.txt']), b'New.')
+    with open(jobs[0].org_file, 'rb') as fh:
+      self.assertEqual(fh.read(), b'Just a test.')
+    results = list(run_batch(
+      jobs, wrap_with_html=True, backend='python', workers=1
+    ))
+    self.assertEqual(results[0].returncode, 0)
+    html = self.tempd.read('out/docs/a.txt.html').decode('utf-8')
+    self.assertIn('docs/a.txt@HEAD~1 vs docs/a.txt@HEAD', html)
+    self.assertIn('Just <del>a</del> <ins>another</ins> test.', html)
+
+  def run_cli(self, *argv):
+    cwd = os.getcwd()
+    stderr = io.StringIO()
+    os.chdir(self.path)
+    try:
+      with Replace('sys.stderr', stderr):
+        res = run_cli(('--backend', 'python') + argv)
+    finally:
+      os.chdir(cwd)
+    return res, stderr.getvalue()
+
+  def test_cli_single_change(self):
+    # unchanged files don't count, a single change is written as a file
+    self.tempd.write('docs/a.txt', b'Just a last test.')
+    self.commit()
+    out = self.tempd.getpath('a.html')
+    res, _ = self.run_cli(
+      '--git', 'HEAD~1', '--wrap-with-html', '--output', out, 'docs'
+    )
+    self.assertEqual(res, 0)
+    html = self.tempd.read('a.html').decode('utf-8')
+    self.assertIn('Just <del>another</del> <ins>a last</ins> test.', html)
+
+  def test_cli_no_changes(self):
+    res, stderr = self.run_cli('--git', 'HEAD..HEAD', 'docs')
+    self.assertEqual(res, 0)
+    self.assertIn('3 files: no changes between HEAD and HEAD', stderr)
+
+  def test_cli_several_changes(self):
+    res, stderr = self.run_cli('--git', 'HEAD~1', 'docs')
+    self.assertNotEqual(res, 0)
+    self.assertIn('--output DIR', stderr)
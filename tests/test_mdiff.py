@@ -4,12 +4,24 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import io
+import os
+import random
+import re
+
 from unittest import TestCase
 from collections import namedtuple
 
 from testfixtures import TempDirectory
 
-from wdiffhtml.utils import generate_wdiff
+from wdiffhtml.chunked import generate_chunked_wdiff
+from wdiffhtml.exceptions import WdiffNotFoundError
+from wdiffhtml.utils import (
+  find_wdiff,
+  clear_wdiff_cache,
+  generate_wdiff,
+  diff_texts,
+)
 
 
 Case = namedtuple('Case', 'org, new, exp, exp_folded exp_nohtml')
@@ -17,6 +29,8 @@ Case = namedtuple('Case', 'org, new, exp, exp_folded exp_nohtml')
 
 class TestWdiff(TestCase):
 
+  BACKEND = 'wdiff'
+
   CASES = (
     Case(
       'Just ä test.',
@@ -39,6 +53,20 @@ class TestWdiff(TestCase):
       'A test sentence with <ins>changes\nover</ins> multiple lines\nand stuff.',
       'A test sentence with {+changes+}\n{+over+} multiple lines\nand stuff.',
     ),
+    Case(
+      'Just a test.',
+      'a test.',
+      '<del>Just</del> a test.',
+      '<del>Just</del> a test.',
+      '[-Just-] a test.',
+    ),
+    Case(
+      'a b',
+      'b a',
+      '<del>a</del> b <ins>a</ins>',
+      '<del>a</del> b <ins>a</ins>',
+      '[-a-] b {+a+}',
+    ),
   )
 
   def test_plain(self):
@@ -47,7 +75,7 @@ class TestWdiff(TestCase):
         org_file = tempd.write('org', case.org.encode('utf-8'))
         new_file = tempd.write('new', case.new.encode('utf-8'))
         res = generate_wdiff(
-          org_file, new_file, fold_tags=False, html=True
+          org_file, new_file, fold_tags=False, html=True, backend=self.BACKEND
         )
         self.assertEqual(res, case.exp)
 
@@ -57,7 +85,7 @@ class TestWdiff(TestCase):
         org_file = tempd.write('org', case.org.encode('utf-8'))
         new_file = tempd.write('new', case.new.encode('utf-8'))
         res = generate_wdiff(
-          org_file, new_file, fold_tags=True, html=True
+          org_file, new_file, fold_tags=True, html=True, backend=self.BACKEND
         )
         self.assertEqual(res, case.exp_folded)
 
@@ -67,6 +95,71 @@ class TestWdiff(TestCase):
         org_file = tempd.write('org', case.org.encode('utf-8'))
         new_file = tempd.write('new', case.new.encode('utf-8'))
         res = generate_wdiff(
-          org_file, new_file, fold_tags=False, html=False
+          org_file, new_file, fold_tags=False, html=False, backend=self.BACKEND
         )
         self.assertEqual(res, case.exp_nohtml)
+
+
+class TestPythonBackend(TestWdiff):
+
+  BACKEND = 'python'
+
+  def test_contents(self):
+    for case in self.CASES:
+      res = diff_texts(case.org, case.new, backend=self.BACKEND)
+      self.assertEqual(res, case.exp)
+      res = generate_wdiff(
+        io.BytesIO(case.org.encode('utf-8')), case.new.encode('utf-8'),
+        backend=self.BACKEND
+      )
+      self.assertEqual(res, case.exp)
+
+  def test_block_start(self):
+    res = generate_chunked_wdiff(
+      b'One.\n\nzeta delta beta', b'One.\n\ndelta beta',
+      backend=self.BACKEND, workers=1
+    )
+    self.assertEqual(res, 'One.\n\n<del>zeta</del> delta beta')
+
+  def test_round_trip(self):
+    rnd = random.Random(42)
+    words = ['a', 'b', 'c', 'dd', 'eee']
+
+    def text():
+      return ''.join(
+        rnd.choice(words) + rnd.choice([' ', '  ', '\n'])
+        for _ in range(rnd.randint(0, 8))
+      )
+    for _ in range(500):
+      org, new = text(), text()
+      for html in (True, False):
+        res = diff_texts(org, new, html=html, backend=self.BACKEND)
+        if html:
+          ins, dele = r'<ins>(.*?)</ins>', r'<del>(.*?)</del>'
+        else:
+          ins, dele = r'\{\+(.*?)\+\}', r'\[-(.*?)-\]'
+        res_org = re.sub(dele, r'\1', re.sub(ins, '', res, flags=re.S))
+        res_new = re.sub(ins, r'\1', re.sub(dele, '', res, flags=re.S))
+        self.assertEqual(res_org.split(), org.split(), (org, new, res))
+        self.assertEqual(res_new.split(), new.split(), (org, new, res))
+
+
+class TestFindWdiff(TestCase):
+
+  def tearDown(self):
+    clear_wdiff_cache()
+
+  def test_not_found(self):
+    with self.assertRaises(WdiffNotFoundError):
+      find_wdiff('no-such-wdiff-command')
+
+  def test_memoized(self):
+    with TempDirectory() as tempd:
+      cmd = tempd.write('wdiff', b'')
+      os.chmod(cmd, 0o755)
+      self.assertEqual(find_wdiff(cmd), cmd)
+      os.remove(cmd)
+      self.assertEqual(find_wdiff(cmd), cmd)
+      clear_wdiff_cache()
+      with self.assertRaises(WdiffNotFoundError):
+        find_wdiff(cmd)
@@ -0,0 +1,102 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml import (
+  DiffOperations,
+  diff_operations,
+)
+from wdiffhtml.operations import BINARY_HEADER
+from wdiffhtml.settings import Settings
+from wdiffhtml.utils import (
+  diff_texts,
+  wrap_content,
+)
+
+
+ORG = 'A test sentence with multiple lines\nand stuff.\n\nMore ä.'.encode()
+
+NEW = 'A test sentence with changes\nover multiple lines\nand ö.'.encode()
+
+
+class TestOperations(TestCase):
+
+  def test_opcodes(self):
+    ops = diff_operations(b'a b c d', b'a x c d e')
+    self.assertEqual(list(ops), [
+      ('equal', 0, 1, 0, 1),
+      ('replace', 1, 2, 1, 2),
+      ('equal', 2, 4, 2, 4),
+      ('insert', 4, 4, 4, 5),
+    ])
+    self.assertEqual(len(ops), 4)
+    self.assertEqual(
+      ops.stats(),
+      {'operations': 4, 'equal': 3, 'deleted': 1, 'inserted': 2}
+    )
+
+  def test_render(self):
+    ops = diff_operations(ORG, NEW)
+    for fold_tags in (False, True):
+      for html in (False, True):
+        exp = diff_texts(ORG, NEW, fold_tags, html, backend='python')
+        self.assertEqual(ops.render(fold_tags, html), exp)
+
+  def test_render_document(self):
+    with TempDirectory() as tempd:
+      settings = Settings(tempd.write('org', ORG), tempd.write('new', NEW))
+      ops = diff_operations(settings.org_file, settings.new_file)
+      exp = wrap_content(
+        diff_texts(ORG, NEW, backend='python'), settings, True
+      )
+      self.assertEqual(ops.render_document(settings, hard_breaks=True), exp)
+
+  def test_json(self):
+    ops = diff_operations(ORG, NEW + b'\xff')
+    self.assertEqual(DiffOperations.from_json(ops.to_json()), ops)
+    data = ops.to_json(texts=False)
+    self.assertNotIn('sentence', data)
+    self.assertEqual(DiffOperations.from_json(data, ORG, NEW + b'\xff'), ops)
+    with self.assertRaises(ValueError):
+      DiffOperations.from_json(data)
+
+  def test_invalid_dict(self):
+    data = diff_operations(b'a b c', b'a x c').to_dict()
+    for opcodes in (
+      [['equal', 0, 1, 0, 1], ['equal', 2, 3, 2, 3]],  # a gap
+      [['equal', 0, 3, 0, 3], ['insert', 3, 3, 3, 5]],  # too many words
+      [['equal', 0, 2, 0, 2]],  # too few words
+      [['equal', 0, 2 ** 40, 0, 2 ** 40]],
+      [['delete', 0, 3, 0, -1]],
+      [['move', 0, 3, 0, 3]],
+    ):
+      with self.assertRaises(ValueError):
+        DiffOperations.from_dict(dict(data, opcodes=opcodes))
+    with self.assertRaises(ValueError):
+      DiffOperations.from_dict(dict(data, engine='0'))
+
+  def test_bytes(self):
+    ops = diff_operations(ORG, NEW)
+    data = ops.to_bytes()
+    self.assertEqual(DiffOperations.from_bytes(data), ops)
+    data = ops.to_bytes(texts=False)
+    self.assertEqual(len(data), BINARY_HEADER.size + 9 * len(ops))
+    self.assertEqual(DiffOperations.from_bytes(data, ORG, NEW), ops)
+    for invalid in (b'', b'XXXX' + data[4:], data[:-1]):
+      with self.assertRaises(ValueError):
+        DiffOperations.from_bytes(invalid)
+    # the texts are required if they're not included
+    with self.assertRaises(ValueError):
+      DiffOperations.from_bytes(data)
+    # and have to match the operations
+    with self.assertRaises(ValueError):
+      DiffOperations.from_bytes(data, ORG, NEW + b' more')
+    # operations from another engine version
+    with self.assertRaises(ValueError):
+      DiffOperations.from_bytes(data[:6] + b'0'.ljust(8, b'\0') + data[14:])
@@ -0,0 +1,122 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import gzip
+import io
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml import (
+  Settings,
+  wdiff,
+  stream_wdiff_bytes,
+  write_wdiff_bytes,
+)
+from wdiffhtml.batch import (
+  Job,
+  run_batch,
+)
+from wdiffhtml.inputs import (
+  detect_encoding,
+  sniff_encoding,
+  transcode_input,
+)
+
+
+ORG = 'Just a tést.'.encode('utf-8')
+
+NEW = 'Just another tést.'.encode('utf-8')
+
+
+class TestWriteBytes(TestCase):
+
+  def setUp(self):
+    self.settings = Settings(ORG, NEW)
+    self.exp = wdiff(self.settings, True, backend='python').encode('utf-8')
+
+  def test_plain(self):
+    fh = io.BytesIO()
+    write_wdiff_bytes(fh, self.settings, True, backend='python')
+    self.assertFalse(fh.closed)
+    self.assertEqual(fh.getvalue(), self.exp)
+
+  def test_gzip(self):
+    fh = io.BytesIO()
+    write_wdiff_bytes(
+      fh, self.settings, True, backend='python', compresslevel=9
+    )
+    self.assertFalse(fh.closed)
+    fh.seek(0)
+    self.assertEqual(gzip.GzipFile(fileobj=fh).read(), self.exp)
+
+  def test_raw(self):
+    settings = Settings(b'caf\xe9 one', b'caf\xe9 two')
+    res = b''.join(stream_wdiff_bytes(settings, backend='python'))
+    self.assertEqual(res, b'caf\xe9 <del>one</del> <ins>two</ins>')
+
+  def test_batch(self):
+    with TempDirectory() as tempd:
+      org = tempd.write('org', ORG)
+      new = tempd.write('new', NEW)
+      jobs = [
+        Job(org, new, tempd.getpath('out')),
+        Job(org, new, tempd.getpath('out.gz')),
+      ]
+      for result in run_batch(jobs, backend='python', workers=1):
+        self.assertEqual(result.returncode, 0)
+      exp = 'Just <del>a</del> <ins>another</ins> tést.'.encode('utf-8')
+      self.assertEqual(tempd.read('out'), exp)
+      with gzip.open(tempd.getpath('out.gz')) as fh:
+        self.assertEqual(fh.read(), exp)
+
+
+class TestEncodings(TestCase):
+
+  TEXT = 'Just a tést.\n'
+
+  def test_boms(self):
+    for encoding, exp in [
+      ('utf-8-sig', 'utf-8-sig'), ('utf-16', 'utf-16'),
+      ('utf-32', 'utf-32'),
+    ]:
+      self.assertEqual(detect_encoding(self.TEXT.encode(encoding)), exp)
+
+  def test_heuristics(self):
+    for encoding, exp in [
+      ('utf-8', 'utf-8'), ('latin-1', 'latin-1'), ('utf-16-le', 'utf-16-le'),
+      ('utf-16-be', 'utf-16-be'),
+    ]:
+      self.assertEqual(detect_encoding(self.TEXT.encode(encoding)), exp)
+    self.assertEqual(detect_encoding(b'Just a test.'), 'utf-8')
+    self.assertEqual(detect_encoding(b''), 'utf-8')
+
+  def test_partial_sample(self):
+    data = 'aé'.encode('utf-8')
+    self.assertEqual(sniff_encoding(data, 2), 'utf-8')
+    self.assertEqual(sniff_encoding(data[:2]), 'latin-1')
+
+  def test_transcode(self):
+    exp = self.TEXT.encode('utf-8')
+    for encoding in ('latin-1', 'utf-16', 'utf-8-sig'):
+      data = self.TEXT.encode(encoding)
+      self.assertEqual(transcode_input(data, encoding), exp)
+      self.assertEqual(transcode_input(data, 'auto'), exp)
+    self.assertEqual(transcode_input(b'\xe9', None), b'\xe9')
+
+  def test_unchanged_paths(self):
+    with TempDirectory() as tempd:
+      path = tempd.write('org', self.TEXT.encode('utf-8'))
+      self.assertEqual(transcode_input(path, 'auto'), path)
+      path = tempd.write('new', self.TEXT.encode('utf-16'))
+      res = transcode_input(path, 'auto')
+      self.assertEqual(res, self.TEXT.encode('utf-8'))
+
+  def test_wdiff(self):
+    settings = Settings(ORG.decode('utf-8').encode('utf-16'), NEW)
+    res = wdiff(settings, backend='python', encoding='auto')
+    self.assertEqual(res, 'Just <del>a</del> <ins>another</ins> tést.')
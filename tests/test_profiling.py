@@ -0,0 +1,142 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import json
+import subprocess as sub
+import sys
+
+from unittest import TestCase
+
+from testfixtures import (
+  TempDirectory,
+  Replace,
+)
+
+from wdiffhtml import (
+  wdiff,
+  write_wdiff,
+)
+from wdiffhtml.cli import parse_commandline
+from wdiffhtml.profiling import Profiler
+from wdiffhtml.settings import Settings
+
+
+class FakeClock(object):
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self):
+    return self.now
+
+
+class TestProfiler(TestCase):
+
+  def test_exclusive(self):
+    clock = FakeClock()
+
+    def inner():
+      for chunk in (b'ab', b'cde'):
+        clock.now += 1
+        yield chunk
+
+    def outer(chunks):
+      for chunk in chunks:
+        clock.now += 10
+        yield chunk.decode('ascii')
+
+    with Replace('wdiffhtml.profiling._timer', clock):
+      profiler = Profiler()
+      profiler.start()
+      chunks = profiler.iter_stage('inner', inner())
+      for chunk in profiler.iter_stage('outer', outer(chunks)):
+        with profiler.stage('write', chunk):
+          clock.now += 100
+      profiler.stop()
+    results = profiler.results()
+    self.assertEqual(results['duration'], 222)
+    stages = results['stages']
+    self.assertEqual(stages['inner'], {'calls': 3, 'duration': 2, 'bytes': 5})
+    self.assertEqual(
+      stages['outer'], {'calls': 3, 'duration': 20, 'bytes': 5}
+    )
+    self.assertEqual(
+      stages['write'], {'calls': 2, 'duration': 200, 'bytes': 5}
+    )
+
+  def test_memory(self):
+    profiler = Profiler(trace_memory=True)
+    profiler.start()
+    with profiler.stage('alloc'):
+      data = [bytearray(1024) for _ in range(100)]
+    profiler.stop()
+    self.assertGreater(profiler.stages['alloc']['peak_memory'], 100 * 1024)
+    del data
+
+
+class TestProfiledDiff(TestCase):
+
+  STAGES = ['diff', 'decode', 'wrap_paragraphs', 'template', 'render']
+
+  def test_wdiff(self):
+    with TempDirectory() as tempd:
+      settings = Settings(
+        tempd.write('org.txt', b'Just a test.'),
+        tempd.write('new.txt', b'Just another test.'),
+      )
+      profiler = Profiler()
+      wdiff(settings, True, backend='python', profiler=profiler)
+      for stage in self.STAGES:
+        self.assertEqual(profiler.stages[stage]['calls'] > 0, True, stage)
+      json.loads(profiler.to_json())
+
+  def test_stream(self):
+    with TempDirectory() as tempd:
+      settings = Settings(
+        tempd.write('org.txt', b'Just \xc3\xa4 test.'),
+        tempd.write('new.txt', b'Just another test.'),
+      )
+      profiler = Profiler()
+      fh = io.StringIO()
+      write_wdiff(
+        fh, settings, True, backend='python', profiler=profiler
+      )
+      self.assertEqual(set(profiler.stages), set(self.STAGES + ['write']))
+      self.assertEqual(
+        profiler.stages['write']['bytes'], len(fh.getvalue().encode('utf-8'))
+      )
+
+
+class TestCommandline(TestCase):
+
+  def test_batch(self):
+    with TempDirectory() as tempd:
+      manifest = tempd.write('manifest.txt', b'org.txt new.txt\n')
+      args = parse_commandline(['--batch', manifest])
+      args.batch.close()
+      self.assertEqual(args.batch.name, manifest)
+      self.assertEqual(args.profile, False)
+
+  def test_batch_profile(self):
+    with TempDirectory() as tempd:
+      manifest = tempd.write('manifest.txt', b'org.txt new.txt\n')
+      with Replace('sys.stderr', io.StringIO()):
+        with self.assertRaises(SystemExit):
+          parse_commandline(['--batch', manifest, '--profile'])
+
+
+class TestImport(TestCase):
+
+  def test_lazy(self):
+    # the profiler (and tracemalloc) are only loaded when profiling
+    code = (
+      "import sys, wdiffhtml.cli; "
+      "print('wdiffhtml.profiling' in sys.modules, "
+      "'tracemalloc' in sys.modules)"
+    )
+    output = sub.check_output([sys.executable, '-c', code])
+    self.assertEqual(output.split(), [b'False', b'False'])
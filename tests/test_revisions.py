@@ -0,0 +1,95 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import pickle
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml.batch import run_batch
+from wdiffhtml.engine import (
+  BaseIndex,
+  generate_pydiff,
+)
+from wdiffhtml.revisions import (
+  compare_base,
+  base_jobs,
+  index_base,
+)
+
+
+BASE = b'Just a test.\n\nThe second paragraph stays.\n'
+
+REVISIONS = [
+  b'Just another test.\n\nThe second paragraph stays.\n',
+  b'Just a test.\n\nThe 2nd paragraph stays, really.\n',
+  b'',
+  b'Something new entirely.',
+]
+
+
+class TestBaseIndex(TestCase):
+
+  def test_same_results(self):
+    index = BaseIndex(BASE)
+    for revision in REVISIONS + [BASE]:
+      for fold_tags in (False, True):
+        for html in (False, True):
+          res = b''.join(index.iter_diff(revision, fold_tags, html))
+          exp = generate_pydiff(BASE, revision, fold_tags, html)
+          self.assertEqual(res.decode('utf-8'), exp)
+
+  def test_empty_base(self):
+    index = BaseIndex(b'')
+    res = b''.join(index.iter_diff(b'New text.'))
+    self.assertEqual(res, b'<ins>New text.</ins>')
+
+  def test_pickle(self):
+    index = pickle.loads(pickle.dumps(BaseIndex(BASE)))
+    res = b''.join(index.iter_diff(REVISIONS[0]))
+    self.assertEqual(res.decode('utf-8'), generate_pydiff(BASE, REVISIONS[0]))
+
+  def test_encoding(self):
+    index = index_base(BASE.decode('utf-8').encode('utf-16'), 'auto')
+    self.assertEqual(b''.join(index.iter_diff(BASE)), BASE)
+
+
+class TestRevisions(TestCase):
+
+  def setUp(self):
+    self.tempd = TempDirectory()
+    self.base = self.tempd.write('base.txt', BASE)
+    self.revisions = [
+      self.tempd.write('rev{}.txt'.format(number), data)
+      for number, data in enumerate(REVISIONS)
+    ]
+    self.revisions.append(self.tempd.write('same/rev.txt', BASE))
+
+  def tearDown(self):
+    self.tempd.cleanup()
+
+  def test_compare(self):
+    tree = compare_base(self.base, self.revisions)
+    self.assertEqual(
+      tree.changed, ['rev0.txt', 'rev1.txt', 'rev2.txt', 'rev3.txt']
+    )
+    self.assertEqual(tree.unchanged, ['rev.txt'])
+    with self.assertRaises(ValueError):
+      compare_base(self.base, self.revisions + [self.revisions[0]])
+
+  def test_reports(self):
+    out = self.tempd.getpath('out')
+    tree = compare_base(self.base, self.revisions)
+    jobs = base_jobs(self.base, self.revisions, tree, out)
+    self.assertEqual(len(jobs), 4)
+    results = list(run_batch(
+      jobs, backend='python', workers=2, base_index=index_base(self.base)
+    ))
+    self.assertEqual([result.returncode for result in results], [0] * 4)
+    for number, data in enumerate(REVISIONS):
+      res = self.tempd.read('out/rev{}.txt.html'.format(number))
+      self.assertEqual(res.decode('utf-8'), generate_pydiff(BASE, data))
@@ -0,0 +1,239 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+import os
+import socket
+import threading
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+try:
+  from http.client import (
+    HTTPConnection,
+    HTTPResponse,
+  )
+  from urllib.parse import urlencode
+except ImportError:  # Python 2
+  from httplib import (
+    HTTPConnection,
+    HTTPResponse,
+  )
+  from urllib import urlencode
+
+from wdiffhtml.server import (
+  DiffService,
+  RequestError,
+  make_server,
+)
+
+
+class ServerMixin(object):
+
+  def start_server(self, root=None, **kwargs):
+    self.service = DiffService(backend='python', workers=2, root=root)
+    self.service.warm()
+    self.server = make_server(self.service, port=0, quiet=True, **kwargs)
+    self.thread = threading.Thread(
+      target=self.server.serve_forever, kwargs={'poll_interval': 0.05}
+    )
+    self.thread.start()
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    self.thread.join()
+    self.service.shutdown()
+
+
+class TestServer(ServerMixin, TestCase):
+
+  def setUp(self):
+    self.tempd = TempDirectory()
+    self.start_server(root=self.tempd.path)
+
+  def tearDown(self):
+    ServerMixin.tearDown(self)
+    self.tempd.cleanup()
+
+  def request(self, method, path, body=None, headers=None):
+    conn = HTTPConnection(*self.server.server_address[:2])
+    try:
+      headers = dict(headers or {})
+      if body is not None:
+        body = json.dumps(body)
+        headers.setdefault('Content-Type', 'application/json')
+      conn.request(method, path, body, headers)
+      response = conn.getresponse()
+      return response.status, dict(response.getheaders()), response.read()
+    finally:
+      conn.close()
+
+  def test_texts(self):
+    request = {'org': 'Just a test.', 'new': 'Just another test.'}
+    status, _, body = self.request('POST', '/diff', request)
+    self.assertEqual(status, 200)
+    self.assertEqual(body, b'Just <del>a</del> <ins>another</ins> test.')
+
+  def test_files(self):
+    query = urlencode({
+      'org_file': self.tempd.write('org.txt', b'Just a test.'),
+      'new_file': 'new.txt',
+      'wrap_with_html': 'true',
+    })
+    self.tempd.write('new.txt', b'Just another test.')
+    status, _, body = self.request('GET', '/diff?' + query)
+    self.assertEqual(status, 200)
+    self.assertIn(b'<del>a</del> <ins>another</ins>', body)
+    self.assertIn(b'new.txt', body)
+
+  def test_files_outside_root(self):
+    for path in ('../org.txt', '/etc/passwd'):
+      request = {'org_file': path, 'new': 'test'}
+      status, _, _ = self.request('POST', '/diff', request)
+      self.assertEqual(status, 400)
+
+  def test_files_disabled(self):
+    service = DiffService(backend='python', workers=1)
+    try:
+      with self.assertRaises(RequestError):
+        service.settings({'org_file': 'org.txt', 'new': 'test'})
+    finally:
+      service.shutdown()
+
+  def test_context(self):
+    request = {
+      'org': 'Just a test.', 'new': 'Just another test.',
+      'wrap_with_html': True,
+      'context': {'org_filename': 'first.txt', 'revision': 'r42'},
+    }
+    status, _, body = self.request('POST', '/diff', request)
+    self.assertEqual(status, 200)
+    self.assertIn(b'first.txt', body)
+    self.assertIn(b'r42', body)
+    for context in (
+      {'template': '{{ 7 * 7 }}'}, {'css_file': '/etc/passwd'},
+      {'org_filename': 42}, ['org_filename'],
+    ):
+      request['context'] = context
+      status, _, _ = self.request('POST', '/diff', request)
+      self.assertEqual(status, 400)
+
+  def test_invalid_requests(self):
+    for request in ({'org': 42, 'new': 'test'}, {'org_file': 42, 'new': ''}):
+      status, _, _ = self.request('POST', '/diff', request)
+      self.assertEqual(status, 400)
+    status, _, _ = self.request(
+      'POST', '/diff', {'org': 'a', 'new': 'b'},
+      {'Content-Type': 'text/plain'}
+    )
+    self.assertEqual(status, 415)
+
+  def test_etag(self):
+    request = {'org': 'Just a test.', 'new': 'Just another test.'}
+    _, headers, _ = self.request('POST', '/diff', request)
+    etag = headers['ETag']
+    status, _, body = self.request(
+      'POST', '/diff', request, {'If-None-Match': etag}
+    )
+    self.assertEqual(status, 304)
+    self.assertEqual(body, b'')
+    request['hard_breaks'] = True
+    status, headers, _ = self.request(
+      'POST', '/diff', request, {'If-None-Match': etag}
+    )
+    self.assertEqual(status, 200)
+    self.assertNotEqual(headers['ETag'], etag)
+
+  def test_etag_context(self):
+    request = {
+      'org': 'Just a test.', 'new': 'Just another test.',
+      'wrap_with_html': True, 'context': {'revision': 'r1'},
+    }
+    _, headers, _ = self.request('POST', '/diff', request)
+    etag = headers['ETag']
+    status, _, _ = self.request(
+      'POST', '/diff', request, {'If-None-Match': etag}
+    )
+    self.assertEqual(status, 304)
+    request['context'] = {'revision': 'r2'}
+    status, _, _ = self.request(
+      'POST', '/diff', request, {'If-None-Match': etag}
+    )
+    self.assertEqual(status, 200)
+
+  def send_length(self, length):
+    conn = HTTPConnection(*self.server.server_address[:2])
+    try:
+      conn.putrequest('POST', '/diff')
+      conn.putheader('Content-Type', 'application/json')
+      conn.putheader('Content-Length', length)
+      conn.endheaders()
+      return conn.getresponse().status
+    finally:
+      conn.close()
+
+  def test_content_length(self):
+    self.assertEqual(self.send_length('many'), 400)
+    self.assertEqual(self.send_length('-1'), 400)
+    self.server.max_body_size = 16
+    self.assertEqual(self.send_length('17'), 413)
+    request = {'org': 'Just a test.', 'new': 'Just another test.'}
+    status, _, _ = self.request('POST', '/diff', request)
+    self.assertEqual(status, 413)
+
+  def test_errors(self):
+    status, _, body = self.request('POST', '/diff', {'org': 'Just a test.'})
+    self.assertEqual(status, 400)
+    self.assertIn('new_file', json.loads(body.decode('utf-8'))['error'])
+    request = {'org_file': 'no-such-file', 'new': 'test'}
+    status, _, _ = self.request('POST', '/diff', request)
+    self.assertEqual(status, 404)
+    status, _, _ = self.request('GET', '/nothing')
+    self.assertEqual(status, 404)
+
+  def test_stats(self):
+    self.request('POST', '/diff', {'org': 'a', 'new': 'b'})
+    self.request('POST', '/diff', {'org': 'a'})
+    status, _, body = self.request('GET', '/stats')
+    self.assertEqual(status, 200)
+    stats = json.loads(body.decode('utf-8'))
+    self.assertEqual(stats['requests'], 2)
+    self.assertEqual(stats['errors'], 1)
+    self.assertEqual(stats['queued'], 0)
+    self.assertEqual(stats['active'], 0)
+    self.assertIn('p95', stats['latency'])
+
+
+class TestUnixServer(ServerMixin, TestCase):
+
+  def setUp(self):
+    self.tempd = TempDirectory()
+    self.start_server(socket_path=os.path.join(self.tempd.path, 'sock'))
+
+  def tearDown(self):
+    ServerMixin.tearDown(self)
+    self.tempd.cleanup()
+
+  def test_diff(self):
+    body = json.dumps({'org': 'a b', 'new': 'a c'}).encode('utf-8')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      sock.connect(self.server.server_address)
+      sock.sendall(
+        b'POST /diff HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n'
+        b'Content-Type: application/json\r\n'
+        b'Content-Length: ' + str(len(body)).encode('ascii') + b'\r\n\r\n' +
+        body
+      )
+      response = HTTPResponse(sock)
+      response.begin()
+      self.assertEqual(response.status, 200)
+      self.assertEqual(response.read(), b'a <del>b</del> <ins>c</ins>')
+    finally:
+      sock.close()
@@ -0,0 +1,166 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import pickle
+import subprocess as sub
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from testfixtures import (
+  TempDirectory,
+  Replace,
+)
+
+from wdiffhtml import (
+  settings,
+  wdiff,
+)
+from wdiffhtml.settings import Settings
+from wdiffhtml.utils import (
+  clear_wdiff_cache,
+  iter_wrap_content,
+  wrap_content,
+)
+
+
+class TestLazySettings(TestCase):
+
+  def test_context(self):
+    obj = Settings('path/to/org.txt', 'new.txt', version='1.0')
+    self.assertIsNone(obj._context)
+    self.assertEqual(obj.context['org_filename'], 'org.txt')
+    self.assertEqual(obj.context['version'], '1.0')
+    self.assertIn('css', obj.context)
+    self.assertIn('styles.css', settings._RESOURCES)
+
+  def test_template(self):
+    self.assertEqual(Settings('a', 'b', template='T').template, 'T')
+    self.assertIn('{{ content }}', Settings('a', 'b').template)
+
+  def test_no_eager_imports(self):
+    code = (
+      "import sys, wdiffhtml.cli; "
+      "print(' '.join(m for m in ('jinja2', 'pkg_resources') "
+      "if m in sys.modules))"
+    )
+    output = sub.check_output([sys.executable, '-c', code])
+    self.assertEqual(output.strip(), b'')
+
+
+class TestImmutableSettings(TestCase):
+
+  def test_immutable(self):
+    obj = Settings('org.txt', 'new.txt', version='1.0')
+    with self.assertRaises(AttributeError):
+      obj.org_file = 'other.txt'
+    with self.assertRaises(AttributeError):
+      obj.template = 'T'
+    with self.assertRaises(TypeError):
+      obj.context['content'] = 'changed'
+
+  def test_shared_defaults(self):
+    obj1 = Settings('a', 'b')
+    obj2 = Settings('c', 'd', css='body {}')
+    self.assertIs(settings._shared_context(), settings._shared_context())
+    self.assertIs(obj1.context['js'], obj2.context['js'])
+    self.assertEqual(obj2.context['css'], 'body {}')
+    self.assertNotEqual(obj1.context['css'], 'body {}')
+
+  def test_replace(self):
+    obj = Settings('org.txt', 'new.txt', version='1.0')
+    new = obj.replace(new_file='other.txt', timestamp='now')
+    self.assertEqual(new.context['new_filename'], 'other.txt')
+    self.assertEqual(new.context['version'], '1.0')
+    self.assertEqual(new.context['timestamp'], 'now')
+    self.assertEqual(obj.context['new_filename'], 'new.txt')
+    self.assertNotIn('timestamp', obj.context)
+
+  def test_pickle(self):
+    obj = Settings('org.txt', b'new', template='T', version='1.0')
+    res = pickle.loads(pickle.dumps(obj))
+    self.assertEqual(res.org_file, 'org.txt')
+    self.assertEqual(res.new_file, b'new')
+    self.assertEqual(res.template, 'T')
+    self.assertEqual(res.context['version'], '1.0')
+
+  def test_wdiff_cmd(self):
+    obj = Settings('org.txt', 'new.txt', wdiff_cmd='my-wdiff')
+    self.assertEqual(obj.wdiff_cmd, 'my-wdiff')
+    self.assertEqual(obj.replace(version='1.0').wdiff_cmd, 'my-wdiff')
+    self.assertEqual(obj.replace(wdiff_cmd='other').wdiff_cmd, 'other')
+    self.assertEqual(pickle.loads(pickle.dumps(obj)).wdiff_cmd, 'my-wdiff')
+    self.assertNotIn('wdiff_cmd', obj.context)
+
+
+class TestWdiffCommand(TestCase):
+
+  def tearDown(self):
+    clear_wdiff_cache()
+
+  def test_precedence(self):
+    with TempDirectory() as tempd:
+      commands = {}
+      for name in ('env', 'settings', 'argument'):
+        path = tempd.write(name, '#!/bin/sh\necho {}\n'.format(name).encode())
+        os.chmod(path, 0o755)
+        commands[name] = path
+      with Replace('os.environ', {'WDIFFHTML_WDIFF': commands['env']}):
+        obj = Settings(b'a', b'b')
+        self.assertEqual(wdiff(obj), 'env\n')
+        obj = obj.replace(wdiff_cmd=commands['settings'])
+        self.assertEqual(wdiff(obj), 'settings\n')
+        self.assertEqual(
+          wdiff(obj, wdiff_cmd=commands['argument']), 'argument\n'
+        )
+
+
+class TestConcurrentRendering(TestCase):
+
+  THREADS = 8
+
+  ROUNDS = 400
+
+  def test_wrap_content(self):
+    obj = Settings('org.txt', 'new.txt')
+    # one render up front, so the first calls don't only race on the cache
+    exp_head = wrap_content('', obj).split('<!-- start of diff')[0]
+
+    def render(number):
+      content = 'Paragraph <ins>{0}</ins>\n\nnumber {0}'.format(number)
+      if number % 2:
+        return number, wrap_content(content, obj)
+      return number, ''.join(iter_wrap_content([content], obj))
+
+    with ThreadPoolExecutor(self.THREADS) as executor:
+      results = list(executor.map(render, range(self.ROUNDS)))
+    for number, html in results:
+      self.assertTrue(html.startswith(exp_head))
+      self.assertIn(
+        '<p>Paragraph <ins>{0}</ins></p>\n<p>number {0}</p>'.format(number),
+        html
+      )
+      self.assertEqual(html.count('<p>Paragraph'), 1)
+    self.assertEqual(obj.context['content'], '')
+
+  def test_wdiff(self):
+    base = Settings(b'', b'')
+
+    def render(number):
+      obj = base.replace(
+        'Just a test {}.'.format(number).encode('utf-8'),
+        'Just another test {}.'.format(number).encode('utf-8')
+      )
+      return number, wdiff(obj, True, backend='python')
+
+    with ThreadPoolExecutor(self.THREADS) as executor:
+      results = list(executor.map(render, range(self.ROUNDS // 4)))
+    for number, html in results:
+      self.assertIn(
+        'Just <del>a</del> <ins>another</ins> test {}.'.format(number), html
+      )
@@ -0,0 +1,41 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml.templates import TemplateCache
+
+
+class TestTemplateCache(TestCase):
+
+  def test_cached(self):
+    cache = TemplateCache()
+    template = cache.get('Hello {{ name }}!')
+    self.assertIs(cache.get('Hello {{ name }}!'), template)
+    self.assertEqual(template.render(name='World'), 'Hello World!')
+
+  def test_eviction(self):
+    cache = TemplateCache(size=2)
+    first = cache.get('1')
+    second = cache.get('2')
+    cache.get('1')
+    cache.get('3')
+    self.assertEqual(len(cache.templates), 2)
+    self.assertIs(cache.get('1'), first)
+    self.assertIsNot(cache.get('2'), second)
+
+  def test_bytecode(self):
+    with TempDirectory() as tempd:
+      cache = TemplateCache(directory=tempd.path)
+      cache.get('{{ 1 + 1 }}')
+      self.assertEqual(len(os.listdir(tempd.path)), 1)
+      cache = TemplateCache(directory=tempd.path)
+      cache.environment.compile = None  # must not be needed
+      self.assertEqual(cache.get('{{ 1 + 1 }}').render(), '2')
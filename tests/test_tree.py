@@ -0,0 +1,76 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+
+from unittest import TestCase
+
+from testfixtures import TempDirectory
+
+from wdiffhtml.batch import run_batch
+from wdiffhtml.tree import (
+  same_content,
+  compare_trees,
+  tree_jobs,
+  write_index,
+)
+
+
+class TestTree(TestCase):
+
+  def setUp(self):
+    self.tempd = TempDirectory()
+    write = self.tempd.write
+    write('org/same.txt', b'Same text.')
+    write('new/same.txt', b'Same text.')
+    write('org/docs/a.txt', b'Just a test.')
+    write('new/docs/a.txt', b'Just another test.')
+    write('org/docs/b.txt', b'abc')
+    write('new/docs/b.txt', b'abd')
+    write('org/gone.txt', b'Gone.')
+    write('new/sub/fresh.txt', b'Fresh.')
+    self.org = self.tempd.getpath('org')
+    self.new = self.tempd.getpath('new')
+
+  def tearDown(self):
+    self.tempd.cleanup()
+
+  def test_same_content(self):
+    path = self.tempd.getpath
+    self.assertTrue(same_content(path('org/same.txt'), path('new/same.txt')))
+    for name in ('docs/a.txt', 'docs/b.txt'):
+      self.assertFalse(same_content(path('org/' + name), path('new/' + name)))
+
+  def test_compare(self):
+    tree = compare_trees(self.org, self.new)
+    sep = os.sep
+    self.assertEqual(
+      tree.changed, ['docs{}a.txt'.format(sep), 'docs{}b.txt'.format(sep)]
+    )
+    self.assertEqual(tree.added, ['sub{}fresh.txt'.format(sep)])
+    self.assertEqual(tree.removed, ['gone.txt'])
+    self.assertEqual(tree.unchanged, ['same.txt'])
+
+  def test_reports(self):
+    out = self.tempd.getpath('out')
+    tree = compare_trees(self.org, self.new)
+    jobs = tree_jobs(tree, self.org, self.new, out)
+    results = list(run_batch(jobs, backend='python', workers=1))
+    self.assertEqual([result.returncode for result in results], [0, 0])
+    self.assertEqual(
+      self.tempd.read('out/docs/a.txt.html'),
+      b'Just <del>a</del> <ins>another</ins> test.'
+    )
+    index = write_index(
+      out, tree, results, {'org_filename': 'org', 'new_filename': 'new'}
+    )
+    with open(index, 'rb') as fh:
+      html = fh.read().decode('utf-8')
+    self.assertIn('<a href="docs/a.txt.html">', html)
+    self.assertIn('<ins>sub{}fresh.txt</ins>'.format(os.sep), html)
+    self.assertIn('<del>gone.txt</del>', html)
+    self.assertIn('1 unchanged files.', html)
+    self.assertNotIn('same.txt', html)
@@ -0,0 +1,147 @@
+# -*- coding: UTF-8 -*-
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import time
+
+from unittest import (
+  TestCase,
+  skipIf,
+)
+
+from testfixtures import (
+  TempDirectory,
+  Replace,
+)
+
+from wdiffhtml.chunked import (
+  _diff_block,
+  generate_chunked_wdiff,
+)
+from wdiffhtml.settings import Settings
+from wdiffhtml.utils import (
+  wrap_paragraphs,
+  wrap_content,
+)
+from wdiffhtml.watch import (
+  InotifyWatcher,
+  PollingWatcher,
+  ParagraphCache,
+  iter_changes,
+)
+
+try:
+  InotifyWatcher([os.curdir]).close()
+  HAVE_INOTIFY = True
+except (OSError, AttributeError, TypeError):
+  HAVE_INOTIFY = False
+
+
+class TestParagraphCache(TestCase):
+
+  ORG = (
+    b"First paragraph.\n\nSecond  one,\n  with two lines.\n\n"
+    b"Third one.\n\nFourth one.\n"
+  )
+
+  NEW = (
+    b"First paragraph.\n\nSecond  one,\n  with two lines.\n\n"
+    b"Third one, changed.\n\nFourth one.\n\nA fifth one.\n"
+  )
+
+  def test_same_as_chunked(self):
+    cache = ParagraphCache(backend='python')
+    for org, new in ((self.ORG, self.NEW), (self.NEW, self.ORG)):
+      exp = generate_chunked_wdiff(org, new, backend='python', workers=1)
+      self.assertEqual(''.join(cache.iter_wdiff(org, new)), exp)
+      for hard_breaks in (False, True):
+        self.assertEqual(
+          ''.join(cache.iter_wrap(org, new, hard_breaks)),
+          wrap_paragraphs(exp, hard_breaks)
+        )
+
+  def test_render(self):
+    settings = Settings(self.ORG, self.NEW)
+    cache = ParagraphCache(backend='python')
+    exp = wrap_content(
+      generate_chunked_wdiff(self.ORG, self.NEW, backend='python'), settings
+    )
+    self.assertEqual(''.join(cache.iter_render(settings, True)), exp)
+
+  def test_reuse(self):
+    diffed = []
+
+    def diff_block(job):
+      diffed.append(job[:2])
+      return _diff_block(job)
+
+    cache = ParagraphCache(backend='python')
+    with Replace('wdiffhtml.watch._diff_block', diff_block):
+      ''.join(cache.iter_wrap(self.ORG, self.NEW))
+      self.assertEqual((cache.hits, cache.misses), (0, 5))
+      self.assertEqual(len(diffed), 2)  # the changed and the added one
+      # only the changed paragraph is diffed again
+      new = self.NEW.replace(b'changed', b'changed again')
+      res = ''.join(cache.iter_wrap(self.ORG, new))
+      self.assertEqual((cache.hits, cache.misses), (4, 1))
+      self.assertEqual(
+        diffed[2:], [(b'Third one.', b'Third one, changed again.')]
+      )
+      self.assertEqual(res, wrap_paragraphs(
+        generate_chunked_wdiff(self.ORG, new, backend='python')
+      ))
+      # nothing changed
+      ''.join(cache.iter_wrap(self.ORG, new))
+      self.assertEqual((cache.hits, cache.misses), (5, 0))
+      self.assertEqual(len(diffed), 3)
+
+
+class FakeWatcher(object):
+
+  def __init__(self, events):
+    self.events = list(events)
+    self.closed = False
+
+  def wait(self, timeout=None):
+    return self.events.pop(0) if self.events else False
+
+  def close(self):
+    self.closed = True
+
+
+class TestWatchers(TestCase):
+
+  def check_watcher(self, watcher_class):
+    with TempDirectory() as tempd:
+      path = tempd.write('org.txt', b'first')
+      watcher = watcher_class([path])
+      try:
+        self.assertFalse(watcher.wait(0.05))
+        time.sleep(0.01)
+        tempd.write('other.txt', b'other')
+        self.assertFalse(watcher.wait(0.05))
+        tempd.write('org.txt', b'second version')
+        self.assertTrue(watcher.wait(2))
+      finally:
+        watcher.close()
+
+  def test_polling(self):
+    self.check_watcher(lambda paths: PollingWatcher(paths, 0.01))
+
+  @skipIf(not HAVE_INOTIFY, "inotify is not available")
+  def test_inotify(self):
+    self.check_watcher(InotifyWatcher)
+
+  def test_debounce(self):
+    # the initial change, then two more within the debounce period
+    watcher = FakeWatcher([True, True, True, False, True, False])
+    changes = iter_changes(['org.txt'], watcher=watcher)
+    next(changes)
+    self.assertEqual(watcher.events, [True, False])
+    next(changes)
+    self.assertEqual(watcher.events, [])
+    changes.close()
+    self.assertTrue(watcher.closed)
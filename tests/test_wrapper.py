@@ -6,9 +6,17 @@ from __future__ import print_function
 
 from unittest import TestCase
 
+from wdiffhtml import stream_wdiff
+from wdiffhtml.settings import Settings
 from wdiffhtml.utils import (
   build_paragraph,
+  iter_paragraphs,
+  iter_wrap_paragraphs,
   wrap_paragraphs,
+  iter_wrap_changes,
+  wrap_changes,
+  iter_wrap_content,
+  wrap_content,
 )
 
 
@@ -72,3 +80,137 @@ class TestWrapParagraphs(TestCase):
     )
     res = wrap_paragraphs(content, hard_breaks=False)
     self.assertEqual(res, exp)
+
+  def test_blank_lines(self):
+    content = "  Lorem\n \t \nipsum  \n\n\ndolor\r\n\n\n\nsit\n"
+    exp = '<p>Lorem\nipsum</p>\n<p>dolor</p>\n<p>sit</p>'
+    self.assertEqual(wrap_paragraphs(content), exp)
+    exp = '<p>Lorem<br />\nipsum</p>\n<p>dolor</p>\n<p>sit</p>'
+    self.assertEqual(wrap_paragraphs(content, hard_breaks=True), exp)
+
+  def test_empty(self):
+    self.assertEqual(wrap_paragraphs(''), '')
+    self.assertEqual(wrap_paragraphs(' \n\n \n'), '')
+
+
+class TestParagraphs(TestCase):
+
+  CONTENT = (
+    "\n\nLorem ipsum dolor sit amet,\n  consectetur adipisicing elit.\n\n"
+    "Veniam <ins>soluta</ins> impedit.\n \n\n\nDolores quae doloribus\n"
+  )
+
+  def test_paragraphs(self):
+    self.assertEqual(list(iter_paragraphs([self.CONTENT])), [
+      ('Lorem ipsum dolor sit amet,', 'consectetur adipisicing elit.'),
+      ('Veniam <ins>soluta</ins> impedit.',),
+      ('Dolores quae doloribus',),
+    ])
+
+
+class TestStreaming(TestCase):
+
+  CONTENT = (
+    "\n\nLorem ipsum dolor sit amet,\n  consectetur adipisicing elit.\n\n"
+    "Veniam <ins>soluta</ins> impedit.\n\n\n\nDolores quae doloribus\n"
+  )
+
+  def chunked(self, size):
+    return [
+      self.CONTENT[i:i + size] for i in range(0, len(self.CONTENT), size)
+    ]
+
+  def test_paragraphs(self):
+    for hard_breaks in (False, True):
+      exp = wrap_paragraphs(self.CONTENT, hard_breaks)
+      for size in range(1, len(self.CONTENT) + 1):
+        res = ''.join(iter_wrap_paragraphs(self.chunked(size), hard_breaks))
+        self.assertEqual(res, exp)
+
+  def test_content(self):
+    settings = Settings('org.txt', 'new.txt')
+    res = ''.join(iter_wrap_content(self.chunked(7), settings))
+    exp = wrap_content(self.CONTENT, settings)
+    self.assertEqual(res, exp)
+
+
+class TestWrapChanges(TestCase):
+
+  CONTENT = (
+    "a\n\nb <ins>x</ins>\n\nc\n\nd\n\ne\n\nf <del>y</del>\n\ng\n\n"
+    "h\n\ni"
+  )
+
+  def test_context(self):
+    res = wrap_changes(self.CONTENT, context=1)
+    exp = (
+      '<p>a</p>\n<p>b <ins>x</ins></p>\n<p>c</p>\n'
+      '<div class="skipped"><template>\n<p>d</p>\n</template>'
+      '<button data-count="1">1 unchanged paragraph</button></div>\n'
+      '<p>e</p>\n<p>f <del>y</del></p>\n<p>g</p>\n'
+      '<div class="skipped"><template>\n<p>h</p>\n<p>i</p>\n</template>'
+      '<button data-count="2">2 unchanged paragraphs</button></div>'
+    )
+    self.assertEqual(res, exp)
+
+  def test_no_expand(self):
+    res = wrap_changes(self.CONTENT, context=0, expand=False)
+    exp = (
+      '<div class="skipped" data-count="1"><span>1 unchanged paragraph'
+      '</span></div>\n<p>b <ins>x</ins></p>\n'
+      '<div class="skipped" data-count="3"><span>3 unchanged paragraphs'
+      '</span></div>\n<p>f <del>y</del></p>\n'
+      '<div class="skipped" data-count="3"><span>3 unchanged paragraphs'
+      '</span></div>'
+    )
+    self.assertEqual(res, exp)
+
+  def test_overlapping_context(self):
+    res = wrap_changes(self.CONTENT, context=2)
+    self.assertEqual(res.count('class="skipped"'), 1)
+    self.assertTrue(res.startswith('<p>a</p>\n'))
+
+  def test_expanded_content(self):
+    # the paragraphs are only moved into the placeholders
+    res = wrap_changes(self.CONTENT, context=0)
+    for para in 'acdeghi':
+      self.assertIn('<p>{}</p>'.format(para), res)
+
+  def test_folded_tags(self):
+    content = "a <ins>x\n\nb\n\nc</ins>\n\nd"
+    res = wrap_changes(content, context=0, expand=False)
+    exp = '<p>a <ins>x</p>\n<p>b</p>\n<p>c</ins></p>\n<div class="skipped"'
+    self.assertTrue(res.startswith(exp))
+    self.assertIn('1 unchanged paragraph<', res)
+
+  def test_unchanged(self):
+    res = wrap_changes("a\n\nb", context=5, expand=False)
+    self.assertEqual(
+      res,
+      '<div class="skipped" data-count="2"><span>2 unchanged paragraphs'
+      '</span></div>'
+    )
+    self.assertEqual(wrap_changes(''), '')
+
+  def test_streaming(self):
+    for expand in (False, True):
+      exp = wrap_changes(self.CONTENT, True, 1, expand)
+      for size in range(1, len(self.CONTENT) + 1):
+        chunks = [
+          self.CONTENT[i:i + size]
+          for i in range(0, len(self.CONTENT), size)
+        ]
+        res = ''.join(iter_wrap_changes(chunks, True, 1, expand))
+        self.assertEqual(res, exp)
+
+  def test_document(self):
+    org = b"one\n\ntwo\n\nthree\n\nfour\n\nfive"
+    new = b"one\n\ntwo\n\nthree\n\nfour\n\nsix"
+    settings = Settings(org, new)
+    res = ''.join(stream_wdiff(
+      settings, True, backend='python', context_paragraphs=1
+    ))
+    self.assertIn(
+      '<button data-count="3">3 unchanged paragraphs</button></div>\n'
+      '<p>four</p>\n<p><del>five</del> <ins>six</ins></p>', res
+    )
@@ -28,6 +28,46 @@ And to wrap it with HTML you can use `wrap_content` (which requires a
 You can combine those two trough the `wdiff` function, which also requires a
 `Settings` object and accepts some additional arguments.
 
+Texts which are already in memory can be compared without writing them to
+files first:
+
+>>> diff = diff_texts('Just a test.', 'Just another test.')
+
+For large documents, `write_wdiff` streams the results to a file object
+instead (the diff is read, wrapped and written paragraph by paragraph):
+
+>>> write_wdiff(sys.stdout, settings, wrap_with_html=True)
+
+`write_wdiff_bytes` writes to binary file objects (encoded as UTF-8) and
+can compress the results with gzip on the way:
+
+>>> with open('mydiff.html.gz', 'wb') as fh:
+...   write_wdiff_bytes(fh, settings, wrap_with_html=True, compresslevel=6)
+
+The inputs are expected to be UTF-8. Give the `encoding` of other files (or
+`auto` to detect it from a BOM or the contents):
+
+>>> diff = wdiff(settings, encoding='auto')
+
+If the `wdiff` command isn't available (or spawning a process for each diff
+is too slow), use the in-process engine instead:
+
+>>> diff = generate_wdiff(oldfile, newfile, backend='python')
+
+To count or store the changes, get them as structured operations, which
+can be rendered later on:
+
+>>> ops = diff_operations(oldfile, newfile)
+>>> ops.stats()['inserted']
+>>> data = ops.to_bytes()
+>>> diff = DiffOperations.from_bytes(data).render()
+
+In asyncio applications use the coroutines from `wdiffhtml.aio` (Python 3.7
+and above), which don't block the event loop:
+
+>>> from wdiffhtml.aio import agenerate_wdiff
+>>> diff = await agenerate_wdiff(oldfile, newfile)
+
 
 .. _wdiff: https://www.gnu.org/software/wdiff/
 
@@ -36,9 +76,26 @@ You can combine those two trough the `wdiff` function, which also requires a
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
-from .settings import Settings
+import functools
+import gzip
+
+from .operations import (
+  DiffOperations,
+  diff_operations,
+)
+from .settings import (
+  BACKEND_WDIFF,
+  Settings,
+)
+from .inputs import transcode_input
 from .utils import (
+  CHUNK_SIZE,
+  iter_wdiff_bytes,
+  iter_wdiff,
   generate_wdiff,
+  diff_texts,
+  iter_wrap_changes,
+  iter_wrap_content,
   wrap_content,
 )
 
@@ -46,8 +103,18 @@ from .utils import (
 __all__ = [
   'Settings',
   'wdiff',
+  'stream_wdiff',
+  'stream_wdiff_bytes',
+  'write_wdiff',
+  'write_wdiff_bytes',
+  'iter_wdiff_bytes',
+  'iter_wdiff',
   'generate_wdiff',
+  'diff_texts',
+  'iter_wrap_content',
   'wrap_content',
+  'DiffOperations',
+  'diff_operations',
 ]
 
 __version__ = '0.6.1'
@@ -60,7 +127,9 @@ __license__ = (
 
 
 def wdiff(
-  settings, wrap_with_html=False, fold_breaks=False, hard_breaks=False
+  settings, wrap_with_html=False, fold_breaks=False, hard_breaks=False,
+  backend=BACKEND_WDIFF, wdiff_cmd=None, cache=None, profiler=None,
+  encoding=None
 ):
   """
   Returns the results of `wdiff` in a HTML compatible format.
@@ -75,9 +144,178 @@ def wdiff(
 
   If *hard_breaks* is set, line breaks are replaced with `<br />` tags.
 
+  The *backend* selects the diff engine (`wdiff` or `python`) and
+  *wdiff_cmd* the `wdiff` command to use (name or path, the one from
+  *settings* if not given).
+
+  If a *cache* (:cls:`cache.DiffCache`) is given, diff results are reused
+  from it.
+
+  A :cls:`profiling.Profiler` passed in as *profiler* records the time, data
+  and memory used by each stage.
+
+  The files are expected to be UTF-8, unless their *encoding* is given
+  (`auto` to detect it, see :func:`inputs.transcode_input`).
+
   """
-  diff = generate_wdiff(settings.org_file, settings.new_file, fold_breaks)
+  if wdiff_cmd is None:
+    wdiff_cmd = settings.wdiff_cmd
+  diff = generate_wdiff(
+    settings.org_file, settings.new_file, fold_breaks,
+    backend=backend, wdiff_cmd=wdiff_cmd, cache=cache, profiler=profiler,
+    encoding=encoding
+  )
   if wrap_with_html:
-    return wrap_content(diff, settings, hard_breaks)
+    return wrap_content(diff, settings, hard_breaks, profiler=profiler)
   else:
     return diff
+
+
+def stream_wdiff(
+  settings, wrap_with_html=False, fold_breaks=False, hard_breaks=False,
+  backend=BACKEND_WDIFF, wdiff_cmd=None, cache=None, template=None,
+  wrapper=None, chunked=False, workers=None, profiler=None, max_memory=None,
+  context_paragraphs=None, expand_context=True, encoding=None,
+  base_index=None
+):
+  """
+  Yields the results of :func:`wdiff` in chunks of text.
+
+  The arguments are the same as for :func:`wdiff`. A precompiled *template*
+  can be passed in, else the one from *settings* is compiled. The
+  paragraphs are wrapped by *wrapper* (see :func:`iter_wrap_content`).
+
+  If *chunked* is set, the paragraphs are aligned first and only the changed
+  ones are diffed, on *workers* processes (see :mod:`chunked`, the *cache*
+  is not used then).
+
+  *max_memory* sets a memory ceiling (in bytes) for huge inputs. It implies
+  *chunked*: input files are memory mapped and changed blocks too large for
+  the ceiling are diffed in pieces (inputs which have to be converted from
+  another *encoding* are read into memory, though).
+
+  If *context_paragraphs* is set (and no *wrapper* is given), only the
+  changed paragraphs and that many unchanged ones around them are wrapped,
+  the others are replaced by placeholders, which can be expanded again
+  unless *expand_context* is `False` (see :func:`utils.iter_wrap_changes`).
+
+  A *base_index* (:cls:`engine.BaseIndex`) of the original file saves
+  tokenizing it again, when it's diffed against many revisions (see
+  :func:`utils.iter_wdiff_bytes`).
+
+  """
+  if wdiff_cmd is None:
+    wdiff_cmd = settings.wdiff_cmd
+  if wrapper is None and context_paragraphs is not None:
+    wrapper = functools.partial(
+      iter_wrap_changes, context=context_paragraphs, expand=expand_context
+    )
+  if chunked or max_memory:
+    from .chunked import iter_chunked_wdiff
+    chunks = iter_chunked_wdiff(
+      transcode_input(settings.org_file, encoding),
+      transcode_input(settings.new_file, encoding), fold_breaks,
+      backend=backend, wdiff_cmd=wdiff_cmd, workers=workers,
+      max_memory=max_memory
+    )
+    if profiler is not None:
+      chunks = profiler.iter_stage('diff', chunks)
+  else:
+    chunks = iter_wdiff(
+      settings.org_file, settings.new_file, fold_breaks,
+      backend=backend, wdiff_cmd=wdiff_cmd, cache=cache, profiler=profiler,
+      encoding=encoding, base_index=base_index
+    )
+  if wrap_with_html:
+    chunks = iter_wrap_content(
+      chunks, settings, hard_breaks, template, wrapper, profiler
+    )
+  for chunk in chunks:
+    yield chunk
+
+
+def stream_wdiff_bytes(
+  settings, wrap_with_html=False, fold_breaks=False, hard_breaks=False,
+  backend=BACKEND_WDIFF, wdiff_cmd=None, cache=None, template=None,
+  wrapper=None, chunked=False, workers=None, profiler=None, max_memory=None,
+  context_paragraphs=None, expand_context=True, encoding=None,
+  base_index=None
+):
+  """
+  Yields the results of :func:`wdiff` encoded as UTF-8 in chunks of bytes.
+
+  The plain diff (without *wrap_with_html*, *chunked* or *max_memory*) is
+  passed through from the diff engine as it is, without decoding it. The
+  arguments are the same as for :func:`stream_wdiff`.
+
+  """
+  if wdiff_cmd is None:
+    wdiff_cmd = settings.wdiff_cmd
+  if not (wrap_with_html or chunked or max_memory):
+    for chunk in iter_wdiff_bytes(
+      settings.org_file, settings.new_file, fold_breaks,
+      backend=backend, wdiff_cmd=wdiff_cmd, cache=cache, profiler=profiler,
+      encoding=encoding, base_index=base_index
+    ):
+      yield chunk
+    return
+  chunks = stream_wdiff(
+    settings, wrap_with_html, fold_breaks, hard_breaks, backend, wdiff_cmd,
+    cache, template, wrapper, chunked, workers, profiler, max_memory,
+    context_paragraphs, expand_context, encoding, base_index
+  )
+  # small chunks are joined first, to encode and write them in one go
+  pending = []
+  size = 0
+  for chunk in chunks:
+    pending.append(chunk)
+    size += len(chunk)
+    if size >= CHUNK_SIZE:
+      yield ''.join(pending).encode('utf-8')
+      pending = []
+      size = 0
+  if pending:
+    yield ''.join(pending).encode('utf-8')
+
+
+def write_wdiff(fh, settings, *args, **kwargs):
+  """
+  Writes the results of :func:`wdiff` to the file object *fh* as they are
+  produced.
+
+  The other arguments are the same as for :func:`stream_wdiff`.
+
+  """
+  profiler = kwargs.get('profiler')
+  if profiler is None:
+    for chunk in stream_wdiff(settings, *args, **kwargs):
+      fh.write(chunk)
+    return
+  for chunk in stream_wdiff(settings, *args, **kwargs):
+    with profiler.stage('write', chunk):
+      fh.write(chunk)
+
+
+def write_wdiff_bytes(fh, settings, *args, **kwargs):
+  """
+  Writes the results of :func:`wdiff` encoded as UTF-8 to the binary file
+  object *fh* as they are produced (see :func:`stream_wdiff_bytes`).
+
+  If *compresslevel* (`1` to `9`) is given, the results are gzip compressed
+  with that level. The other arguments are the same as for
+  :func:`stream_wdiff`.
+
+  """
+  compresslevel = kwargs.pop('compresslevel', None)
+  if compresslevel is not None:
+    with gzip.GzipFile('', 'wb', compresslevel, fh) as gzip_fh:
+      write_wdiff_bytes(gzip_fh, settings, *args, **kwargs)
+    return
+  profiler = kwargs.get('profiler')
+  if profiler is None:
+    for chunk in stream_wdiff_bytes(settings, *args, **kwargs):
+      fh.write(chunk)
+    return
+  for chunk in stream_wdiff_bytes(settings, *args, **kwargs):
+    with profiler.stage('write', chunk):
+      fh.write(chunk)
@@ -11,8 +11,8 @@ from __future__ import unicode_literals
 
 import sys
 
-from .cli import main
+from .cli import run_cli
 
 
 if __name__ == '__main__':
-  sys.exit(main())
+  sys.exit(run_cli())
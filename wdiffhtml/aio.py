@@ -0,0 +1,242 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Asyncio counterparts of :func:`utils.generate_wdiff` and :func:`wdiff`.
+
+The `wdiff` command is run with :func:`asyncio.create_subprocess_exec` and
+the in-process engine in an executor, so diffs don't block the event loop.
+At most :func:`get_concurrency` diffs run at the same time (per event loop),
+the others wait for a free slot::
+
+  set_concurrency(4)
+  diffs = await asyncio.gather(*[
+    agenerate_wdiff(org, new) for org, new in pairs
+  ])
+
+By default the engine runs in the loop's default executor (threads). As it
+holds the GIL, pass a :cls:`concurrent.futures.ProcessPoolExecutor` as
+*executor* to spread CPU bound diffs over more cores.
+
+This module requires Python 3.7 and isn't imported by the package.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import asyncio
+import functools
+import os
+import weakref
+
+from .engine import iter_pydiff
+from .inputs import (
+  load_input,
+  input_path,
+)
+from .settings import (
+  BACKEND_WDIFF,
+  BACKEND_PYTHON,
+  BACKENDS,
+)
+from .utils import (
+  find_wdiff,
+  check_wdiff_returncode,
+  wdiff_command,
+  wrap_content,
+)
+
+
+__all__ = [
+  'set_concurrency',
+  'get_concurrency',
+  'agenerate_wdiff',
+  'awdiff',
+]
+
+
+_LIMIT = [os.cpu_count() or 1]
+
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+
+def set_concurrency(limit):
+  """
+  Sets the maximum number of diffs running at the same time (per event
+  loop) to *limit*.
+
+  """
+  if limit < 1:
+    raise ValueError("the concurrency limit must be at least 1")
+  _LIMIT[0] = limit
+  _SEMAPHORES.clear()
+
+
+def get_concurrency():
+  """
+  Returns the maximum number of diffs running at the same time (per event
+  loop), the number of CPUs by default.
+
+  """
+  return _LIMIT[0]
+
+
+def _get_semaphore(loop):
+  """
+  Returns the semaphore limiting the diffs running on *loop*.
+
+  """
+  try:
+    return _SEMAPHORES[loop]
+  except KeyError:
+    semaphore = _SEMAPHORES[loop] = asyncio.Semaphore(_LIMIT[0])
+    return semaphore
+
+
+def _pydiff(org_file, new_file, fold_tags, html):
+  """
+  Returns the raw output of the in-process engine (picklable, to be run in
+  a process pool).
+
+  """
+  return b''.join(iter_pydiff(org_file, new_file, fold_tags, html))
+
+
+async def _run_wdiff(org_file, new_file, fold_tags, html, wdiff_cmd):
+  """
+  Returns the raw output of the `wdiff` command.
+
+  Raises:
+
+    CalledProcessError: if `wdiff` failed.
+
+  """
+  with input_path(org_file) as (org_path, org_fds):
+    with input_path(new_file) as (new_path, new_fds):
+      cmd = wdiff_command(org_path, new_path, fold_tags, html, wdiff_cmd)
+      proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, pass_fds=org_fds + new_fds
+      )
+      try:
+        output, _ = await proc.communicate()
+      except asyncio.CancelledError:
+        if proc.returncode is None:
+          proc.kill()
+          await proc.wait()
+        raise
+  check_wdiff_returncode(proc.returncode, cmd, output)
+  return output
+
+
+async def _diff_bytes(
+  loop, org_file, new_file, fold_tags, html, backend, wdiff_cmd, executor
+):
+  """
+  Returns the raw output of the selected *backend*.
+
+  """
+  if backend == BACKEND_PYTHON:
+    return await loop.run_in_executor(executor, functools.partial(
+      _pydiff, org_file, new_file, fold_tags, html
+    ))
+  return await _run_wdiff(org_file, new_file, fold_tags, html, wdiff_cmd)
+
+
+def _read_cache(cache, key):
+  """
+  Returns the result cached under *key* as bytes (`None` on a miss).
+
+  """
+  chunks = cache.iter_get(key)
+  if chunks is None:
+    return None
+  return b''.join(chunks)
+
+
+async def _cached_diff_bytes(
+  loop, org_file, new_file, fold_tags, html, backend, wdiff_cmd, cache,
+  executor
+):
+  """
+  Returns the raw output of the selected *backend* from the *cache* (a
+  :cls:`cache.DiffCache`) if possible and stores it there otherwise.
+
+  The inputs are hashed and the cache is read and written in the default
+  executor.
+
+  """
+  if backend == BACKEND_PYTHON:
+    wdiff_path = None
+  elif backend in BACKENDS:
+    wdiff_path = wdiff_cmd = find_wdiff(wdiff_cmd)
+  else:
+    raise ValueError("unknown backend: {}".format(backend))
+  if cache is None:
+    return await _diff_bytes(
+      loop, org_file, new_file, fold_tags, html, backend, wdiff_cmd, executor
+    )
+  key = await loop.run_in_executor(None, functools.partial(
+    cache.key, org_file, new_file, fold_tags, html, backend, wdiff_path
+  ))
+  output = await loop.run_in_executor(None, _read_cache, cache, key)
+  if output is not None:
+    return output
+  output = await _diff_bytes(
+    loop, org_file, new_file, fold_tags, html, backend, wdiff_cmd, executor
+  )
+  await loop.run_in_executor(None, b''.join, cache.iter_set(key, [output]))
+  return output
+
+
+async def agenerate_wdiff(
+  org_file, new_file, fold_tags=False, html=True, backend=BACKEND_WDIFF,
+  wdiff_cmd=None, cache=None, executor=None
+):
+  """
+  Returns the results from the `wdiff` command as a string.
+
+  The arguments are the same as for :func:`utils.generate_wdiff`. The
+  `python` backend runs in *executor* (the loop's default executor if not
+  given).
+
+  Raises:
+
+    ValueError: on an unknown *backend*
+    WdiffNotFoundError: if ``wdiff`` is not found.
+
+  """
+  loop = asyncio.get_running_loop()
+  org_file = load_input(org_file)
+  new_file = load_input(new_file)
+  async with _get_semaphore(loop):
+    output = await _cached_diff_bytes(
+      loop, org_file, new_file, fold_tags, html, backend, wdiff_cmd, cache,
+      executor
+    )
+  return output.decode('utf-8')
+
+
+async def awdiff(
+  settings, wrap_with_html=False, fold_breaks=False, hard_breaks=False,
+  backend=BACKEND_WDIFF, wdiff_cmd=None, cache=None, executor=None
+):
+  """
+  Returns the results of `wdiff` in a HTML compatible format.
+
+  The arguments are the same as for :func:`wdiff` (and *executor* as for
+  :func:`agenerate_wdiff`). The diff is wrapped in the default executor.
+
+  """
+  if wdiff_cmd is None:
+    wdiff_cmd = settings.wdiff_cmd
+  diff = await agenerate_wdiff(
+    settings.org_file, settings.new_file, fold_breaks,
+    backend=backend, wdiff_cmd=wdiff_cmd, cache=cache, executor=executor
+  )
+  if wrap_with_html:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+      None, wrap_content, diff, settings, hard_breaks
+    )
+  else:
+    return diff
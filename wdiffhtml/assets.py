@@ -0,0 +1,234 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Shared CSS and Javascript for the HTML documents.
+
+By default the stylesheet and scripts are included in each document. When
+many documents are published, they can be written to a directory once
+instead (named after a hash of their content, so they can be cached
+forever) and linked from the documents, by setting the `css_url`, `js_url`
+and `js2_url` context variables (see :func:`asset_urls`).
+
+Both variants can be minified.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import re
+import tempfile
+
+from collections import OrderedDict
+
+from .settings import load_from_resource
+
+
+__all__ = [
+  'minify_css',
+  'minify_js',
+  'load_assets',
+  'hashed_name',
+  'write_assets',
+  'asset_urls',
+]
+
+
+# context variable -> resource (in the order they are loaded)
+ASSETS = OrderedDict([
+  ('css', 'styles.css'),
+  ('js2', 'secondary.js'),
+  ('js', 'main.js'),
+])
+
+HASH_LENGTH = 12
+
+_replace = getattr(os, 'replace', os.rename)
+
+_CSS_COMMENTS = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+_CSS_SPACE = re.compile(r'\s+')
+
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+_JS_TOKENS = re.compile(r'\\[^\n]|//|/\*|\*/|\$\{|[`\'"{}\n]')
+
+# the end of string literals and comments
+_JS_CLOSE = {'"': '"', "'": "'", '//': None, '/*': '*/'}
+
+# the ones which can span lines
+_JS_OPEN = ('"', "'", '/*')
+
+
+def minify_css(text):
+  """
+  Returns the CSS *text* without comments and unneeded whitespace.
+
+  """
+  text = _CSS_COMMENTS.sub('', text)
+  text = _CSS_SPACE.sub(' ', text)
+  text = _CSS_PUNCTUATION.sub(r'\1', text)
+  return text.replace(';}', '}').strip()
+
+
+def _iter_js_lines(text):
+  """
+  Yields the lines of the Javascript *text*, each with two flags: if it
+  starts and if it ends within a string or template literal (or a block
+  comment).
+
+  """
+  stack = []  # open template literals and braces (in their expressions)
+  quote = None  # open string literal or comment
+  start = 0
+  starts_inside = False
+  for match in _JS_TOKENS.finditer(text):
+    token = match.group()
+    if token == '\n':
+      if quote == '//':
+        quote = None
+      ends_inside = quote in _JS_OPEN or stack[-1:] == ['`']
+      yield text[start:match.start()], starts_inside, ends_inside
+      start = match.end()
+      starts_inside = ends_inside
+    elif quote:
+      if token == _JS_CLOSE.get(quote):
+        quote = None
+    elif stack[-1:] == ['`']:
+      if token == '`':
+        stack.pop()
+      elif token == '${':
+        stack.append('{')
+    elif token in _JS_CLOSE:
+      quote = token
+    elif token == '`':
+      stack.append('`')
+    elif token in ('{', '${'):
+      stack.append('{')
+    elif token == '}' and stack:
+      stack.pop()
+  yield text[start:], starts_inside, False
+
+
+def minify_js(text):
+  """
+  Returns the Javascript *text* without indentation, blank lines and lines
+  with only a comment.
+
+  Lines within string and template literals (or block comments) are kept
+  as they are, and statements are left alone. Regular expression literals
+  aren't recognized though, so a quote or backtick in one can make the
+  rest of the script look like a literal (which is then left as it is).
+
+  """
+  lines = []
+  for line, starts_inside, ends_inside in _iter_js_lines(text):
+    if not starts_inside:
+      line = line.lstrip()
+      if not line or line.startswith('//'):
+        continue
+    if not ends_inside:
+      line = line.rstrip()
+    lines.append(line)
+  return '\n'.join(lines)
+
+
+def _minify(key, text):
+  if key == 'css':
+    return minify_css(text)
+  return minify_js(text)
+
+
+def load_assets(context=None, minify=False):
+  """
+  Returns a dictionary with the CSS and Javascript (keyed by their context
+  variable), taken from *context* if set there, else from the resources.
+
+  """
+  context = context or {}
+  assets = OrderedDict()
+  for key, name in ASSETS.items():
+    text = context.get(key)
+    if text is None:
+      text = load_from_resource(name)
+    assets[key] = _minify(key, text) if minify else text
+  return assets
+
+
+def hashed_name(name, data):
+  """
+  Returns the file name *name* with a hash of *data* (bytes) added in front
+  of the extension.
+
+  """
+  digest = hashlib.sha1(data).hexdigest()[:HASH_LENGTH]
+  root, ext = os.path.splitext(name)
+  return '{}.{}{}'.format(root, digest, ext)
+
+
+def _write_file(path, data):
+  """
+  Writes *data* to *path* at once (through a temporary file).
+
+  """
+  directory = os.path.dirname(path)
+  fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.wdiffhtml-')
+  try:
+    with os.fdopen(fd, 'wb') as fh:
+      fh.write(data)
+    mask = os.umask(0)
+    os.umask(mask)
+    os.chmod(temp_path, 0o666 & ~mask)
+    _replace(temp_path, path)
+  finally:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+
+
+def write_assets(directory, context=None, minify=False):
+  """
+  Writes the assets (see :func:`load_assets`) to *directory* and returns
+  a dictionary with their paths (keyed by their context variable).
+
+  The file names contain a hash of the content, so files which already
+  exist are not written again.
+
+  """
+  try:
+    os.makedirs(directory)
+  except OSError:
+    if not os.path.isdir(directory):
+      raise
+  paths = OrderedDict()
+  for key, text in load_assets(context, minify).items():
+    data = text.encode('utf-8')
+    path = os.path.join(directory, hashed_name(ASSETS[key], data))
+    if not os.path.exists(path):
+      _write_file(path, data)
+    paths[key] = path
+  return paths
+
+
+def asset_urls(paths, output=None, base_url=None):
+  """
+  Returns the context variables (`css_url`, …) linking the assets *paths*
+  (from :func:`write_assets`).
+
+  The URLs start with *base_url* if given, else they are relative to the
+  directory of the document *output* (or the working directory).
+
+  """
+  if output:
+    start = os.path.dirname(os.path.abspath(output))
+  else:
+    start = os.getcwd()
+  urls = {}
+  for key, path in paths.items():
+    if base_url:
+      url = '{}/{}'.format(base_url.rstrip('/'), os.path.basename(path))
+    else:
+      url = os.path.relpath(path, start).replace(os.sep, '/')
+    urls[key + '_url'] = url
+  return urls
@@ -0,0 +1,298 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Diff many file pairs in one go.
+
+A *manifest* lists the pairs along with the file to write each result to.
+It's either CSV (``org,new,output`` per row) or JSON lines (objects with
+the keys ``org``, ``new`` and ``output``). The pairs are processed by a
+pool of worker processes, which load the settings and the template only
+once.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import subprocess as sub
+
+from collections import namedtuple
+from concurrent.futures import (
+  ProcessPoolExecutor,
+  as_completed,
+)
+
+from . import write_wdiff_bytes
+from .assets import asset_urls
+from .cache import DiffCache
+from .exceptions import (
+  WdiffNotFoundError,
+  ContextError,
+  ManifestError,
+)
+from .settings import (
+  BACKEND_WDIFF,
+  GZIP_SUFFIX,
+  GZIP_LEVEL,
+  Settings,
+)
+from .templates import (
+  configure_template_cache,
+  get_template,
+)
+
+
+__all__ = [
+  'Job',
+  'Result',
+  'read_manifest',
+  'run_batch',
+]
+
+
+Job = namedtuple('Job', 'org_file new_file output context')
+
+# the context of a job (added to the shared one) is optional
+Job.__new__.__defaults__ = (None,)
+
+Result = namedtuple('Result', 'job returncode error duration cached')
+
+MANIFEST_KEYS = ('org', 'new', 'output')
+
+_WORKER = {}
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def read_manifest(fh):
+  """
+  Returns a list of :cls:`Job` tuples read from the manifest *fh*.
+
+  JSON lines are used if the first non blank character is a ``{``, CSV
+  otherwise (an optional header row ``org,new,output`` is skipped).
+
+  Raises:
+
+    ManifestError: on malformed entries.
+
+  """
+  text = fh.read()
+  if text.lstrip().startswith('{'):
+    rows = []
+    for number, line in enumerate(text.splitlines(), 1):
+      if not line.strip():
+        continue
+      try:
+        entry = json.loads(line)
+        rows.append([entry[key] for key in MANIFEST_KEYS])
+      except (ValueError, KeyError, TypeError) as error:
+        msg = "line {}: {}".format(number, error)
+        raise ManifestError(msg)
+  else:
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    if rows and tuple(rows[0]) == MANIFEST_KEYS:
+      rows = rows[1:]
+  jobs = []
+  for number, row in enumerate(rows, 1):
+    if len(row) != 3:
+      msg = "entry {}: expected 3 fields, got {}".format(number, len(row))
+      raise ManifestError(msg)
+    jobs.append(Job(*row))
+  return jobs
+
+
+def _size(job):
+  """
+  Returns the combined size of the files (or contents) of *job* (`0` if
+  missing).
+
+  """
+  size = 0
+  for filename in (job.org_file, job.new_file):
+    if isinstance(filename, bytes):  # contents
+      size += len(filename)
+      continue
+    try:
+      size += os.path.getsize(filename)
+    except (OSError, ValueError):
+      pass
+  return size
+
+
+def _init_worker(context, options):
+  """
+  Loads the settings and compiles the template once per worker process.
+
+  An error raised while doing so doesn't break the pool; it is stored and
+  reported as the result of each job the worker gets.
+
+  """
+  _WORKER['context'] = context
+  _WORKER['options'] = options
+  _WORKER['cache'] = None
+  _WORKER['error'] = None
+  cache_dir = options['cache_dir']
+  try:
+    settings = Settings(os.devnull, os.devnull, **context)
+    if cache_dir:
+      _WORKER['cache'] = DiffCache(os.path.join(cache_dir, 'diffs'))
+    if options['wrap_with_html']:
+      if cache_dir:
+        configure_template_cache(
+          directory=os.path.join(cache_dir, 'templates')
+        )
+      get_template(settings.template)
+  except Exception as err:
+    _WORKER['error'] = err
+
+
+def _process(job):
+  """
+  Diffs the files of *job*, writes the results and returns a
+  :cls:`Result`.
+
+  The output file is replaced at once, when the results are complete; it's
+  left alone if the job fails.
+
+  The return codes are the same as the ones from :func:`cli.run_cli`;
+  unexpected errors (including ones from :func:`_init_worker`) return 1.
+
+  """
+  options = _WORKER['options']
+  cache = _WORKER['cache']
+  hits = cache.hits if cache else 0
+  start = time.time()
+  try:
+    if _WORKER['error'] is not None:
+      raise _WORKER['error']
+    context = dict(_WORKER['context'])
+    if job.context:
+      context.update(job.context)
+    if options['assets']:
+      context.update(asset_urls(
+        options['assets'], job.output, options['assets_url']
+      ))
+    settings = Settings(job.org_file, job.new_file, **context)
+    compresslevel = None
+    if options['gzip'] or job.output.endswith(GZIP_SUFFIX):
+      compresslevel = options['gzip_level']
+    directory = os.path.dirname(os.path.abspath(job.output))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.wdiffhtml-')
+    try:
+      with io.open(fd, 'wb') as fh:
+        write_wdiff_bytes(
+          fh, settings, options['wrap_with_html'], options['fold_tags'],
+          options['hard_breaks'], options['backend'], options['wdiff_cmd'],
+          cache, compresslevel=compresslevel,
+          context_paragraphs=options['context_paragraphs'],
+          expand_context=options['expand_context'],
+          encoding=options['encoding'], base_index=options['base_index']
+        )
+      os.chmod(temp_path, 0o666 & ~options['umask'])
+      _replace(temp_path, job.output)
+    finally:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+    returncode, error = 0, None
+  except ContextError as err:
+    returncode, error = 1, err
+  except WdiffNotFoundError as err:
+    returncode, error = 2, err
+  except (sub.CalledProcessError, EnvironmentError) as err:
+    returncode, error = 3, err
+  except Exception as err:
+    returncode, error = 1, err
+  error = None if error is None else str(error)
+  cached = bool(cache) and cache.hits > hits
+  return Result(job, returncode, error, time.time() - start, cached)
+
+
+def _run(job, context=None, options=None):
+  """
+  Processes *job* (see :func:`_process`). If *options* are given, the
+  worker process is set up with them first, unless it already is (for pools
+  without an initializer).
+
+  """
+  if options is not None and 'options' not in _WORKER:
+    _init_worker(context, options)
+  return _process(job)
+
+
+def _umask():
+  mask = os.umask(0)
+  os.umask(mask)
+  return mask
+
+
+def run_batch(
+  jobs, context=None, wrap_with_html=False, fold_tags=False,
+  hard_breaks=False, backend=BACKEND_WDIFF, wdiff_cmd=None, workers=None,
+  cache_dir=None, assets=None, assets_url=None, gzip=False,
+  gzip_level=GZIP_LEVEL, context_paragraphs=None, expand_context=True,
+  encoding=None, base_index=None
+):
+  """
+  Processes all *jobs* with a pool of *workers* processes and yields a
+  :cls:`Result` for each one, as soon as it's done.
+
+  The largest pairs are scheduled first. *context* is passed to the
+  :cls:`settings.Settings` of each job. If *cache_dir* is set, diff results
+  and compiled templates are cached there. The other arguments are the same
+  as for :func:`wdiff`.
+
+  *assets* are the paths of shared assets (see :func:`assets.write_assets`)
+  linked from each document, relative to its output file or starting with
+  *assets_url*.
+
+  The results are gzip compressed with *gzip_level* if *gzip* is set or the
+  output file ends with `.gz`.
+
+  *context_paragraphs* and *expand_context* limit the documents to the
+  changed paragraphs (see :func:`stream_wdiff`). The files are converted
+  from *encoding* (see :func:`inputs.transcode_input`).
+
+  If all jobs share the same original file, pass its *base_index* (an
+  :cls:`engine.BaseIndex`, see :mod:`revisions`): it's handed to the
+  workers once and the original isn't tokenized again for each job.
+
+  """
+  options = {
+    'wrap_with_html': wrap_with_html,
+    'fold_tags': fold_tags,
+    'hard_breaks': hard_breaks,
+    'backend': backend,
+    'wdiff_cmd': wdiff_cmd,
+    'cache_dir': cache_dir,
+    'assets': assets,
+    'assets_url': assets_url,
+    'gzip': gzip,
+    'gzip_level': gzip_level,
+    'context_paragraphs': context_paragraphs,
+    'expand_context': expand_context,
+    'encoding': encoding,
+    'base_index': base_index,
+    'umask': _umask(),
+  }
+  context = context or {}
+  jobs = sorted(jobs, key=_size, reverse=True)
+  try:
+    executor = ProcessPoolExecutor(
+      max_workers=workers,
+      initializer=_init_worker,
+      initargs=(context, options),
+    )
+    args = ()
+  except TypeError:  # no initializer before Python 3.7
+    executor = ProcessPoolExecutor(max_workers=workers)
+    args = (context, options)
+  with executor:
+    futures = [executor.submit(_run, job, *args) for job in jobs]
+    for future in as_completed(futures):
+      yield future.result()
@@ -0,0 +1,249 @@
+# -*- coding: UTF-8 -*-
+
+"""
+A content addressed on-disk cache for diff results.
+
+Results are stored under a key derived from the contents of both input
+files, the options used and the version of the diff engine. So re-rendering
+the same pair (e.g. with another template) doesn't need to run the diff
+again. The least recently used entries are evicted, when the cache grows
+beyond its maximum size.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import tempfile
+
+from .engine import ENGINE_VERSION
+from .settings import (
+  CACHE_DIR,
+  BACKEND_PYTHON,
+)
+
+
+__all__ = [
+  'diff_key',
+  'DiffCache',
+]
+
+
+DIFF_CACHE_DIR = os.path.join(CACHE_DIR, 'diffs')
+
+DIFF_CACHE_SIZE = 256 * 1024 * 1024
+
+BLOCK_SIZE = 64 * 1024
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def _hash_input(source):
+  """
+  Returns the SHA-256 hex digest of the contents of *source* (a path or
+  bytes).
+
+  """
+  if isinstance(source, bytes):
+    return hashlib.sha256(source).hexdigest()
+  digest = hashlib.sha256()
+  with open(source, 'rb') as fh:
+    for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+      digest.update(block)
+  return digest.hexdigest()
+
+
+def diff_key(org_file, new_file, fold_tags, html, backend, wdiff_path):
+  """
+  Returns a key identifying the diff of *org_file* and *new_file*.
+
+  The key covers the contents of both files, the options and the engine:
+  the version of the :mod:`engine` or the path, size and modification time
+  of the `wdiff` executable (*wdiff_path*).
+
+  """
+  if backend == BACKEND_PYTHON:
+    engine = ENGINE_VERSION
+  else:
+    stat = os.stat(wdiff_path)
+    engine = '{}:{}:{}'.format(wdiff_path, stat.st_size, stat.st_mtime)
+  parts = [
+    _hash_input(org_file),
+    _hash_input(new_file),
+    'fold' if fold_tags else 'nofold',
+    'html' if html else 'plain',
+    backend,
+    engine,
+  ]
+  return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class DiffCache(object):
+
+  """
+  Stores diff results in *directory*, using at most *max_size* bytes.
+
+  The number of cache hits and misses is counted in :attr:`hits` and
+  :attr:`misses`.
+
+  The total size is only read from the disk when the first entry is stored
+  and then tracked as entries are added, so the directory is walked again
+  only when the estimate exceeds *max_size* (other processes using the same
+  directory aren't seen until then).
+
+  """
+
+  def __init__(self, directory=DIFF_CACHE_DIR, max_size=DIFF_CACHE_SIZE):
+    self.directory = directory
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self._size = None
+
+  def key(self, org_file, new_file, fold_tags, html, backend, wdiff_path):
+    """
+    Returns the cache key for a diff of *org_file* and *new_file* (see
+    :func:`diff_key`).
+
+    """
+    return diff_key(org_file, new_file, fold_tags, html, backend, wdiff_path)
+
+  def path(self, key):
+    """
+    Returns the path of the entry for *key*.
+
+    """
+    return os.path.join(self.directory, key[:2], key)
+
+  def iter_get(self, key):
+    """
+    Yields the cached result for *key* in chunks of bytes.
+
+    Returns `None` (instead of a generator) on a cache miss.
+
+    """
+    path = self.path(key)
+    try:
+      fh = open(path, 'rb')
+    except EnvironmentError:
+      self.misses += 1
+      return None
+    self.hits += 1
+    try:
+      os.utime(path, None)
+    except EnvironmentError:
+      pass
+    return self._iter_file(fh)
+
+  @staticmethod
+  def _iter_file(fh):
+    with fh:
+      for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+        yield block
+
+  def iter_set(self, key, chunks):
+    """
+    Yields the *chunks* (bytes) and stores them under *key*.
+
+    The entry is only stored if all *chunks* are consumed without errors.
+
+    """
+    directory = os.path.dirname(self.path(key))
+    try:
+      os.makedirs(directory)
+    except OSError:
+      pass
+    try:
+      fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    except EnvironmentError:
+      for chunk in chunks:
+        yield chunk
+      return
+    size = 0
+    try:
+      with os.fdopen(fd, 'wb') as fh:
+        for chunk in chunks:
+          fh.write(chunk)
+          size += len(chunk)
+          yield chunk
+      if self._size is None:
+        self._size = self.size()
+      _replace(temp_path, self.path(key))
+    finally:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+    self._size += size
+    if self._size > self.max_size:
+      self.evict()
+
+  def entries(self):
+    """
+    Returns a list of `(mtime, size, path)` tuples for all entries (the
+    modification time is updated on each hit).
+
+    """
+    entries = []
+    for root, _, filenames in os.walk(self.directory):
+      for filename in filenames:
+        if filename.startswith('.tmp-'):
+          continue
+        path = os.path.join(root, filename)
+        try:
+          stat = os.stat(path)
+        except OSError:
+          continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+  def size(self):
+    """
+    Returns the total size of all entries (in bytes).
+
+    """
+    return sum(entry[1] for entry in self.entries())
+
+  def evict(self):
+    """
+    Removes the least recently used entries until the cache is no larger
+    than :attr:`max_size`.
+
+    """
+    entries = self.entries()
+    size = sum(entry[1] for entry in entries)
+    for _, entry_size, path in sorted(entries):
+      if size <= self.max_size:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      size -= entry_size
+    self._size = size
+
+  def clear(self):
+    """
+    Removes all entries.
+
+    """
+    for _, _, path in self.entries():
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+    self._size = 0
+
+  def stats(self):
+    """
+    Returns a dictionary with the hits, misses, number of entries and total
+    size of the cache.
+
+    """
+    entries = self.entries()
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'entries': len(entries),
+      'size': sum(entry[1] for entry in entries),
+    }
@@ -0,0 +1,317 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Paragraph aligned diffs for very large documents.
+
+Both inputs are split into paragraphs (separated by empty lines, like in
+:func:`utils.iter_wrap_paragraphs`), which are aligned by a hash of their
+content. Identical paragraphs are passed straight through and only the
+blocks of changed paragraphs are word diffed, in parallel on a pool of
+workers. The results are joined with empty lines again, so they can be
+wrapped with :func:`utils.iter_wrap_content` as usual.
+
+Changes are never matched across the borders of changed blocks, so the
+output can differ slightly from a diff of the whole documents (e.g. for
+words moved to another paragraph).
+
+With a memory ceiling (*max_memory*), input files are memory mapped
+instead of read, only the offsets and hashes of the paragraphs are kept and
+changed blocks too large for the ceiling are diffed in pieces (pairing
+their paragraphs in order), so documents larger than the available memory
+can be diffed.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import hashlib
+import itertools
+import os
+
+from array import array
+from collections import deque
+from concurrent.futures import (
+  ProcessPoolExecutor,
+  ThreadPoolExecutor,
+)
+
+from .engine import diff_tokens
+from .inputs import mapped_input
+from .settings import (
+  BACKEND_WDIFF,
+  BACKEND_PYTHON,
+  BACKENDS,
+)
+from .utils import (
+  find_wdiff,
+  _iter_diff_bytes,
+)
+
+
+__all__ = [
+  'split_paragraphs',
+  'iter_chunked_wdiff',
+  'generate_chunked_wdiff',
+]
+
+
+PARAGRAPH_BREAK = b'\n\n'
+
+# blocks are bundled into tasks of about this size (in bytes), to keep the
+# overhead per task low
+BUNDLE_SIZE = 64 * 1024
+
+# the memory needed to diff a block, per byte of its input
+ENGINE_OVERHEAD = 20
+
+
+def paragraph_spans(data):
+  """
+  Returns the start and end offsets of the paragraphs of *data* (bytes or
+  a memory map) in two arrays, and a list of their hashes.
+
+  The offsets exclude the whitespace around the paragraphs. The hashes
+  ignore the whitespace at the start and end of the lines and blank lines.
+
+  """
+  starts = array(str('Q'))
+  ends = array(str('Q'))
+  hashes = []
+  size = len(data)
+  start = 0
+  while start < size:
+    end = data.find(PARAGRAPH_BREAK, start)
+    if end < 0:
+      end = size
+    para = data[start:end]
+    lines = [line.strip() for line in para.split(b'\n')]
+    lines = [line for line in lines if line]
+    if lines:
+      starts.append(start + len(para) - len(para.lstrip()))
+      ends.append(start + len(para.rstrip()))
+      hashes.append(hashlib.sha1(b'\n'.join(lines)).digest())
+    start = end + len(PARAGRAPH_BREAK)
+  return starts, ends, hashes
+
+
+def split_paragraphs(data):
+  """
+  Returns the paragraphs of *data* (bytes) and a list of their hashes (see
+  :func:`paragraph_spans`).
+
+  """
+  starts, ends, hashes = paragraph_spans(data)
+  return [data[start:end] for start, end in zip(starts, ends)], hashes
+
+
+class _Paragraphs(object):
+
+  """
+  The paragraphs of *data*, sliced from it when they are needed.
+
+  """
+
+  def __init__(self, data):
+    self.data = data
+    self.starts, self.ends, self.hashes = paragraph_spans(data)
+
+  def size(self, i1, i2):
+    """
+    Returns the size of the paragraphs *i1* to *i2* in bytes.
+
+    """
+    return sum(self.ends[i] - self.starts[i] for i in range(i1, i2))
+
+  def join(self, i1, i2):
+    """
+    Returns the paragraphs *i1* to *i2* joined with empty lines.
+
+    """
+    data = self.data
+    return PARAGRAPH_BREAK.join(
+      data[self.starts[i]:self.ends[i]] for i in range(i1, i2)
+    )
+
+
+def _split_block(org, new, i1, i2, j1, j2, limit):
+  """
+  Yields the ranges of paragraphs `(i1, i2, j1, j2)` to diff for the block
+  of changed paragraphs of *org* and *new*.
+
+  Blocks larger than *limit* bytes are cut into pieces, taking the
+  paragraphs of both sides in order (`None` for no limit).
+
+  """
+  if limit is None or org.size(i1, i2) + new.size(j1, j2) <= limit:
+    yield i1, i2, j1, j2
+    return
+  while i1 < i2 or j1 < j2:
+    i, j = i1, j1
+    size = 0
+    while i < i2 or j < j2:
+      step = org.size(i, min(i + 1, i2)) + new.size(j, min(j + 1, j2))
+      if size and size + step > limit:
+        break
+      size += step
+      i = min(i + 1, i2)
+      j = min(j + 1, j2)
+    yield i1, i, j1, j
+    i1, j1 = i, j
+
+
+def _diff_block(job):
+  """
+  Returns the raw diff of a block of changed paragraphs.
+
+  """
+  org, new, fold_tags, html, backend, wdiff_path = job
+  return b''.join(
+    _iter_diff_bytes(org, new, fold_tags, html, backend, wdiff_path)
+  ).strip()
+
+
+def _diff_blocks(jobs):
+  """
+  Returns the raw diffs of a bundle of blocks (a picklable function for
+  the process pool).
+
+  """
+  return [_diff_block(job) for job in jobs]
+
+
+def _iter_bundles(jobs, size=BUNDLE_SIZE):
+  """
+  Yields the *jobs* in lists of about *size* bytes of input.
+
+  """
+  bundle = []
+  bundle_size = 0
+  for job in jobs:
+    bundle.append(job)
+    bundle_size += len(job[0]) + len(job[1])
+    if bundle_size >= size:
+      yield bundle
+      bundle = []
+      bundle_size = 0
+  if bundle:
+    yield bundle
+
+
+def _iter_results(jobs, pool_class, workers):
+  """
+  Yields the raw diffs of the *jobs* in order, computed on a pool of
+  *workers* (an instance of *pool_class*, if there is more than one bundle
+  of jobs).
+
+  Only a few bundles are submitted ahead, so pending blocks don't pile up
+  in memory.
+
+  """
+  bundles = _iter_bundles(jobs)
+  if workers > 1:
+    first = next(bundles, None)
+    second = next(bundles, None)
+    if second is not None:
+      bundles = itertools.chain((first, second), bundles)
+      for result in _iter_pool_results(bundles, pool_class, workers):
+        yield result
+      return
+    bundles = [first] if first else []
+  for bundle in bundles:
+    for result in _diff_blocks(bundle):
+      yield result
+
+
+def _iter_pool_results(bundles, pool_class, workers):
+  pool = pool_class(workers)
+  pending = deque()
+  try:
+    for bundle in bundles:
+      pending.append(pool.submit(_diff_blocks, bundle))
+      while len(pending) > workers:
+        for result in pending.popleft().result():
+          yield result
+    while pending:
+      for result in pending.popleft().result():
+        yield result
+  finally:
+    for future in pending:
+      future.cancel()
+    pool.shutdown(wait=False)
+
+
+def iter_chunked_wdiff(
+  org_file, new_file, fold_tags=False, html=True, backend=BACKEND_WDIFF,
+  wdiff_cmd=None, workers=None, max_memory=None
+):
+  """
+  Yields the paragraph aligned diff of *org_file* and *new_file* as chunks
+  of text.
+
+  The changed blocks are diffed on *workers* processes (`python` backend)
+  or threads (`wdiff` backend, which runs in subprocesses anyway). See
+  :func:`utils.generate_wdiff` for the other arguments.
+
+  If *max_memory* (in bytes) is set, the memory used for the blocks stays
+  below it (see above).
+
+  """
+  if backend == BACKEND_PYTHON:
+    wdiff_path = None
+    pool_class = ProcessPoolExecutor
+  elif backend in BACKENDS:
+    wdiff_path = find_wdiff(wdiff_cmd)
+    pool_class = ThreadPoolExecutor
+  else:
+    raise ValueError("unknown backend: {}".format(backend))
+  workers = workers or os.cpu_count() or 1
+  limit = None
+  if max_memory:
+    limit = max(1, max_memory // (ENGINE_OVERHEAD * (workers + 1)))
+  use_mmap = max_memory is not None
+  with mapped_input(org_file, use_mmap) as org_data:
+    with mapped_input(new_file, use_mmap) as new_data:
+      org = _Paragraphs(org_data)
+      new = _Paragraphs(new_data)
+      opcodes = diff_tokens(org.hashes, new.hashes)
+      org.hashes = new.hashes = None
+
+      def iter_blocks(i1, i2, j1, j2):
+        return _split_block(org, new, i1, i2, j1, j2, limit)
+
+      jobs = (
+        (org.join(i1, i2), new.join(j1, j2), fold_tags, html, backend,
+         wdiff_path)
+        for tag, bi1, bi2, bj1, bj2 in opcodes if tag != 'equal'
+        for i1, i2, j1, j2 in iter_blocks(bi1, bi2, bj1, bj2)
+      )
+      results = _iter_results(jobs, pool_class, workers)
+      try:
+        separator = ''
+        for tag, i1, i2, j1, j2 in opcodes:
+          if tag == 'equal':
+            blocks = [new.join(j, j + 1) for j in range(j1, j2)]
+          else:
+            blocks = [next(results) for _ in iter_blocks(i1, i2, j1, j2)]
+          for block in blocks:
+            if block:
+              yield separator + block.decode('utf-8')
+              separator = '\n\n'
+      finally:
+        results.close()
+
+
+def generate_chunked_wdiff(
+  org_file, new_file, fold_tags=False, html=True, backend=BACKEND_WDIFF,
+  wdiff_cmd=None, workers=None, max_memory=None
+):
+  """
+  Returns the paragraph aligned diff of *org_file* and *new_file* as a
+  string (see :func:`iter_chunked_wdiff`).
+
+  """
+  return ''.join(iter_chunked_wdiff(
+    org_file, new_file, fold_tags, html, backend, wdiff_cmd, workers,
+    max_memory
+  ))
@@ -13,26 +13,50 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import codecs
+import gzip
+import io
+import os
+import shutil
 import sys
+import tempfile
+import time
 import subprocess as sub
 
 from argparse import (
   ArgumentParser,
+  ArgumentTypeError,
   FileType,
 )
+from contextlib import contextmanager
 from datetime import datetime
 
 from . import (
-  wdiff,
+  write_wdiff,
+  write_wdiff_bytes,
   __version__ as version,
 )
 from .settings import (
   USER_DIR,
+  CACHE_DIR,
+  ENV_WDIFF,
+  GZIP_SUFFIX,
+  GZIP_LEVEL,
+  BACKEND_WDIFF,
+  BACKEND_PYTHON,
+  BACKENDS,
   Settings,
 )
+from .inputs import (
+  CONTENT_NAME,
+  ENCODING_AUTO,
+  spool_input,
+)
 from .exceptions import (
   WdiffNotFoundError,
   ContextError,
+  ManifestError,
+  GitError,
 )
 
 
@@ -46,10 +70,21 @@ DESCRIPTION = """Generates a word based *diff* from plain text files.
 Uses `GNU wdiff` to generate the diff and changes the output to a
 HTML compatible format (`INS` and `DEL` tags)."""
 
+STDIN = '-'
+
+SERVE = 'serve'
+
+FD_PREFIX = '/dev/fd/'
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+_replace = getattr(os, 'replace', os.rename)
+
 EPILOG = """The default files for the HTML wrapper are called
 `template.jinja`, `styles.css`, `main.js` and `secondary.js`.
 You can replace them with your own, if you create these files in your data
-directory (`{}`).""".format(USER_DIR)
+directory (`{}`).
+Run `wdiffhtml serve --help` for the diff server.""".format(USER_DIR)
 
 
 def parse_commandline(argv):
@@ -67,12 +102,141 @@ def parse_commandline(argv):
     help="shows version and exits"
   )
   ap.add_argument(
-    'org_file', metavar='FILENAME',
-    help="original file"
+    '--backend', choices=BACKENDS, default=BACKEND_WDIFF,
+    help="diff engine: the `wdiff` command or the built-in Python one "
+    "(default: %(default)s)"
   )
   ap.add_argument(
-    'new_file', metavar='FILENAME',
-    help="changed file"
+    '--encoding', metavar='NAME', type=parse_encoding,
+    help="encoding of the files (like `latin-1` or `utf-16`), `{}` to "
+    "detect it from a BOM or the contents (default: UTF-8)"
+    "".format(ENCODING_AUTO)
+  )
+  ap.add_argument(
+    '--wdiff', metavar='PATH', dest='wdiff_cmd',
+    help="name or path of the `wdiff` command (default: ${} or `wdiff`)"
+    "".format(ENV_WDIFF)
+  )
+  ap.add_argument(
+    '--chunked', action='store_true',
+    help="align the paragraphs first and only diff the changed ones, in "
+    "parallel (for very large documents)"
+  )
+  ap.add_argument(
+    '--jobs', metavar='N', type=int,
+    help="number of workers for `--chunked` and `--batch` (default: number "
+    "of CPUs)"
+  )
+  ap.add_argument(
+    '--max-memory', metavar='SIZE', type=parse_size,
+    help="keep the memory used below this size (like `512M` or `2G`) for "
+    "inputs larger than the available memory: implies `--chunked`, spools "
+    "large input streams to temporary files"
+  )
+  ap.add_argument(
+    'org_file', metavar='FILENAME', nargs='?',
+    help="original file (`-` for STDIN)"
+  )
+  ap.add_argument(
+    'new_file', metavar='FILENAME', nargs='?',
+    help="changed file (`-` for STDIN)"
+  )
+  ap.add_argument(
+    'more_files', metavar='PATH', nargs='*',
+    help="more revisions to diff against the original file (requires "
+    "`--output DIR`), or more paths with `--git`"
+  )
+  ap.add_argument(
+    '-o', '--output', metavar='FILE',
+    help="write the results to this file (default: STDOUT), gzip "
+    "compressed if it ends with `{}`".format(GZIP_SUFFIX)
+  )
+  ap.add_argument(
+    '-z', '--gzip', action='store_true',
+    help="gzip compress the results"
+  )
+  ap.add_argument(
+    '--gzip-level', metavar='N', type=int, default=GZIP_LEVEL,
+    choices=range(1, 10),
+    help="compression level from 1 (fastest) to 9 (smallest) (default: "
+    "%(default)s)"
+  )
+  ap.add_argument(
+    '--profile', action='store_true',
+    help="print the time and data used by each stage as JSON to STDERR"
+  )
+  ap.add_argument(
+    '--profile-memory', action='store_true',
+    help="like `--profile`, but also trace the peak memory of each stage "
+    "(much slower)"
+  )
+  g_watch = ap.add_argument_group(
+    'Watch',
+    "Keep running and update the output file whenever one of the files "
+    "changes."
+  )
+  g_watch.add_argument(
+    '--watch', action='store_true',
+    help="watch the files for changes (requires `--output`)"
+  )
+  g_watch.add_argument(
+    '--debounce', metavar='SECONDS', type=float, default=0.2,
+    help="wait for this long without further changes before updating "
+    "(default: %(default)s)"
+  )
+  g_batch = ap.add_argument_group(
+    'Batch',
+    "Diff many file pairs at once. The manifest lists one pair per entry, "
+    "either as CSV (`org,new,output`) or as JSON lines (objects with the "
+    "keys `org`, `new` and `output`)."
+  )
+  g_batch.add_argument(
+    '--batch', metavar='MANIFEST', type=FileType('r'),
+    help="read the pairs from this file (`-` for STDIN)"
+  )
+  g_tree = ap.add_argument_group(
+    'Recursive',
+    "Diff two directory trees. Files are paired by their relative path, "
+    "identical ones are skipped and the reports for the others are written "
+    "to the output directory, along with an index page."
+  )
+  g_tree.add_argument(
+    '-R', '--recursive', action='store_true',
+    help="the files are directories (requires `--output DIR`, implies "
+    "`--wrap-with-html`)"
+  )
+  g_git = ap.add_argument_group(
+    'Git',
+    "Diff files across the revisions of the git repository in the working "
+    "directory, without checking them out. The files are given as paths "
+    "(files or directories) instead of two files. Paths with the same "
+    "contents in both revisions are skipped. If more than one file matches, "
+    "the reports are written to the `--output` directory, along with an "
+    "index page."
+  )
+  g_git.add_argument(
+    '--git', metavar='REV1..REV2',
+    help="the revisions to compare (`REV1` alone or `REV1..` compares to "
+    "`HEAD`)"
+  )
+  g_cache = ap.add_argument_group(
+    'Cache',
+    "If enabled, diff results are cached, keyed by the contents of both "
+    "files and the options used."
+  )
+  g_cache.add_argument(
+    '--cache', action='store_true',
+    help="cache the results"
+  )
+  g_cache.add_argument(
+    '--cache-dir', metavar='DIR',
+    help="cache directory (default: `{}`); implies `--cache`".format(
+      CACHE_DIR
+    )
+  )
+  g_cache.add_argument(
+    '--cache-stats', action='store_true',
+    help="print cache statistics to STDERR"
   )
   g_html = ap.add_argument_group(
     'Wrapper',
@@ -92,6 +256,17 @@ def parse_commandline(argv):
     '-b', '--hard-breaks', action='store_true',
     help="replace line breaks with BR tags"
   )
+  g_html.add_argument(
+    '--context', metavar='N', type=int, dest='context_paragraphs',
+    help="only show the changed paragraphs and N unchanged ones around "
+    "them, the others are collapsed into placeholders (which can be "
+    "expanded)"
+  )
+  g_html.add_argument(
+    '--no-expand', action='store_true',
+    help="drop the collapsed paragraphs instead of keeping them for "
+    "expansion (smaller output)"
+  )
   g_context = ap.add_argument_group(
     'Context',
     "With these options you can add additional information to the HTML "
@@ -131,8 +306,102 @@ def parse_commandline(argv):
     '-J', '--js2', type=FileType('r'), metavar='FILE',
     help="load another Javascript from this file (like Zepto)"
   )
+  g_files.add_argument(
+    '--assets', metavar='DIR',
+    help="write the CSS and Javascript to this directory once (named after "
+    "a hash of their content) and link them, instead of including them in "
+    "each document"
+  )
+  g_files.add_argument(
+    '--assets-url', metavar='URL',
+    help="URL of the `--assets` directory used in the links (default: the "
+    "path relative to the output file)"
+  )
+  g_files.add_argument(
+    '--minify', action='store_true',
+    help="minify the CSS and Javascript"
+  )
   # parse args
   args = ap.parse_args(argv)
+  # check files
+  args.revisions = None
+  args.paths = [
+    path for path in (args.org_file, args.new_file) if path
+  ] + args.more_files
+  if args.git:
+    if args.batch or args.watch or args.recursive:
+      ap.error(
+        "`--git` can't be used alongside `--batch`, `--watch` or "
+        "`--recursive`"
+      )
+    if not args.paths:
+      ap.error("`--git` requires at least one path")
+  elif args.more_files:
+    if (
+      args.batch or args.watch or args.recursive or args.chunked or
+      args.max_memory
+    ):
+      ap.error(
+        "several revisions can't be used alongside `--batch`, `--watch`, "
+        "`--recursive`, `--chunked` or `--max-memory`"
+      )
+    if not args.output:
+      ap.error("several revisions require `--output DIR`")
+    if any(is_stream(path) for path in args.paths):
+      ap.error("several revisions can't be read from streams")
+    args.revisions = [args.new_file] + args.more_files
+    names = [os.path.basename(path) for path in args.revisions]
+    if len(set(names)) < len(names):
+      ap.error("the revisions need different file names")
+    args.wrap_with_html = True
+  if args.recursive:
+    if args.batch or args.watch or args.chunked or args.max_memory:
+      ap.error(
+        "`--recursive` can't be used alongside `--batch`, `--watch`, "
+        "`--chunked` or `--max-memory`"
+      )
+    if not (args.new_file and args.output):
+      ap.error("`--recursive` requires two directories and `--output`")
+    for directory in (args.org_file, args.new_file):
+      if not os.path.isdir(directory):
+        ap.error("not a directory: {}".format(directory))
+    args.wrap_with_html = True
+  if args.batch:
+    if args.org_file or args.new_file:
+      ap.error("files can't be given alongside `--batch`")
+    if args.chunked or args.max_memory:
+      ap.error(
+        "`--chunked` and `--max-memory` can't be used alongside `--batch`"
+      )
+  elif not args.git:
+    if not args.new_file:
+      ap.error("an original and a changed file are required")
+    if args.org_file == args.new_file == STDIN:
+      ap.error("only one file can be read from STDIN")
+  args.profile = args.profile or args.profile_memory
+  if args.profile and (
+    args.batch or args.watch or args.recursive or args.revisions
+  ):
+    ap.error(
+      "`--profile` can't be used alongside `--batch`, `--watch`, "
+      "`--recursive` or several revisions"
+    )
+  if args.watch:
+    if args.batch or not args.output:
+      ap.error("`--watch` requires two files and `--output`")
+    if STDIN in (args.org_file, args.new_file):
+      ap.error("files read from STDIN can't be watched")
+  if args.assets_url and not args.assets:
+    ap.error("`--assets-url` requires `--assets`")
+  if args.cache_stats and not (args.cache or args.cache_dir):
+    ap.error("`--cache-stats` requires `--cache` or `--cache-dir`")
+  if args.context_paragraphs is not None:
+    if args.context_paragraphs < 0:
+      ap.error("`--context` can't be negative")
+    if args.watch:
+      ap.error("`--context` can't be used alongside `--watch`")
+  if args.no_expand and args.context_paragraphs is None:
+    ap.error("`--no-expand` requires `--context`")
   # check for wrapper
   if not args.wrap_with_html:
     # check context arguments and file arguments
@@ -141,9 +410,99 @@ def parse_commandline(argv):
       if any([getattr(args, attr) for attr in args_to_check]):
         msg = "the options require that `--wrap-with-html` is used"
         ap.error(msg)
+    if args.context_paragraphs is not None and not args.git:
+      ap.error("`--context` requires that `--wrap-with-html` is used")
   return args
 
 
+def parse_size(text):
+  """
+  Returns the number of bytes for a size like `512K`, `10M` or `2G`.
+
+  """
+  text = text.strip().upper().rstrip('B')
+  unit = text[-1:] if text[-1:] in SIZE_UNITS else ''
+  try:
+    size = int(float(text[:len(text) - len(unit)]) * SIZE_UNITS[unit])
+  except ValueError:
+    raise ArgumentTypeError("invalid size: {!r}".format(text))
+  if size <= 0:
+    raise ArgumentTypeError("the size must be positive")
+  return size
+
+
+def parse_encoding(text):
+  """
+  Returns the encoding *text* if it's known (or `auto`).
+
+  """
+  if text != ENCODING_AUTO:
+    try:
+      codecs.lookup(text)
+    except LookupError:
+      raise ArgumentTypeError("unknown encoding: {!r}".format(text))
+  return text
+
+
+def is_stream(filename):
+  """
+  Returns `True` if *filename* is STDIN (`-`) or a file descriptor.
+
+  """
+  return filename == STDIN or filename.startswith(FD_PREFIX)
+
+
+def get_input(filename):
+  """
+  Returns the contents of *filename* if it is STDIN (`-`) or a file
+  descriptor (`/dev/fd/N`, e.g. from process substitution), else
+  *filename* itself.
+
+  """
+  if filename == STDIN:
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    return stdin.read()
+  if filename.startswith(FD_PREFIX):
+    with open(filename, 'rb') as fh:
+      return fh.read()
+  return filename
+
+
+@contextmanager
+def open_input(filename, max_memory=None):
+  """
+  Yields the input for *filename* (see :func:`get_input`).
+
+  If *max_memory* is set, streams larger than that are spooled to a
+  temporary file (see :func:`inputs.spool_input`), instead of being read
+  into memory.
+
+  """
+  if not max_memory or not is_stream(filename):
+    yield get_input(filename)
+  elif filename == STDIN:
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    with spool_input(stdin, max_memory) as source:
+      yield source
+  else:
+    with open(filename, 'rb') as fh:
+      with spool_input(fh, max_memory) as source:
+        yield source
+
+
+def get_timestamp(args):
+  """
+  Returns the date (and time) for the output, if requested in the namespace
+  *args* (else `None`).
+
+  """
+  if args.datestamp:
+    return "{:%Y-%m-%d}".format(datetime.utcnow())
+  if args.timestamp:
+    return "{:%Y-%m-%d %H:%M}".format(datetime.utcnow())
+  return None
+
+
 def get_context(args):
   """
   Returns a context from the namespace *args* (command line arguments).
@@ -152,22 +511,437 @@ def get_context(args):
   context = {}
   if args.revision:
     context['version'] = args.revision
-  if args.datestamp:
-    context['timestamp'] = "{:%Y-%m-%d}".format(datetime.utcnow())
-  if args.timestamp:
-    context['timestamp'] = "{:%Y-%m-%d %H:%M}".format(datetime.utcnow())
+  timestamp = get_timestamp(args)
+  if timestamp:
+    context['timestamp'] = timestamp
   if args.template:
     context['template'] = args.template.read()
   if args.css:
     context['css'] = args.css.read()
   if args.js:
     context['js'] = args.js.read()
+  if args.js2:
+    context['js2'] = args.js2.read()
+  for key, filename in (
+    ('org_filename', args.org_file), ('new_filename', args.new_file)
+  ):
+    if filename and is_stream(filename):
+      context[key] = CONTENT_NAME
+  if args.minify and not args.assets:
+    from .assets import load_assets
+    context.update(load_assets(context, minify=True))
   return context
 
 
+def get_assets(args, context):
+  """
+  Writes the assets to the directory given in *args* (if any) and returns
+  their paths (else `None`, see :func:`assets.write_assets`).
+
+  """
+  if not args.assets:
+    return None
+  from .assets import write_assets
+  return write_assets(args.assets, context, args.minify)
+
+
+def add_asset_urls(args, context):
+  """
+  Writes the assets (see :func:`get_assets`) and links them from *context*
+  (for the output file given in *args*).
+
+  """
+  paths = get_assets(args, context)
+  if paths:
+    from .assets import asset_urls
+    context.update(asset_urls(paths, args.output, args.assets_url))
+
+
+def get_cache_dir(args):
+  """
+  Returns the cache directory from the namespace *args* (`None` unless
+  caching is enabled with `--cache` or `--cache-dir`).
+
+  """
+  if args.cache_dir:
+    return args.cache_dir
+  return CACHE_DIR if args.cache else None
+
+
+def print_cache_stats(cache):
+  """
+  Prints the statistics of the :cls:`cache.DiffCache` *cache* to STDERR.
+
+  """
+  print(
+    "cache: {hits} hits, {misses} misses, {entries} entries, {size} bytes"
+    "".format(**cache.stats()),
+    file=sys.stderr
+  )
+
+
+def use_gzip(args, output=None):
+  """
+  Returns `True` if the results should be gzip compressed (requested in
+  *args* or by the name of the *output* file).
+
+  """
+  output = output or args.output
+  return args.gzip or bool(output and output.endswith(GZIP_SUFFIX))
+
+
+def _write_bytes(fh, write, compresslevel, name=''):
+  """
+  Writes the results (with *write*, which takes a binary file object) and
+  a final newline to the binary file object *fh*, gzip compressed with
+  *compresslevel* unless it's `None`.
+
+  """
+  if compresslevel is not None:
+    fh = gzip.GzipFile(name, 'wb', compresslevel, fh)
+  try:
+    write(fh)
+    fh.write(b'\n')
+  finally:
+    if compresslevel is not None:
+      fh.close()
+
+
+def write_output(args, settings, cache, profiler=None, paragraphs=None):
+  """
+  Writes the results for *settings* to the output file given in *args*
+  (or STDOUT).
+
+  The output file is replaced at once, when the results are complete. The
+  results are gzip compressed if requested (see :func:`use_gzip`).
+
+  The results are written as UTF-8 bytes (to the buffer of STDOUT, if it
+  has one), so the plain diff is passed through without decoding it.
+
+  If a :cls:`watch.ParagraphCache` is given as *paragraphs*, the results
+  are rendered with it, reusing the paragraphs of its last run.
+
+  """
+  options = (
+    args.wrap_with_html, args.fold_tags, args.hard_breaks, args.backend,
+    args.wdiff_cmd, cache
+  )
+  kwargs = {
+    'chunked': args.chunked,
+    'workers': args.jobs,
+    'profiler': profiler,
+    'max_memory': args.max_memory,
+    'context_paragraphs': args.context_paragraphs,
+    'expand_context': not args.no_expand,
+    'encoding': args.encoding,
+  }
+
+  def write(fh):
+    if paragraphs is None:
+      write_wdiff_bytes(fh, settings, *options, **kwargs)
+      return
+    for chunk in paragraphs.iter_render(
+      settings, args.wrap_with_html, args.hard_breaks,
+      encoding=args.encoding
+    ):
+      fh.write(chunk.encode('utf-8'))
+
+  compresslevel = args.gzip_level if use_gzip(args) else None
+  if not args.output:
+    stdout = getattr(sys.stdout, 'buffer', None)
+    text_only = stdout is None and compresslevel is None
+    if text_only and paragraphs is None:  # a text stream
+      write_wdiff(sys.stdout, settings, *options, **kwargs)
+      print()
+      return
+    sys.stdout.flush()
+    stdout = stdout or sys.stdout
+    _write_bytes(stdout, write, compresslevel)
+    stdout.flush()
+    return
+  directory = os.path.dirname(os.path.abspath(args.output))
+  name = os.path.basename(args.output)
+  if name.endswith(GZIP_SUFFIX):
+    name = name[:-len(GZIP_SUFFIX)]
+  fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.wdiffhtml-')
+  try:
+    with io.open(fd, 'wb') as fh:
+      _write_bytes(fh, write, compresslevel, name)
+    os.chmod(temp_path, 0o666 & ~_umask())
+    _replace(temp_path, args.output)
+  finally:
+    if os.path.exists(temp_path):
+      os.remove(temp_path)
+
+
+def _umask():
+  mask = os.umask(0)
+  os.umask(mask)
+  return mask
+
+
+def run_watch_cli(args, cache):
+  """
+  Writes the output given in *args* each time the files change, until it's
+  interrupted.
+
+  Only the paragraphs which changed since the last run are diffed and
+  wrapped again (see :cls:`watch.ParagraphCache`).
+
+  """
+  from .watch import (
+    ParagraphCache,
+    iter_changes,
+  )
+  context = get_context(args)
+  add_asset_urls(args, context)
+  paragraphs = ParagraphCache(args.fold_tags, args.backend, args.wdiff_cmd)
+  changes = iter_changes([args.org_file, args.new_file], args.debounce)
+  try:
+    while True:
+      start = time.time()
+      timestamp = get_timestamp(args)
+      if timestamp:
+        context['timestamp'] = timestamp
+      try:
+        settings = Settings(args.org_file, args.new_file, **context)
+        write_output(args, settings, cache, paragraphs=paragraphs)
+      except (EnvironmentError, sub.CalledProcessError, UnicodeError) as err:
+        print("ERROR: {}.".format(err), file=sys.stderr)
+      else:
+        print(
+          "{:%H:%M:%S} updated {} ({:.3f}s, {} of {} blocks changed)"
+          "".format(
+            datetime.now(), args.output, time.time() - start,
+            paragraphs.misses, paragraphs.hits + paragraphs.misses
+          ),
+          file=sys.stderr
+        )
+      next(changes)
+  except KeyboardInterrupt:
+    return 0
+  finally:
+    changes.close()
+
+
+def run_batch_cli(args):
+  """
+  Runs the batch given in *args*, prints a summary to STDERR and returns
+  the highest return code of all pairs.
+
+  """
+  from .batch import (
+    read_manifest,
+    run_batch,
+  )
+  jobs = read_manifest(args.batch)
+  context = get_context(args)
+  assets = get_assets(args, context)
+  returncode = 0
+  failed = 0
+  cached = 0
+  for result in run_batch(
+    jobs, context, args.wrap_with_html, args.fold_tags, args.hard_breaks,
+    args.backend, args.wdiff_cmd, args.jobs, get_cache_dir(args), assets,
+    args.assets_url, args.gzip, args.gzip_level, args.context_paragraphs,
+    not args.no_expand, args.encoding
+  ):
+    job = result.job
+    status = "ERROR: {}".format(result.error) if result.error else "ok"
+    if result.cached:
+      status += " (cached)"
+      cached += 1
+    print(
+      "{} {} -> {} [{}] ({:.3f}s) {}".format(
+        job.org_file, job.new_file, job.output,
+        result.returncode, result.duration, status
+      ),
+      file=sys.stderr
+    )
+    if result.returncode:
+      failed += 1
+    returncode = max(returncode, result.returncode)
+  print(
+    "{} pairs: {} ok, {} failed, {} from cache".format(
+      len(jobs), len(jobs) - failed, failed, cached
+    ),
+    file=sys.stderr
+  )
+  return returncode
+
+
+def report_suffix(args):
+  """
+  Returns the suffix for the file names of the reports of the recursive and
+  the git mode.
+
+  """
+  return '.html.gz' if args.gzip else '.html'
+
+
+def run_reports(args, tree, jobs, org_name, new_name, base_index=None):
+  """
+  Runs the *jobs* for the changed files of the :cls:`tree.TreeDiff` *tree*
+  and writes the index page for *org_name* vs *new_name*.
+
+  The *base_index* is passed on to :func:`batch.run_batch`.
+
+  Prints a summary to STDERR and returns the highest return code of all
+  reports.
+
+  """
+  from .assets import asset_urls
+  from .batch import run_batch
+  from .tree import (
+    INDEX_NAME,
+    write_index,
+  )
+  context = get_context(args)
+  assets = get_assets(args, context)
+  returncode = 0
+  results = []
+  for result in run_batch(
+    jobs, context, True, args.fold_tags, args.hard_breaks, args.backend,
+    args.wdiff_cmd, args.jobs, get_cache_dir(args), assets, args.assets_url,
+    args.gzip, args.gzip_level, args.context_paragraphs, not args.no_expand,
+    args.encoding, base_index
+  ):
+    if result.error:
+      context = result.job.context or {}
+      print(
+        "{} [{}] ERROR: {}".format(
+          context.get('new_filename', result.job.new_file),
+          result.returncode, result.error
+        ),
+        file=sys.stderr
+      )
+    returncode = max(returncode, result.returncode)
+    results.append(result)
+  index_context = dict(context)
+  index_context['org_filename'] = org_name
+  index_context['new_filename'] = new_name
+  if assets:
+    index_context.update(asset_urls(
+      assets, os.path.join(args.output, INDEX_NAME), args.assets_url
+    ))
+  index = write_index(
+    args.output, tree, results, index_context, report_suffix(args)
+  )
+  print(
+    "{} changed ({} failed), {} added, {} removed, {} unchanged: {}".format(
+      len(tree.changed), sum(1 for result in results if result.error),
+      len(tree.added), len(tree.removed), len(tree.unchanged), index
+    ),
+    file=sys.stderr
+  )
+  return returncode
+
+
+def run_recursive_cli(args):
+  """
+  Diffs the directories given in *args* (see :func:`run_reports`).
+
+  """
+  from .tree import (
+    compare_trees,
+    tree_jobs,
+  )
+  tree = compare_trees(args.org_file, args.new_file)
+  jobs = tree_jobs(
+    tree, args.org_file, args.new_file, args.output, report_suffix(args)
+  )
+  return run_reports(args, tree, jobs, args.org_file, args.new_file)
+
+
+def run_revisions_cli(args):
+  """
+  Diffs the revisions given in *args* against the original file (see
+  :func:`run_reports`).
+
+  With the `python` backend, the original file is tokenized and indexed
+  only once for all revisions.
+
+  """
+  from .revisions import (
+    compare_base,
+    base_jobs,
+    index_base,
+  )
+  tree = compare_base(args.org_file, args.revisions)
+  jobs = base_jobs(
+    args.org_file, args.revisions, tree, args.output, report_suffix(args)
+  )
+  base_index = None
+  if jobs and args.backend == BACKEND_PYTHON:
+    base_index = index_base(args.org_file, args.encoding)
+  new_name = "{} revisions".format(len(args.revisions))
+  return run_reports(args, tree, jobs, args.org_file, new_name, base_index)
+
+
+def run_git_cli(args, cache):
+  """
+  Diffs the paths given in *args* across the git revisions.
+
+  If only a single file changed (and none were added or removed), it's
+  written like the diff of two files, unless the output is a directory.
+  Else the reports for all files are written to the output directory (see
+  :func:`run_reports`).
+
+  """
+  from .git import (
+    GitRepository,
+    parse_revisions,
+    compare_revisions,
+    git_jobs,
+  )
+  org_rev, new_rev = parse_revisions(args.git)
+  with GitRepository() as repo:
+    tree, org_ids, new_ids = compare_revisions(
+      repo, org_rev, new_rev, args.paths
+    )
+    changes = len(tree.changed) + len(tree.added) + len(tree.removed)
+    to_directory = bool(args.output) and os.path.isdir(args.output)
+    if changes == 0 and not to_directory:
+      if len(tree.unchanged) == 1:
+        name = tree.unchanged[0]
+      else:
+        name = "{} files".format(len(tree.unchanged))
+      print(
+        "{}: no changes between {} and {}".format(name, org_rev, new_rev),
+        file=sys.stderr
+      )
+      return 0
+    if len(tree.changed) == changes == 1 and not to_directory:
+      path = tree.changed[0]
+      context = get_context(args)
+      context.setdefault('version', '{}..{}'.format(org_rev, new_rev))
+      context['org_filename'] = '{}@{}'.format(path, org_rev)
+      context['new_filename'] = '{}@{}'.format(path, new_rev)
+      add_asset_urls(args, context)
+      settings = Settings(
+        repo.read_blob(org_ids[path]), repo.read_blob(new_ids[path]),
+        **context
+      )
+      write_output(args, settings, cache)
+      return 0
+    if not args.output:
+      raise GitError("several files changed, `--output DIR` is required")
+    args.wrap_with_html = True
+    blob_dir = tempfile.mkdtemp(prefix='wdiffhtml-')
+    try:
+      jobs = git_jobs(
+        repo, tree, org_ids, new_ids, org_rev, new_rev, args.output,
+        blob_dir, report_suffix(args)
+      )
+      repo.close()
+      return run_reports(args, tree, jobs, org_rev, new_rev)
+    finally:
+      shutil.rmtree(blob_dir)
+
+
 def run_cli(argv=None):
   """
-  Calls :func:`wdiff` and prints the results to STDERR.
+  Calls :func:`wdiff` and prints the results to STDOUT.
 
   Parses the options for :meth:`wdiff` with :func:`parse_commandline`. If
   *argv* is supplied, it is used as command line, else the actual one is used.
@@ -178,25 +952,65 @@ def run_cli(argv=None):
   0: okay
   1: error with arguments
   2: `wdiff` not found
-  3: error running `wdiff`
+  3: error running `wdiff` or reading the files
+
+  In batch, recursive and revision mode, the highest return code of all
+  pairs is returned.
+
+  ``wdiffhtml serve`` runs the diff server instead (see :mod:`server`).
 
   """
+  if argv is None:
+    argv = sys.argv[1:]
+  if argv[:1] == [SERVE]:
+    from .server import run_server_cli
+    return run_server_cli(argv[1:])
   args = parse_commandline(argv)
   try:
+    if args.batch:
+      return run_batch_cli(args)
+    if args.recursive:
+      return run_recursive_cli(args)
+    if args.revisions:
+      return run_revisions_cli(args)
+    cache_dir = get_cache_dir(args)
+    cache = None
+    if cache_dir:
+      from .cache import DiffCache
+      cache = DiffCache(os.path.join(cache_dir, 'diffs'))
+      if args.wrap_with_html:
+        from .templates import configure_template_cache
+        configure_template_cache(
+          directory=os.path.join(cache_dir, 'templates')
+        )
+    if args.watch:
+      return run_watch_cli(args, cache)
+    if args.git:
+      return run_git_cli(args, cache)
+    profiler = None
+    if args.profile:
+      from .profiling import Profiler
+      profiler = Profiler(trace_memory=args.profile_memory)
+      profiler.start()
     context = get_context(args)
-    settings = Settings(args.org_file, args.new_file, **context)
-    results = wdiff(
-      settings, args.wrap_with_html, args.fold_tags, args.hard_breaks
-    )
-    print(results)
+    add_asset_urls(args, context)
+    with open_input(args.org_file, args.max_memory) as org_file:
+      with open_input(args.new_file, args.max_memory) as new_file:
+        settings = Settings(org_file, new_file, **context)
+        write_output(args, settings, cache, profiler=profiler)
+    if profiler:
+      profiler.stop()
+      print(profiler.to_json(), file=sys.stderr)
+    if cache and args.cache_stats:
+      print_cache_stats(cache)
     return 0
-  except ContextError as err:
+  except (ContextError, ManifestError, GitError, UnicodeError) as err:
     print("ERROR: {}.".format(err), file=sys.stderr)
     return 1
   except WdiffNotFoundError as err:
     print("ERROR: {}.".format(err), file=sys.stderr)
     return 2
-  except sub.CalledProcessError as err:
+  except (sub.CalledProcessError, EnvironmentError) as err:
     print("ERROR: {}.".format(err), file=sys.stderr)
     return 3
 
@@ -0,0 +1,405 @@
+# -*- coding: UTF-8 -*-
+
+"""
+A pure Python word diff engine.
+
+It mimics the output of `wdiff` (used with the options from
+:mod:`settings`), but runs in-process — so no `wdiff` binary is needed and
+no process has to be spawned for each diff.
+
+The input is split into *words* (runs of non whitespace bytes), each with
+the whitespace that precedes it. The word lists are compared with Myers'
+O(ND) algorithm (the same used by GNU diff) and the result is put together
+the way `wdiff` does it: common words and their whitespace are copied from
+the new file, deleted words from the original one.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import re
+
+from .inputs import read_input
+
+
+__all__ = [
+  'tokenize',
+  'diff_tokens',
+  'BaseIndex',
+  'iter_render_diff',
+  'render_diff',
+  'iter_pydiff',
+  'generate_pydiff',
+]
+
+
+ENGINE_VERSION = '2'
+
+MARKERS_HTML = (b'<del>', b'</del>', b'<ins>', b'</ins>')
+
+MARKERS_PLAIN = (b'[-', b'-]', b'{+', b'+}')
+
+RE_WORD = re.compile(br'(\s*)(\S+)')
+
+CHUNK_WORDS = 4096
+
+
+def tokenize(data):
+  """
+  Returns a tuple of *words*, *spaces* and *trailing* from the bytes *data*.
+
+  *words* is a list of all words and *spaces* a list of the whitespace
+  preceding each word. *trailing* is the whitespace after the last word.
+
+  """
+  words = []
+  spaces = []
+  end = 0
+  for match in RE_WORD.finditer(data):
+    spaces.append(match.group(1))
+    words.append(match.group(2))
+    end = match.end()
+  return words, spaces, data[end:]
+
+
+def _bisect(a, b):
+  """
+  Returns the point where the Myers middle snake of *a* and *b* is split.
+
+  Both sequences must not be empty. If there is no common item at all,
+  `None` is returned.
+
+  """
+  len_a = len(a)
+  len_b = len(b)
+  max_d = (len_a + len_b + 1) // 2
+  v_offset = max_d
+  v_length = 2 * max_d + 2
+  v1 = [-1] * v_length
+  v1[v_offset + 1] = 0
+  v2 = v1[:]
+  delta = len_a - len_b
+  front = delta % 2 != 0
+  k1start = k1end = k2start = k2end = 0
+  for d in range(max_d):
+    # forward path
+    for k1 in range(-d + k1start, d + 1 - k1end, 2):
+      k1_offset = v_offset + k1
+      if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+        x1 = v1[k1_offset + 1]
+      else:
+        x1 = v1[k1_offset - 1] + 1
+      y1 = x1 - k1
+      while x1 < len_a and y1 < len_b and a[x1] == b[y1]:
+        x1 += 1
+        y1 += 1
+      v1[k1_offset] = x1
+      if x1 > len_a:
+        k1end += 2
+      elif y1 > len_b:
+        k1start += 2
+      elif front:
+        k2_offset = v_offset + delta - k1
+        if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+          if x1 >= len_a - v2[k2_offset]:
+            return x1, y1
+    # reverse path
+    for k2 in range(-d + k2start, d + 1 - k2end, 2):
+      k2_offset = v_offset + k2
+      if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+        x2 = v2[k2_offset + 1]
+      else:
+        x2 = v2[k2_offset - 1] + 1
+      y2 = x2 - k2
+      while x2 < len_a and y2 < len_b and a[-x2 - 1] == b[-y2 - 1]:
+        x2 += 1
+        y2 += 1
+      v2[k2_offset] = x2
+      if x2 > len_a:
+        k2end += 2
+      elif y2 > len_b:
+        k2start += 2
+      elif not front:
+        k1_offset = v_offset + delta - k2
+        if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+          x1 = v1[k1_offset]
+          y1 = v_offset + x1 - k1_offset
+          if x1 >= len_a - x2:
+            return x1, y1
+  return None
+
+
+def _matching_blocks(a, b):
+  """
+  Returns a sorted list of `(i, j, size)` tuples for all common runs of *a*
+  and *b*.
+
+  """
+  blocks = []
+  stack = [(0, len(a), 0, len(b))]
+  while stack:
+    alo, ahi, blo, bhi = stack.pop()
+    # common prefix
+    size = 0
+    while (
+      alo + size < ahi and blo + size < bhi and
+      a[alo + size] == b[blo + size]
+    ):
+      size += 1
+    if size:
+      blocks.append((alo, blo, size))
+      alo += size
+      blo += size
+    # common suffix
+    size = 0
+    while (
+      alo < ahi - size and blo < bhi - size and
+      a[ahi - size - 1] == b[bhi - size - 1]
+    ):
+      size += 1
+    if size:
+      blocks.append((ahi - size, bhi - size, size))
+      ahi -= size
+      bhi -= size
+    if alo == ahi or blo == bhi:
+      continue
+    split = _bisect(a[alo:ahi], b[blo:bhi])
+    if split is not None:
+      x, y = split
+      stack.append((alo + x, ahi, blo + y, bhi))
+      stack.append((alo, alo + x, blo, blo + y))
+  blocks.sort()
+  return blocks
+
+
+def _common_matches(a, b, items_a=None):
+  """
+  Returns the matching blocks of *a* and *b* like :func:`_matching_blocks`.
+
+  Items that only occur in one of the sequences can't be part of a match,
+  so they are discarded before the (costly) search and the results are
+  mapped back to the original positions afterwards. *items_a* is the set of
+  the items of *a*, if it's known already.
+
+  """
+  if items_a is None:
+    items_a = set(a)
+  common = items_a.intersection(b)
+  index_a = [i for i, item in enumerate(a) if item in common]
+  index_b = [j for j, item in enumerate(b) if item in common]
+  if len(index_a) == len(a) and len(index_b) == len(b):
+    return _matching_blocks(a, b)
+  blocks = []
+  for i, j, size in _matching_blocks(
+    [a[i] for i in index_a], [b[j] for j in index_b]
+  ):
+    for k in range(size):
+      ai = index_a[i + k]
+      bj = index_b[j + k]
+      if blocks:
+        last_i, last_j, last_size = blocks[-1]
+        if last_i + last_size == ai and last_j + last_size == bj:
+          blocks[-1] = (last_i, last_j, last_size + 1)
+          continue
+      blocks.append((ai, bj, 1))
+  return blocks
+
+
+def diff_tokens(a, b):
+  """
+  Returns a list of opcodes transforming the sequence *a* into *b*.
+
+  The opcodes are `(tag, i1, i2, j1, j2)` tuples (like the ones from
+  :meth:`difflib.SequenceMatcher.get_opcodes`). *tag* is one of `equal`,
+  `delete`, `insert` or `replace`.
+
+  """
+  ids = {}
+  a = [ids.setdefault(token, len(ids)) for token in a]
+  b = [ids.setdefault(token, len(ids)) for token in b]
+  return _opcodes(_common_matches(a, b), len(a), len(b))
+
+
+def _opcodes(blocks, len_a, len_b):
+  """
+  Returns the opcodes for the matching *blocks* of two sequences with the
+  lengths *len_a* and *len_b* (see :func:`diff_tokens`).
+
+  """
+  opcodes = []
+  i = j = 0
+  for ai, bj, size in blocks + [(len_a, len_b, 0)]:
+    if i < ai and j < bj:
+      opcodes.append(('replace', i, ai, j, bj))
+    elif i < ai:
+      opcodes.append(('delete', i, ai, j, bj))
+    elif j < bj:
+      opcodes.append(('insert', i, ai, j, bj))
+    if size:
+      if opcodes and opcodes[-1][0] == 'equal':
+        _, i1, _, j1, _ = opcodes[-1]
+        opcodes[-1] = ('equal', i1, ai + size, j1, bj + size)
+      else:
+        opcodes.append(('equal', ai, ai + size, bj, bj + size))
+    i = ai + size
+    j = bj + size
+  return opcodes
+
+
+class BaseIndex(object):
+
+  """
+  A base document (bytes), tokenized and indexed once to diff many
+  revisions against it.
+
+  The words of the base are replaced by integer ids up front. The words of
+  a revision are only looked up in that index (words the base doesn't have
+  can't match anyway), so only the revision is tokenized for each diff.
+  The results are the same as from :func:`iter_pydiff`.
+
+  """
+
+  __slots__ = ('tokens', '_ids', '_words', '_items')
+
+  def __init__(self, data):
+    self.tokens = tokenize(data)
+    ids = {}
+    self._words = [ids.setdefault(word, len(ids)) for word in self.tokens[0]]
+    self._ids = ids
+    self._items = frozenset(self._words)
+
+  def diff_tokens(self, words):
+    """
+    Returns the opcodes transforming the base into the revision *words*
+    (see :func:`diff_tokens`).
+
+    """
+    ids = self._ids
+    revision = [ids.get(word, -1) for word in words]
+    blocks = _common_matches(self._words, revision, self._items)
+    return _opcodes(blocks, len(self._words), len(revision))
+
+  def iter_diff(self, new_file, fold_tags=False, html=True):
+    """
+    Yields the word diff of the base and the revision *new_file* as chunks
+    of bytes (see :func:`iter_pydiff`).
+
+    """
+    new = tokenize(read_input(new_file))
+    opcodes = self.diff_tokens(new[0])
+    return iter_render_diff(self.tokens, new, opcodes, fold_tags, html)
+
+
+def _copy_span(out, words, spaces, start, end, markers, fold_tags):
+  """
+  Appends the words *start* to *end* (and the whitespace between them) to
+  *out*, enclosed in the *markers* tuple.
+
+  Unless *fold_tags* is set, the markers are closed before and reopened
+  after whitespace containing line breaks.
+
+  """
+  opening, closing = markers
+  out.append(opening)
+  out.append(words[start])
+  for index in range(start + 1, end):
+    space = spaces[index]
+    if not fold_tags and b'\n' in space:
+      out.append(closing)
+      out.append(space)
+      out.append(opening)
+    else:
+      out.append(space)
+    out.append(words[index])
+  out.append(closing)
+
+
+def iter_render_diff(org, new, opcodes, fold_tags=False, html=True):
+  """
+  Yields the diff of the tokenized *org* and *new* as chunks of bytes.
+
+  *org* and *new* are the results from :func:`tokenize` and *opcodes* the
+  results from :func:`diff_tokens` for their words.
+
+  HTML `<ins>` and `<del>` tags will be used instead of the default markings,
+  unless *html* is set to `False`.
+
+  If *fold_tags* is set, the tags are allowed to span line breaks.
+
+  A deleted span is separated from the following common word by the
+  whitespace after it in *org* (or a space), even when that word starts
+  *new* and has no whitespace in front of it.
+
+  """
+  org_words, org_spaces, _ = org
+  new_words, new_spaces, new_trailing = new
+  markers = MARKERS_HTML if html else MARKERS_PLAIN
+  out = []
+  deleted = False
+  for tag, i1, i2, j1, j2 in opcodes:
+    if tag == 'equal':
+      if deleted and not new_spaces[j1]:
+        out.append(org_spaces[i1] or b' ')
+        out.append(new_words[j1])
+        j1 += 1
+      deleted = False
+      for start in range(j1, j2, CHUNK_WORDS):
+        for index in range(start, min(start + CHUNK_WORDS, j2)):
+          out.append(new_spaces[index])
+          out.append(new_words[index])
+        if len(out) >= CHUNK_WORDS:
+          yield b''.join(out)
+          del out[:]
+      continue
+    if i1 < i2:
+      out.append(org_spaces[i1])
+      _copy_span(
+        out, org_words, org_spaces, i1, i2, markers[:2], fold_tags
+      )
+    if j1 < j2:
+      out.append(b' ' if i1 < i2 else new_spaces[j1])
+      _copy_span(
+        out, new_words, new_spaces, j1, j2, markers[2:], fold_tags
+      )
+    deleted = j1 == j2
+    if len(out) >= CHUNK_WORDS:
+      yield b''.join(out)
+      del out[:]
+  out.append(new_trailing)
+  yield b''.join(out)
+
+
+def render_diff(org, new, opcodes, fold_tags=False, html=True):
+  """
+  Returns the diff of the tokenized *org* and *new* as bytes.
+
+  See :func:`iter_render_diff` for the arguments.
+
+  """
+  return b''.join(iter_render_diff(org, new, opcodes, fold_tags, html))
+
+
+def iter_pydiff(org_file, new_file, fold_tags=False, html=True):
+  """
+  Yields the word diff of *org_file* and *new_file* as chunks of bytes.
+
+  Both can be paths, bytes or file objects (see :mod:`inputs`).
+
+  """
+  org = tokenize(read_input(org_file))
+  new = tokenize(read_input(new_file))
+  opcodes = diff_tokens(org[0], new[0])
+  return iter_render_diff(org, new, opcodes, fold_tags, html)
+
+
+def generate_pydiff(org_file, new_file, fold_tags=False, html=True):
+  """
+  Returns the word diff of *org_file* and *new_file* as a string.
+
+  This is the in-process equivalent of :func:`utils.generate_wdiff` and
+  produces the same output.
+
+  """
+  diff = b''.join(iter_pydiff(org_file, new_file, fold_tags, html))
+  return diff.decode('utf-8')
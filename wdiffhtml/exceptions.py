@@ -19,3 +19,11 @@ class WdiffNotFoundError(WdiffHtmlError):
 
 class ContextError(WdiffHtmlError):
   """Raised on missing context variables."""
+
+
+class ManifestError(WdiffHtmlError):
+  """Raised on malformed batch manifests."""
+
+
+class GitError(WdiffHtmlError):
+  """Raised if `git` fails (e.g. on unknown revisions)."""
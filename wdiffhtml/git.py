@@ -0,0 +1,273 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Diff files across the revisions of a git repository.
+
+The contents are read straight from the repository, nothing is checked out.
+The blob ids of all requested paths are listed once per revision (with `git
+ls-tree`), so paths with the same blob in both revisions are skipped without
+reading them. The other blobs are read through one long lived `git cat-file
+--batch` process. For many files, they are copied to temporary files one at
+a time, so the workers get paths instead of the contents.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import sys
+import subprocess as sub
+
+from .batch import Job
+from .exceptions import GitError
+from .tree import (
+  TreeDiff,
+  prepare_report,
+)
+
+
+__all__ = [
+  'GitRepository',
+  'parse_revisions',
+  'compare_revisions',
+  'git_jobs',
+]
+
+
+GIT_CMD = 'git'
+
+DEFAULT_REVISION = 'HEAD'
+
+BLOCK_SIZE = 64 * 1024
+
+
+try:
+  _fsdecode = os.fsdecode
+except AttributeError:  # Python 2
+  def _fsdecode(path):
+    return path.decode(sys.getfilesystemencoding())
+
+
+def parse_revisions(spec):
+  """
+  Returns the two revisions of the range *spec* (`REV1..REV2`).
+
+  A missing revision (`REV1..` or just `REV1`) stands for `HEAD`.
+
+  Raises:
+
+    GitError: on symmetric ranges (`REV1...REV2`).
+
+  """
+  org, _, new = spec.partition('..')
+  if new.startswith('.'):
+    raise GitError("symmetric ranges are not supported: {}".format(spec))
+  return org or DEFAULT_REVISION, new or DEFAULT_REVISION
+
+
+class GitRepository(object):
+
+  """
+  Reads blobs from the repository containing *directory* (or the working
+  directory).
+
+  Paths are relative to *directory* (or the working directory), like for
+  the `git` command. Use it as a context manager (or call :meth:`close`) to
+  stop the `git cat-file` process.
+
+  """
+
+  def __init__(self, directory=None, git_cmd=GIT_CMD):
+    self.directory = directory
+    self.git_cmd = git_cmd
+    self._batch = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def command(self, *args):
+    """
+    Returns the command line to run `git` with *args*.
+
+    """
+    cmd = [self.git_cmd]
+    if self.directory:
+      cmd.extend(['-C', self.directory])
+    cmd.extend(args)
+    return cmd
+
+  def run(self, *args):
+    """
+    Runs `git` with *args* and returns its output (bytes).
+
+    Raises:
+
+      GitError: if `git` can't be run or fails.
+
+    """
+    try:
+      proc = sub.Popen(self.command(*args), stdout=sub.PIPE, stderr=sub.PIPE)
+    except OSError as err:
+      raise GitError("can't run {}: {}".format(self.git_cmd, err))
+    output, error = proc.communicate()
+    if proc.returncode:
+      raise GitError(error.decode('utf-8', 'replace').strip())
+    return output
+
+  def blob_ids(self, revision, paths):
+    """
+    Returns a dictionary with the blob ids of the files matching *paths*
+    (files or directories) in *revision*, keyed by their path.
+
+    """
+    ids = {}
+    output = self.run('ls-tree', '-r', '-z', revision, '--', *paths)
+    for entry in output.split(b'\0'):
+      if not entry:
+        continue
+      info, path = entry.split(b'\t', 1)
+      _, kind, blob_id = info.split()
+      if kind == b'blob':
+        ids[_fsdecode(path)] = blob_id.decode('ascii')
+    return ids
+
+  def _request_blob(self, blob_id):
+    """
+    Requests the blob *blob_id* from the `git cat-file` process and returns
+    its size (the contents follow on its output).
+
+    """
+    if self._batch is None:
+      try:
+        self._batch = sub.Popen(
+          self.command('cat-file', '--batch'),
+          stdin=sub.PIPE, stdout=sub.PIPE
+        )
+      except OSError as err:
+        raise GitError("can't run {}: {}".format(self.git_cmd, err))
+    proc = self._batch
+    proc.stdin.write(blob_id.encode('ascii') + b'\n')
+    proc.stdin.flush()
+    header = proc.stdout.readline().split()
+    if len(header) != 3:
+      raise GitError("can't read blob {}".format(blob_id))
+    return int(header[2])
+
+  def read_blob(self, blob_id):
+    """
+    Returns the contents of the blob *blob_id*.
+
+    Raises:
+
+      GitError: if it's not found.
+
+    """
+    size = self._request_blob(blob_id)
+    data = self._batch.stdout.read(size)
+    self._batch.stdout.read(1)  # the line break after the contents
+    return data
+
+  def write_blob(self, blob_id, fh):
+    """
+    Copies the contents of the blob *blob_id* to the file object *fh* (in
+    blocks, so it's never held in memory as a whole).
+
+    Raises:
+
+      GitError: if it's not found.
+
+    """
+    size = self._request_blob(blob_id)
+    stdout = self._batch.stdout
+    while size:
+      block = stdout.read(min(size, BLOCK_SIZE))
+      if not block:
+        raise GitError("can't read blob {}".format(blob_id))
+      fh.write(block)
+      size -= len(block)
+    stdout.read(1)  # the line break after the contents
+
+  def close(self):
+    """
+    Stops the `git cat-file` process.
+
+    """
+    if self._batch is not None:
+      self._batch.stdin.close()
+      self._batch.stdout.close()
+      self._batch.wait()
+      self._batch = None
+
+
+def compare_revisions(repo, org_revision, new_revision, paths):
+  """
+  Compares the files matching *paths* in the two revisions of the
+  :cls:`GitRepository` *repo*.
+
+  Returns a :cls:`tree.TreeDiff` and the blob ids of both revisions (see
+  :meth:`GitRepository.blob_ids`).
+
+  Raises:
+
+    GitError: if no files match in either revision.
+
+  """
+  org_ids = repo.blob_ids(org_revision, paths)
+  new_ids = repo.blob_ids(new_revision, paths)
+  if not (org_ids or new_ids):
+    raise GitError("no files found for {}".format(' '.join(paths)))
+  changed = []
+  unchanged = []
+  for path in sorted(set(org_ids) & set(new_ids)):
+    if org_ids[path] == new_ids[path]:
+      unchanged.append(path)
+    else:
+      changed.append(path)
+  tree = TreeDiff(
+    changed, sorted(set(new_ids) - set(org_ids)),
+    sorted(set(org_ids) - set(new_ids)), unchanged
+  )
+  return tree, org_ids, new_ids
+
+
+def _blob_path(repo, blob_id, blob_dir):
+  """
+  Returns the path of the blob *blob_id* in *blob_dir*, copying it from
+  *repo* first if it's not there yet.
+
+  """
+  path = os.path.join(blob_dir, blob_id)
+  if not os.path.exists(path):
+    with open(path, 'wb') as fh:
+      repo.write_blob(blob_id, fh)
+  return path
+
+
+def git_jobs(
+  repo, tree, org_ids, new_ids, org_revision, new_revision, out_dir,
+  blob_dir, suffix='.html'
+):
+  """
+  Returns the :cls:`batch.Job` tuples for the changed files of *tree* (see
+  :func:`compare_revisions`) and creates the directories for the reports.
+
+  The blobs are copied from *repo* to files in *blob_dir* (named by their
+  id, so each is written once), which have to be kept until the jobs are
+  done.
+
+  """
+  jobs = []
+  for path in tree.changed:
+    jobs.append(Job(
+      _blob_path(repo, org_ids[path], blob_dir),
+      _blob_path(repo, new_ids[path], blob_dir),
+      prepare_report(out_dir, path, suffix), {
+        'org_filename': '{}@{}'.format(path, org_revision),
+        'new_filename': '{}@{}'.format(path, new_revision),
+      }
+    ))
+  return jobs
@@ -0,0 +1,261 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Helpers to handle the inputs of a diff.
+
+An input is either the path to a file (a string), its contents (bytes) or a
+file object to read the contents from. Contents are passed on to the
+`wdiff` command through anonymous memory files (where the OS supports them),
+so there is no need to write them to temporary files first.
+
+For inputs larger than the available memory, files can be memory mapped
+(:func:`mapped_input`) and streams spooled to temporary files
+(:func:`spool_input`).
+
+Inputs are expected to be UTF-8. Other encodings are converted by
+:func:`transcode_input` (the encoding can be detected from a BOM or a
+sample of the contents, see :func:`detect_encoding`). UTF-8 inputs are
+passed on unchanged, without decoding them.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import codecs
+import mmap
+import os
+import tempfile
+
+from contextlib import contextmanager
+from pathlib import Path
+
+
+__all__ = [
+  'is_content',
+  'load_input',
+  'read_input',
+  'mapped_input',
+  'spool_input',
+  'detect_encoding',
+  'sniff_encoding',
+  'transcode_input',
+  'input_path',
+  'input_name',
+]
+
+
+CONTENT_NAME = '-'
+
+BLOCK_SIZE = 64 * 1024
+
+ENCODING_AUTO = 'auto'
+
+# used if the sample is neither UTF-8 nor UTF-16 (never fails to decode)
+FALLBACK_ENCODING = 'latin-1'
+
+# the UTF-32 BOMs start like the UTF-16 ones, so they are checked first
+BOMS = (
+  (codecs.BOM_UTF32_LE, 'utf-32'),
+  (codecs.BOM_UTF32_BE, 'utf-32'),
+  (codecs.BOM_UTF8, 'utf-8-sig'),
+  (codecs.BOM_UTF16_LE, 'utf-16'),
+  (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def is_content(source):
+  """
+  Returns `True` if *source* holds contents (and is not a path).
+
+  """
+  return isinstance(source, bytes) or hasattr(source, 'read')
+
+
+def load_input(source):
+  """
+  Returns *source* with file objects replaced by their contents (so they
+  can be used more than once).
+
+  """
+  if hasattr(source, 'read'):
+    data = source.read()
+    if not isinstance(data, bytes):
+      data = data.encode('utf-8')
+    return data
+  return source
+
+
+def read_input(source):
+  """
+  Returns the contents of *source* as bytes.
+
+  """
+  source = load_input(source)
+  if isinstance(source, bytes):
+    return source
+  with open(source, 'rb') as fh:
+    return fh.read()
+
+
+@contextmanager
+def mapped_input(source, use_mmap=True):
+  """
+  Yields the contents of *source*, as a read-only memory map for files if
+  *use_mmap* is set (so the OS pages them in as needed), else as bytes.
+
+  """
+  source = load_input(source)
+  if isinstance(source, bytes) or not use_mmap:
+    yield read_input(source)
+    return
+  with open(source, 'rb') as fh:
+    if not os.fstat(fh.fileno()).st_size:
+      data = b''  # empty files can't be mapped
+    else:
+      data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      yield data
+    finally:
+      if not isinstance(data, bytes):
+        data.close()
+
+
+@contextmanager
+def spool_input(fh, max_memory):
+  """
+  Yields the contents of the binary file object *fh* as bytes, or the path
+  of a temporary file holding them if they are larger than *max_memory*
+  bytes (the file is removed afterwards).
+
+  """
+  blocks = []
+  size = 0
+  for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+    blocks.append(block)
+    size += len(block)
+    if size > max_memory:
+      break
+  else:
+    yield b''.join(blocks)
+    return
+  fd, path = tempfile.mkstemp(prefix='wdiffhtml-')
+  try:
+    with os.fdopen(fd, 'wb') as out:
+      out.writelines(blocks)
+      del blocks[:]
+      for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+        out.write(block)
+    yield path
+  finally:
+    os.remove(path)
+
+
+def detect_encoding(sample, final=True):
+  """
+  Returns the name of the encoding of *sample* (the first bytes of some
+  contents, all of them if *final* is set).
+
+  A BOM decides if there is one. Else samples with NUL bytes are taken for
+  UTF-16 (the byte order from where most of them are) and the others for
+  UTF-8 if they decode as such, else for Latin-1.
+
+  """
+  for bom, encoding in BOMS:
+    if sample.startswith(bom):
+      return encoding
+  if b'\0' in sample:
+    if sample[1::2].count(b'\0') >= sample[0::2].count(b'\0'):
+      return 'utf-16-le'
+    return 'utf-16-be'
+  try:
+    sample.decode('utf-8')
+  except UnicodeDecodeError as err:
+    # a partial sample may end in the middle of a character
+    if final or err.reason != 'unexpected end of data':
+      return FALLBACK_ENCODING
+  return 'utf-8'
+
+
+def sniff_encoding(source, size=BLOCK_SIZE):
+  """
+  Returns the encoding of *source* (a path or bytes), detected from its
+  first *size* bytes (see :func:`detect_encoding`).
+
+  """
+  if isinstance(source, bytes):
+    return detect_encoding(source[:size], len(source) <= size)
+  with open(source, 'rb') as fh:
+    sample = fh.read(size)
+    return detect_encoding(sample, not fh.read(1))
+
+
+def _is_utf8(encoding):
+  return codecs.lookup(encoding).name == 'utf-8'
+
+
+def transcode_input(source, encoding=None):
+  """
+  Returns *source* converted from *encoding* to UTF-8.
+
+  The encoding is detected if it's `auto` (see :func:`sniff_encoding`).
+  UTF-8 inputs (or any if *encoding* is `None`) are returned as they are,
+  the others as bytes.
+
+  Raises:
+
+    LookupError: on unknown encodings.
+    UnicodeDecodeError: if *source* doesn't match the encoding.
+
+  """
+  if encoding is None:
+    return source
+  source = load_input(source)
+  if encoding == ENCODING_AUTO:
+    encoding = sniff_encoding(source)
+  if _is_utf8(encoding):
+    return source
+  return read_input(source).decode(encoding).encode('utf-8')
+
+
+@contextmanager
+def input_path(source):
+  """
+  Yields a tuple of a path for *source* and the file descriptors a
+  subprocess needs to inherit to open it.
+
+  Paths are used as they are. Contents are put into an anonymous memory
+  file (available as `/dev/fd/N`) or into a temporary file, if the OS lacks
+  support for those.
+
+  """
+  if not is_content(source):
+    yield source, ()
+    return
+  data = read_input(source)
+  if hasattr(os, 'memfd_create'):
+    fd = os.memfd_create('wdiffhtml')
+    try:
+      with os.fdopen(fd, 'wb', closefd=False) as fh:
+        fh.write(data)
+      yield '/dev/fd/{}'.format(fd), (fd,)
+    finally:
+      os.close(fd)
+  else:
+    fd, path = tempfile.mkstemp(prefix='wdiffhtml-')
+    try:
+      with os.fdopen(fd, 'wb') as fh:
+        fh.write(data)
+      yield path, ()
+    finally:
+      os.remove(path)
+
+
+def input_name(source):
+  """
+  Returns a display name for *source* (the filename for paths).
+
+  """
+  if is_content(source):
+    return CONTENT_NAME
+  return Path(source).name
@@ -0,0 +1,343 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Structured diff results.
+
+Instead of the marked up text, :func:`diff_operations` returns the
+operations (`equal`, `delete`, `insert` or `replace` a run of words) that
+turn the original text into the changed one. They can be counted and
+inspected, stored (as JSON or in a compact binary format) and rendered to
+a HTML fragment or a full document later on, without running the diff
+again.
+
+The operations are stored in arrays: as they cover both texts without gaps,
+a tag and the number of words on each side is all that's needed per
+operation. The offsets are computed when iterating over them.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import struct
+import sys
+
+from array import array
+
+from .engine import (
+  ENGINE_VERSION,
+  tokenize,
+  diff_tokens,
+  iter_render_diff,
+)
+from .inputs import read_input
+
+
+__all__ = [
+  'DiffOperations',
+  'diff_operations',
+]
+
+
+TAGS = ('equal', 'delete', 'insert', 'replace')
+
+TAG_CODES = dict((tag, code) for code, tag in enumerate(TAGS))
+
+FORMAT_VERSION = 2
+
+BINARY_MAGIC = b'WDHO'
+
+# magic, format version, flags, engine version, number of operations, size
+# of both texts
+BINARY_HEADER = struct.Struct('<4sBB8sIQQ')
+
+# the texts are included
+FLAG_TEXTS = 1
+
+# an unsigned type with 32 bits (for the word counts)
+SIZE_TYPE = str('I') if array(str('I')).itemsize == 4 else str('L')
+
+
+class DiffOperations(object):
+
+  """
+  The operations turning the text *org* into *new* (both bytes).
+
+  *opcodes* are `(tag, i1, i2, j1, j2)` tuples as returned by
+  :func:`engine.diff_tokens` (word offsets). Iterating over the object
+  yields them again.
+
+  """
+
+  __slots__ = ('org', 'new', '_tags', '_org_sizes', '_new_sizes')
+
+  def __init__(self, org, new, opcodes=()):
+    self.org = org
+    self.new = new
+    self._tags = array(str('B'))
+    self._org_sizes = array(SIZE_TYPE)
+    self._new_sizes = array(SIZE_TYPE)
+    for tag, i1, i2, j1, j2 in opcodes:
+      self._tags.append(TAG_CODES[tag])
+      self._org_sizes.append(i2 - i1)
+      self._new_sizes.append(j2 - j1)
+
+  def __len__(self):
+    return len(self._tags)
+
+  def __iter__(self):
+    i = j = 0
+    for code, org_size, new_size in zip(
+      self._tags, self._org_sizes, self._new_sizes
+    ):
+      yield TAGS[code], i, i + org_size, j, j + new_size
+      i += org_size
+      j += new_size
+
+  def __eq__(self, other):
+    if not isinstance(other, DiffOperations):
+      return NotImplemented
+    return (
+      self.org == other.org and self.new == other.new and
+      self._tags == other._tags and self._org_sizes == other._org_sizes and
+      self._new_sizes == other._new_sizes
+    )
+
+  def __ne__(self, other):
+    result = self.__eq__(other)
+    return result if result is NotImplemented else not result
+
+  __hash__ = None
+
+  def stats(self):
+    """
+    Returns a dictionary with the number of operations and the number of
+    equal, deleted and inserted words.
+
+    """
+    stats = {
+      'operations': len(self),
+      'equal': 0,
+      'deleted': 0,
+      'inserted': 0,
+    }
+    for code, org_size, new_size in zip(
+      self._tags, self._org_sizes, self._new_sizes
+    ):
+      if TAGS[code] == 'equal':
+        stats['equal'] += org_size
+      else:
+        stats['deleted'] += org_size
+        stats['inserted'] += new_size
+    return stats
+
+  def _check_words(self):
+    """
+    Raises a `ValueError` unless the operations cover all words of both
+    texts.
+
+    """
+    for name, text, sizes in (
+      ('org', self.org, self._org_sizes), ('new', self.new, self._new_sizes)
+    ):
+      # splits at the same (ASCII) whitespace as :func:`engine.tokenize`
+      if sum(sizes) != len(text.split()):
+        msg = "invalid data: the operations don't match `{}`".format(name)
+        raise ValueError(msg)
+
+  def iter_render(self, fold_tags=False, html=True):
+    """
+    Yields the diff as chunks of text (the same as from
+    :func:`utils.iter_wdiff`).
+
+    """
+    org = tokenize(self.org)
+    new = tokenize(self.new)
+    for chunk in iter_render_diff(org, new, self, fold_tags, html):
+      yield chunk.decode('utf-8')
+
+  def render(self, fold_tags=False, html=True):
+    """
+    Returns the diff as a string (the same as from
+    :func:`utils.generate_wdiff`).
+
+    """
+    return ''.join(self.iter_render(fold_tags, html))
+
+  def iter_render_document(
+    self, settings, fold_tags=False, hard_breaks=False
+  ):
+    """
+    Yields the diff wrapped in a HTML document (see
+    :func:`utils.iter_wrap_content`) as chunks of text.
+
+    """
+    from .utils import iter_wrap_content
+    chunks = self.iter_render(fold_tags)
+    for chunk in iter_wrap_content(chunks, settings, hard_breaks):
+      yield chunk
+
+  def render_document(self, settings, fold_tags=False, hard_breaks=False):
+    """
+    Returns the diff wrapped in a HTML document.
+
+    """
+    return ''.join(
+      self.iter_render_document(settings, fold_tags, hard_breaks)
+    )
+
+  def to_dict(self, texts=True):
+    """
+    Returns the operations as a dictionary (for JSON).
+
+    The texts are included unless *texts* is `False` (they have to be
+    passed to :meth:`from_dict` then).
+
+    """
+    data = {
+      'format': FORMAT_VERSION,
+      'engine': ENGINE_VERSION,
+      'opcodes': [list(opcode) for opcode in self],
+    }
+    if texts:
+      data['org'] = self.org.decode('utf-8', 'surrogateescape')
+      data['new'] = self.new.decode('utf-8', 'surrogateescape')
+    return data
+
+  @classmethod
+  def from_dict(cls, data, org=None, new=None):
+    """
+    Returns the operations from a dictionary created by :meth:`to_dict`.
+
+    *org* and *new* are used if the texts are not included.
+
+    Raises:
+
+      ValueError: if the data is invalid or from another engine version.
+
+    """
+    if data.get('format') != FORMAT_VERSION:
+      raise ValueError("unsupported format: {}".format(data.get('format')))
+    if data.get('engine') != ENGINE_VERSION:
+      raise ValueError("unsupported engine: {}".format(data.get('engine')))
+    try:
+      if org is None:
+        org = data['org'].encode('utf-8', 'surrogateescape')
+      if new is None:
+        new = data['new'].encode('utf-8', 'surrogateescape')
+      opcodes = [tuple(opcode) for opcode in data['opcodes']]
+      i = j = 0
+      for tag, i1, i2, j1, j2 in opcodes:
+        if (i1, j1) != (i, j) or i2 < i1 or j2 < j1:
+          raise ValueError("the operations aren't contiguous")
+        i, j = i2, j2
+      ops = cls(org, new, opcodes)
+    except (KeyError, TypeError, ValueError, OverflowError) as err:
+      raise ValueError("invalid data: {}".format(err))
+    ops._check_words()
+    return ops
+
+  def to_json(self, texts=True):
+    """
+    Returns the operations as JSON (see :meth:`to_dict`).
+
+    """
+    return json.dumps(self.to_dict(texts), separators=(',', ':'))
+
+  @classmethod
+  def from_json(cls, text, org=None, new=None):
+    """
+    Returns the operations from JSON created by :meth:`to_json`.
+
+    """
+    return cls.from_dict(json.loads(text), org, new)
+
+  def to_bytes(self, texts=True):
+    """
+    Returns the operations in a compact binary format.
+
+    A header is followed by the tags (one byte each), the number of words
+    of each operation in both texts (four bytes each, little endian) and
+    the texts (unless *texts* is `False`).
+
+    """
+    org = self.org if texts else b''
+    new = self.new if texts else b''
+    parts = [
+      BINARY_HEADER.pack(
+        BINARY_MAGIC, FORMAT_VERSION, FLAG_TEXTS if texts else 0,
+        ENGINE_VERSION.encode('ascii'), len(self), len(org), len(new)
+      ),
+      self._tags.tobytes(),
+    ]
+    for sizes in (self._org_sizes, self._new_sizes):
+      sizes = array(SIZE_TYPE, sizes)
+      if sys.byteorder == 'big':
+        sizes.byteswap()
+      parts.append(sizes.tobytes())
+    parts.append(org)
+    parts.append(new)
+    return b''.join(parts)
+
+  @classmethod
+  def from_bytes(cls, data, org=None, new=None):
+    """
+    Returns the operations from data created by :meth:`to_bytes`.
+
+    *org* and *new* are used if the texts are not included (and required
+    then).
+
+    Raises:
+
+      ValueError: if the data is invalid or from another engine version.
+
+    """
+    try:
+      header = BINARY_HEADER.unpack_from(data)
+    except struct.error:
+      raise ValueError("invalid data: header is incomplete")
+    magic, version, flags, engine, count, org_size, new_size = header
+    if magic != BINARY_MAGIC or version != FORMAT_VERSION:
+      raise ValueError("invalid data: unknown format")
+    engine = engine.rstrip(b'\0').decode('ascii', 'replace')
+    if engine != ENGINE_VERSION:
+      raise ValueError("unsupported engine: {}".format(engine))
+    if not flags & FLAG_TEXTS and (org is None or new is None):
+      raise ValueError("the texts are not included")
+    offset = BINARY_HEADER.size
+    size = count * 9 + org_size + new_size
+    if len(data) != offset + size:
+      raise ValueError("invalid data: wrong size")
+    ops = cls(org, new)
+    ops._tags.frombytes(data[offset:offset + count])
+    if any(code >= len(TAGS) for code in ops._tags):
+      raise ValueError("invalid data: unknown tag")
+    offset += count
+    for sizes in (ops._org_sizes, ops._new_sizes):
+      values = array(SIZE_TYPE)
+      values.frombytes(data[offset:offset + count * 4])
+      if sys.byteorder == 'big':
+        values.byteswap()
+      sizes.extend(values)
+      offset += count * 4
+    if org is None:
+      ops.org = data[offset:offset + org_size]
+    offset += org_size
+    if new is None:
+      ops.new = data[offset:offset + new_size]
+    ops._check_words()
+    return ops
+
+
+def diff_operations(org_file, new_file):
+  """
+  Returns the :cls:`DiffOperations` for *org_file* and *new_file* (paths,
+  bytes or file objects, see :mod:`inputs`), using the in-process
+  :mod:`engine`.
+
+  """
+  org = read_input(org_file)
+  new = read_input(new_file)
+  opcodes = diff_tokens(tokenize(org)[0], tokenize(new)[0])
+  return DiffOperations(org, new, opcodes)
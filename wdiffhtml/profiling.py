@@ -0,0 +1,222 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Instrumentation for the stages of a diff.
+
+Pass a :cls:`Profiler` to :func:`wdiff` (or :func:`stream_wdiff`) to record
+how much time, data and memory each stage takes:
+
+`transcode`
+  Converting the inputs to UTF-8 (only if their encoding is given).
+
+`resolve`
+  Looking up the `wdiff` command.
+
+`cache`
+  Hashing the inputs and looking up the diff cache.
+
+`diff`
+  Running `wdiff` (or the Python engine) and reading its output.
+
+`decode`
+  Decoding the output to text.
+
+`wrap_paragraphs`
+  Wrapping the paragraphs with `<p>` tags.
+
+`template`
+  Loading and compiling the template.
+
+`render`
+  Rendering the template.
+
+`write`
+  Writing the results to a file object.
+
+As the stages are streamed into each other, the time of each stage doesn't
+include the time spent in the stages before it. Memory is only traced (with
+:mod:`tracemalloc`) if *trace_memory* is set, which slows things down.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import sys
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+  import tracemalloc
+except ImportError:  # Python 2
+  tracemalloc = None
+
+try:
+  import resource
+except ImportError:  # Windows
+  resource = None
+
+try:
+  _timer = time.perf_counter
+except AttributeError:  # Python 2
+  _timer = time.time
+
+from .utils import NullProfiler
+
+
+__all__ = [
+  'Profiler',
+  'NullProfiler',
+]
+
+
+def _size(chunk):
+  """
+  Returns the size of *chunk* in bytes (text is counted as UTF-8).
+
+  """
+  if isinstance(chunk, bytes):
+    return len(chunk)
+  return len(chunk.encode('utf-8'))
+
+
+class Profiler(object):
+
+  """
+  Records the duration, number of calls, bytes produced and peak memory of
+  the stages of a diff.
+
+  """
+
+  def __init__(self, trace_memory=False):
+    self.trace_memory = trace_memory and tracemalloc is not None
+    self.stages = OrderedDict()
+    self._stack = []
+    self._started = None
+    self._duration = 0.0
+    self._tracing = False
+
+  def start(self):
+    """
+    Starts the overall timer (and tracing memory, if enabled).
+
+    """
+    if self.trace_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._tracing = True
+    self._started = _timer()
+
+  def stop(self):
+    """
+    Stops the overall timer (and tracing memory).
+
+    """
+    if self._started is not None:
+      self._duration += _timer() - self._started
+      self._started = None
+    if self._tracing:
+      self._sample_memory(None)
+      tracemalloc.stop()
+      self._tracing = False
+
+  def _record(self, name):
+    try:
+      return self.stages[name]
+    except KeyError:
+      record = self.stages[name] = {
+        'calls': 0,
+        'duration': 0.0,
+        'bytes': 0,
+      }
+      if self.trace_memory:
+        record['peak_memory'] = 0
+      return record
+
+  def _sample_memory(self, record):
+    if not tracemalloc.is_tracing():
+      return
+    _, peak = tracemalloc.get_traced_memory()
+    if record is not None:
+      record['peak_memory'] = max(record['peak_memory'], peak)
+    if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9 and above
+      tracemalloc.reset_peak()
+
+  def _enter(self, name):
+    if self.trace_memory:
+      # attribute the memory used so far to the stage we're leaving
+      if self._stack:
+        self._sample_memory(self._record(self._stack[-1][0]))
+    self._stack.append([name, _timer(), 0.0])
+
+  def _exit(self, size=0):
+    name, start, children = self._stack.pop()
+    elapsed = _timer() - start
+    record = self._record(name)
+    record['calls'] += 1
+    record['duration'] += elapsed - children
+    record['bytes'] += size
+    if self.trace_memory:
+      self._sample_memory(record)
+    if self._stack:
+      self._stack[-1][2] += elapsed
+
+  @contextmanager
+  def stage(self, name, data=None):
+    """
+    A context manager recording the time spent in its block as stage
+    *name* (along with the size of *data*, if given).
+
+    """
+    self._enter(name)
+    try:
+      yield
+    finally:
+      self._exit(0 if data is None else _size(data))
+
+  def iter_stage(self, name, chunks):
+    """
+    Yields the *chunks* and records the time spent producing them (and
+    their size) as stage *name*.
+
+    """
+    iterator = iter(chunks)
+    while True:
+      self._enter(name)
+      try:
+        chunk = next(iterator)
+      except StopIteration:
+        self._exit()
+        return
+      except BaseException:
+        self._exit()
+        raise
+      self._exit(_size(chunk))
+      yield chunk
+
+  def results(self):
+    """
+    Returns a dictionary with the recorded stages and totals.
+
+    """
+    duration = self._duration
+    if self._started is not None:
+      duration += _timer() - self._started
+    results = OrderedDict()
+    results['duration'] = duration
+    if resource is not None:
+      # kilobytes on Linux, bytes on macOS
+      factor = 1 if sys.platform == 'darwin' else 1024
+      usage = resource.getrusage(resource.RUSAGE_SELF)
+      results['max_rss'] = usage.ru_maxrss * factor
+    results['stages'] = self.stages
+    return results
+
+  def to_json(self):
+    """
+    Returns the results as JSON.
+
+    """
+    return json.dumps(self.results(), indent=2)
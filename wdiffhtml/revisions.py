@@ -0,0 +1,102 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Diff one base document against many revisions.
+
+The base is tokenized and indexed once (see :cls:`engine.BaseIndex`) and
+handed to the workers of :func:`batch.run_batch`, so only the revisions
+are tokenized for each diff. Revisions with the same contents as the base
+are skipped. The report for each revision is written to the output
+directory under its file name (with `.html` added), so they can be listed
+on an index page with :func:`tree.write_index`:
+
+>>> tree = compare_base('contract.txt', revisions)
+>>> jobs = base_jobs('contract.txt', revisions, tree, 'report')
+>>> index = index_base('contract.txt')
+>>> results = list(run_batch(jobs, backend='python', base_index=index))
+>>> write_index('report', tree, results)
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+
+from .batch import Job
+from .engine import BaseIndex
+from .inputs import (
+  read_input,
+  transcode_input,
+)
+from .tree import (
+  REPORT_SUFFIX,
+  TreeDiff,
+  same_content,
+  prepare_report,
+)
+
+
+__all__ = [
+  'revision_name',
+  'compare_base',
+  'base_jobs',
+  'index_base',
+]
+
+
+def revision_name(path):
+  """
+  Returns the name of the report for the revision *path* (its file name).
+
+  """
+  return os.path.basename(path)
+
+
+def compare_base(base, revisions):
+  """
+  Returns a :cls:`tree.TreeDiff` with the names of the *revisions* (paths)
+  that differ from the file *base* and of those that don't (nothing is
+  added or removed).
+
+  Raises:
+
+    ValueError: if two revisions have the same name.
+
+  """
+  changed = []
+  unchanged = []
+  names = set()
+  for path in revisions:
+    name = revision_name(path)
+    if name in names:
+      raise ValueError("more than one revision is named {}".format(name))
+    names.add(name)
+    if same_content(base, path):
+      unchanged.append(name)
+    else:
+      changed.append(name)
+  return TreeDiff(changed, [], [], unchanged)
+
+
+def base_jobs(base, revisions, tree, out_dir, suffix=REPORT_SUFFIX):
+  """
+  Returns the :cls:`batch.Job` tuples for the changed *revisions* of *tree*
+  (see :func:`compare_base`) and creates the directory for the reports.
+
+  """
+  changed = set(tree.changed)
+  return [
+    Job(base, path, prepare_report(out_dir, revision_name(path), suffix))
+    for path in revisions if revision_name(path) in changed
+  ]
+
+
+def index_base(base, encoding=None):
+  """
+  Returns the :cls:`engine.BaseIndex` for *base* (a path, bytes or a file
+  object), converted from *encoding* first (see
+  :func:`inputs.transcode_input`).
+
+  """
+  return BaseIndex(read_input(transcode_input(base, encoding)))
@@ -0,0 +1,634 @@
+# -*- coding: UTF-8 -*-
+
+"""
+A long running diff server (``wdiffhtml serve``).
+
+The server keeps the template compiled, the resources loaded and the path
+of the `wdiff` command resolved, so a request only costs the diff itself. It
+listens on a TCP port (localhost by default) or on a Unix socket.
+
+Endpoints
+---------
+
+`POST /diff`
+  Takes a JSON object (sent as `application/json`) with the texts to
+  compare (`org` and `new`) or the paths of the files (`org_file` and
+  `new_file`), the options `wrap_with_html`, `fold_breaks` and
+  `hard_breaks` (booleans) and an optional `context` object. Returns the
+  diff (a HTML fragment or a full document).
+
+`GET /diff`
+  The same with the arguments in the query string (files only).
+
+Files can only be diffed if the server is given a *root* directory, and
+only the ones below it. The `context` may only set the strings listed in
+`CONTEXT_KEYS` (`revision` sets the `version` of the document); the
+template and the resources can't be changed by a request.
+
+`GET /stats`
+  Returns a JSON object with the number of requests, the current queue
+  depth and the request latency.
+
+Responses carry an `ETag`, derived from the contents of the inputs, the
+options and the context. Request bodies above `MAX_BODY_SIZE` are refused
+(`413 Request Entity Too Large`). If it matches the `If-None-Match` header of a
+request, `304 Not Modified` is returned without running the diff.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import subprocess as sub
+
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+  from http.server import (
+    BaseHTTPRequestHandler,
+    HTTPServer,
+  )
+  from socketserver import (
+    ThreadingMixIn,
+    UnixStreamServer,
+  )
+  from urllib.parse import (
+    urlsplit,
+    parse_qsl,
+  )
+except ImportError:  # Python 2
+  from BaseHTTPServer import (
+    BaseHTTPRequestHandler,
+    HTTPServer,
+  )
+  from SocketServer import (
+    ThreadingMixIn,
+    UnixStreamServer,
+  )
+  from urlparse import (
+    urlsplit,
+    parse_qsl,
+  )
+
+from . import (
+  wdiff,
+  __version__ as version,
+)
+from .cache import (
+  DiffCache,
+  diff_key,
+)
+from .exceptions import (
+  WdiffNotFoundError,
+  ContextError,
+)
+from .settings import (
+  CACHE_DIR,
+  BACKEND_WDIFF,
+  BACKEND_PYTHON,
+  BACKENDS,
+  Settings,
+  default_context,
+  load_from_resource,
+)
+from .templates import (
+  configure_template_cache,
+  get_template,
+)
+from .utils import find_wdiff
+
+
+__all__ = [
+  'DiffService',
+  'make_server',
+  'run_server_cli',
+]
+
+
+LATENCY_SAMPLES = 1024
+
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+OPTIONS = ('wrap_with_html', 'fold_breaks', 'hard_breaks')
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+try:
+  string_types = (str, unicode)
+except NameError:  # Python 3
+  string_types = (str,)
+
+CONTEXT_KEYS = {
+  'org_filename': 'org_filename',
+  'new_filename': 'new_filename',
+  'revision': 'version',
+  'timestamp': 'timestamp',
+}
+
+
+class RequestError(ValueError):
+
+  """
+  Raised on invalid requests.
+
+  """
+
+
+class DiffService(object):
+
+  """
+  Runs the diffs for the server on a pool of *workers* threads and keeps
+  the statistics.
+
+  Requests can only diff files below the directory *root* (none, if it's
+  not set). The other arguments are the same as for :func:`wdiff`.
+
+  """
+
+  def __init__(
+    self, backend=BACKEND_WDIFF, wdiff_cmd=None, cache=None, workers=None,
+    root=None
+  ):
+    self.backend = backend
+    self.wdiff_cmd = wdiff_cmd
+    self.cache = cache
+    self.root = os.path.realpath(root) if root else None
+    self.workers = workers or multiprocessing.cpu_count()
+    self._executor = ThreadPoolExecutor(self.workers)
+    self._lock = threading.Lock()
+    self._latencies = deque(maxlen=LATENCY_SAMPLES)
+    self.started = time.time()
+    self.requests = 0
+    self.errors = 0
+    self.not_modified = 0
+    self.queued = 0
+    self.active = 0
+    self._resources_digest = None
+
+  def warm(self):
+    """
+    Resolves the `wdiff` command, loads the resources and compiles the
+    default template.
+
+    """
+    if self.backend == BACKEND_WDIFF:
+      find_wdiff(self.wdiff_cmd)
+    default_context()
+    get_template(load_from_resource('template.jinja'))
+
+  def settings(self, request):
+    """
+    Returns the :cls:`settings.Settings` for the *request* (a dictionary).
+
+    Raises:
+
+      RequestError: if the inputs are missing or invalid.
+
+    """
+    inputs = []
+    for name in ('org', 'new'):
+      if request.get(name) is not None:
+        text = request[name]
+        if not isinstance(text, string_types):
+          raise RequestError("`{}` must be a string".format(name))
+        inputs.append(text.encode('utf-8'))
+      elif request.get(name + '_file'):
+        inputs.append(self.resolve_file(request[name + '_file']))
+      else:
+        raise RequestError("`{0}` or `{0}_file` is required".format(name))
+    return Settings(inputs[0], inputs[1], **_parse_context(request))
+
+  def resolve_file(self, path):
+    """
+    Returns the real path of the file *path* (relative to :attr:`root`).
+
+    Raises:
+
+      RequestError: if files can't be diffed or *path* isn't below
+        :attr:`root`.
+
+    """
+    if self.root is None:
+      raise RequestError("diffing files is not enabled")
+    if not isinstance(path, string_types):
+      raise RequestError("file paths must be strings")
+    path = os.path.realpath(os.path.join(self.root, path))
+    prefix = os.path.join(self.root, '')
+    if path != self.root and not path.startswith(prefix):
+      raise RequestError("files must be below the root directory")
+    return path
+
+  def resources_digest(self):
+    """
+    Returns a digest of the default template and resources (computed once,
+    as requests can't change them).
+
+    """
+    if self._resources_digest is None:
+      context = default_context()
+      parts = [load_from_resource('template.jinja')]
+      parts.extend(context[key] for key in sorted(context))
+      digest = hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+      self._resources_digest = digest
+    return self._resources_digest
+
+  def etag(self, settings, options):
+    """
+    Returns the entity tag for a diff with *settings* and *options*.
+
+    It's derived from the contents of the inputs, the options and the
+    context variables a request can set (see `CONTEXT_KEYS`).
+
+    """
+    if self.backend == BACKEND_PYTHON:
+      wdiff_path = None
+    else:
+      wdiff_path = find_wdiff(self.wdiff_cmd)
+    parts = [
+      diff_key(
+        settings.org_file, settings.new_file, options['fold_breaks'], True,
+        self.backend, wdiff_path
+      ),
+      json.dumps(options, sort_keys=True),
+      version,
+    ]
+    if options['wrap_with_html']:
+      context = settings.context
+      parts.append(self.resources_digest())
+      parts.append(json.dumps(
+        [context.get(key) for key in sorted(CONTEXT_KEYS.values())]
+      ))
+    digest = hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+    return '"{}"'.format(digest)
+
+  def render(self, settings, options):
+    """
+    Returns the diff for *settings* and *options*, run on the worker pool.
+
+    """
+    with self._lock:
+      self.queued += 1
+    return self._executor.submit(self._render, settings, options).result()
+
+  def _render(self, settings, options):
+    with self._lock:
+      self.queued -= 1
+      self.active += 1
+    try:
+      return wdiff(
+        settings, options['wrap_with_html'], options['fold_breaks'],
+        options['hard_breaks'], self.backend, self.wdiff_cmd, self.cache
+      )
+    finally:
+      with self._lock:
+        self.active -= 1
+
+  def record(self, duration, error=False, not_modified=False):
+    """
+    Records a request which took *duration* seconds.
+
+    """
+    with self._lock:
+      self.requests += 1
+      self.errors += bool(error)
+      self.not_modified += bool(not_modified)
+      self._latencies.append(duration)
+
+  def stats(self):
+    """
+    Returns a dictionary with the statistics of the server.
+
+    The latency is given in milliseconds, over the last requests.
+
+    """
+    with self._lock:
+      latencies = sorted(self._latencies)
+      stats = {
+        'uptime': time.time() - self.started,
+        'workers': self.workers,
+        'requests': self.requests,
+        'errors': self.errors,
+        'not_modified': self.not_modified,
+        'queued': self.queued,
+        'active': self.active,
+      }
+    latency = {}
+    if latencies:
+      latency['mean'] = sum(latencies) / len(latencies) * 1000
+      for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        index = min(int(len(latencies) * fraction), len(latencies) - 1)
+        latency[name] = latencies[index] * 1000
+      latency['max'] = latencies[-1] * 1000
+    stats['latency'] = latency
+    if self.cache is not None:
+      stats['cache'] = {'hits': self.cache.hits, 'misses': self.cache.misses}
+    return stats
+
+  def shutdown(self):
+    self._executor.shutdown()
+
+
+def _parse_options(request):
+  """
+  Returns the options of the *request* as booleans.
+
+  """
+  options = {}
+  for name in OPTIONS:
+    value = request.get(name, False)
+    if not isinstance(value, bool):
+      value = str(value).lower() in TRUE_VALUES
+    options[name] = value
+  return options
+
+
+def _parse_context(request):
+  """
+  Returns the context variables of the *request* (see `CONTEXT_KEYS`).
+
+  Raises:
+
+    RequestError: on other keys or values which aren't strings.
+
+  """
+  context = request.get('context') or {}
+  if not isinstance(context, dict):
+    raise RequestError("`context` must be an object")
+  parsed = {}
+  for key, value in context.items():
+    if key not in CONTEXT_KEYS:
+      raise RequestError("`{}` can't be set in the context".format(key))
+    if not isinstance(value, string_types):
+      raise RequestError("`{}` must be a string".format(key))
+    parsed[CONTEXT_KEYS[key]] = value
+  return parsed
+
+
+def _etag_matches(header, etag):
+  """
+  Returns `True` if the `If-None-Match` *header* matches *etag*.
+
+  """
+  if not header:
+    return False
+  tags = [tag.strip() for tag in header.split(',')]
+  return '*' in tags or etag in tags or 'W/' + etag in tags
+
+
+def _content_type(headers):
+  """
+  Returns the content type (without parameters) of the request *headers*.
+
+  """
+  if hasattr(headers, 'get_content_type'):
+    return headers.get_content_type()
+  return headers.gettype()  # Python 2
+
+
+class DiffRequestHandler(BaseHTTPRequestHandler):
+
+  """
+  Handles the requests to the :cls:`DiffService` of the server.
+
+  """
+
+  server_version = 'wdiffhtml/{}'.format(version)
+
+  protocol_version = 'HTTP/1.1'
+
+  def address_string(self):
+    # clients on Unix sockets have no address
+    if not self.client_address:
+      return self.server.server_address
+    return BaseHTTPRequestHandler.address_string(self)
+
+  def log_message(self, format, *args):
+    if not self.server.quiet:
+      BaseHTTPRequestHandler.log_message(self, format, *args)
+
+  def do_GET(self):
+    url = urlsplit(self.path)
+    if url.path == '/stats':
+      return self.send_json(200, self.server.service.stats())
+    if url.path == '/diff':
+      return self.handle_diff(dict(parse_qsl(url.query)), files_only=True)
+    return self.send_json(404, {'error': "not found"})
+
+  def do_POST(self):
+    url = urlsplit(self.path)
+    try:
+      length = int(self.headers.get('Content-Length') or 0)
+    except ValueError:
+      length = -1
+    if length < 0:
+      self.close_connection = True
+      return self.send_json(400, {'error': "invalid `Content-Length`"})
+    if length > self.server.max_body_size:
+      self.close_connection = True
+      return self.send_json(413, {'error': "request body too large"})
+    body = self.rfile.read(length)
+    if url.path != '/diff':
+      return self.send_json(404, {'error': "not found"})
+    if _content_type(self.headers) != 'application/json':
+      return self.send_json(415, {'error': "expected `application/json`"})
+    try:
+      request = json.loads(body.decode('utf-8'))
+    except ValueError:
+      return self.send_json(400, {'error': "invalid JSON"})
+    if not isinstance(request, dict):
+      return self.send_json(400, {'error': "expected a JSON object"})
+    return self.handle_diff(request)
+
+  def handle_diff(self, request, files_only=False):
+    service = self.server.service
+    start = time.time()
+    try:
+      if files_only and (request.get('org') or request.get('new')):
+        raise RequestError("texts can only be posted")
+      settings = service.settings(request)
+      options = _parse_options(request)
+      etag = service.etag(settings, options)
+      if _etag_matches(self.headers.get('If-None-Match'), etag):
+        status, body = 304, None
+      else:
+        status, body = 200, service.render(settings, options).encode('utf-8')
+    except (
+      RequestError, ContextError, TypeError, ValueError, UnicodeError,
+      LookupError,
+    ) as err:
+      status, body = 400, {'error': str(err)}
+    except EnvironmentError as err:
+      status, body = 404, {'error': str(err)}
+    except (WdiffNotFoundError, sub.CalledProcessError) as err:
+      status, body = 500, {'error': str(err)}
+    # recorded before responding, so the statistics include the request
+    service.record(
+      time.time() - start, error=status >= 400, not_modified=status == 304
+    )
+    if status >= 400:
+      return self.send_json(status, body)
+    self.send_response(status)
+    if body is not None:
+      self.send_header('Content-Type', 'text/html; charset=utf-8')
+      self.send_header('Content-Length', str(len(body)))
+    self.send_header('ETag', etag)
+    self.end_headers()
+    if body is not None:
+      self.wfile.write(body)
+
+  def send_json(self, status, data):
+    body = json.dumps(data, sort_keys=True).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+
+class DiffHTTPServer(ThreadingMixIn, HTTPServer):
+
+  daemon_threads = True
+
+  max_body_size = MAX_BODY_SIZE
+
+  def __init__(self, address, service, quiet=False):
+    HTTPServer.__init__(self, address, DiffRequestHandler)
+    self.service = service
+    self.quiet = quiet
+
+
+class DiffUnixServer(ThreadingMixIn, UnixStreamServer):
+
+  daemon_threads = True
+
+  max_body_size = MAX_BODY_SIZE
+
+  def __init__(self, path, service, quiet=False):
+    if os.path.exists(path):
+      os.remove(path)
+    UnixStreamServer.__init__(self, path, DiffRequestHandler)
+    self.service = service
+    self.quiet = quiet
+
+  def server_close(self):
+    UnixStreamServer.server_close(self)
+    if os.path.exists(self.server_address):
+      os.remove(self.server_address)
+
+
+def make_server(
+  service, host='127.0.0.1', port=8000, socket_path=None, quiet=False
+):
+  """
+  Returns a server for the :cls:`DiffService` *service*, listening on
+  *host* and *port* or on the Unix socket *socket_path* (if given).
+
+  """
+  if socket_path:
+    if not hasattr(socket, 'AF_UNIX'):
+      raise ValueError("Unix sockets are not supported on this platform")
+    return DiffUnixServer(socket_path, service, quiet)
+  return DiffHTTPServer((host, port), service, quiet)
+
+
+def parse_server_commandline(argv):
+  """
+  Returns the arguments of ``wdiffhtml serve`` parsed from *argv*.
+
+  """
+  ap = ArgumentParser(
+    prog='wdiffhtml serve',
+    description="Runs a diff server with warm workers.",
+  )
+  ap.add_argument(
+    '--host', default='127.0.0.1',
+    help="address to listen on (default: %(default)s)"
+  )
+  ap.add_argument(
+    '--port', type=int, default=8000,
+    help="port to listen on (default: %(default)s)"
+  )
+  ap.add_argument(
+    '--socket', metavar='PATH', dest='socket_path',
+    help="listen on this Unix socket instead"
+  )
+  ap.add_argument(
+    '--workers', metavar='N', type=int,
+    help="number of worker threads (default: number of CPUs)"
+  )
+  ap.add_argument(
+    '--backend', choices=BACKENDS, default=BACKEND_WDIFF,
+    help="diff engine (default: %(default)s)"
+  )
+  ap.add_argument(
+    '--wdiff', metavar='PATH', dest='wdiff_cmd',
+    help="name or path of the `wdiff` command"
+  )
+  ap.add_argument(
+    '--cache', action='store_true',
+    help="cache the results"
+  )
+  ap.add_argument(
+    '--cache-dir', metavar='DIR',
+    help="cache directory (default: `{}`); implies `--cache`".format(
+      CACHE_DIR
+    )
+  )
+  ap.add_argument(
+    '--root', metavar='DIR',
+    help="allow requests to diff the files below DIR"
+  )
+  ap.add_argument(
+    '-q', '--quiet', action='store_true',
+    help="don't log the requests"
+  )
+  return ap.parse_args(argv)
+
+
+def run_server_cli(argv=None):
+  """
+  Runs ``wdiffhtml serve`` until it's interrupted.
+
+  """
+  args = parse_server_commandline(argv)
+  cache = None
+  if args.cache or args.cache_dir:
+    cache_dir = args.cache_dir or CACHE_DIR
+    cache = DiffCache(os.path.join(cache_dir, 'diffs'))
+    configure_template_cache(directory=os.path.join(cache_dir, 'templates'))
+  service = DiffService(
+    args.backend, args.wdiff_cmd, cache, args.workers, args.root
+  )
+  try:
+    service.warm()
+  except WdiffNotFoundError as err:
+    print("ERROR: {}.".format(err), file=sys.stderr)
+    return 2
+  server = make_server(
+    service, args.host, args.port, args.socket_path, args.quiet
+  )
+  print(
+    "serving on {}".format(
+      args.socket_path or 'http://{}:{}/'.format(*server.server_address[:2])
+    ),
+    file=sys.stderr
+  )
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    service.shutdown()
+  return 0
@@ -9,12 +9,16 @@ it's context along with the filenames for the diff…
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
-from pathlib import Path
+import os
 
-from pkg_resources import resource_string
+from collections import ChainMap
+from pathlib import Path
+from types import MappingProxyType
 
 from appdirs import user_data_dir
 
+from .inputs import input_name
+
 
 __all__ = [
   'Settings',
@@ -23,6 +27,17 @@ __all__ = [
 
 CMD_WDIFF = 'wdiff'
 
+ENV_WDIFF = 'WDIFFHTML_WDIFF'
+
+BACKEND_WDIFF = 'wdiff'
+
+BACKEND_PYTHON = 'python'
+
+BACKENDS = [
+  BACKEND_WDIFF,
+  BACKEND_PYTHON,
+]
+
 OPTIONS_LINEBREAK = [
   '-n',
 ]
@@ -36,28 +51,97 @@ OPTIONS_OUTPUT = [
 
 USER_DIR = user_data_dir('wdiffhtml')
 
+CACHE_DIR = os.path.join(USER_DIR, 'cache')
+
+GZIP_SUFFIX = '.gz'
+
+GZIP_LEVEL = 6
+
+
+_RESOURCES = {}
+
+# the default context shared by all settings (read-only, see
+# :func:`_shared_context`)
+_DEFAULT_CONTEXT = []
+
+
+def _read_resource(name):
+  """
+  Returns the contents of the packaged data file *name* as bytes.
+
+  """
+  try:
+    from importlib.resources import files
+  except ImportError:  # Python < 3.9
+    from pkg_resources import resource_string
+    return resource_string('wdiffhtml', 'data/' + name)
+  return files('wdiffhtml').joinpath('data').joinpath(name).read_bytes()
+
 
 def load_from_resource(name):
   """
   Returns the contents of a file resource.
 
   If the resource exists in the users data directory, it is used instead
-  of the default resource.
+  of the default resource. Resources are only read once per process.
 
   """
+  try:
+    return _RESOURCES[name]
+  except KeyError:
+    pass
   filepath = Path(USER_DIR) / name
   if filepath.exists():
     with filepath.open() as fh:
-      return fh.read()
+      content = fh.read()
   else:
-    return resource_string('wdiffhtml', 'data/' + name).decode('utf-8')
+    content = _read_resource(name).decode('utf-8')
+  _RESOURCES[name] = content
+  return content
+
+
+def default_context():
+  """
+  Returns a new dictionary with the default context (the resources are
+  loaded on first use).
+
+  """
+  return {
+    'content': "",
+    'css': load_from_resource('styles.css'),
+    'js': load_from_resource('main.js'),
+    'js2': load_from_resource('secondary.js'),
+  }
+
+
+def _shared_context():
+  """
+  Returns a read-only view of the default context, created once per
+  process.
+
+  """
+  if not _DEFAULT_CONTEXT:
+    _DEFAULT_CONTEXT.append(MappingProxyType(default_context()))
+  return _DEFAULT_CONTEXT[0]
 
 
 class Settings(object):
 
   """
-  The class holds the path to the files that should be compared as well as
-  the template used for the output along with it's context.
+  The class holds the path to the files that should be compared (or their
+  contents, see :mod:`inputs`) as well as the template used for the output
+  along with it's context.
+
+  The default template and context are only loaded from the resources,
+  when they are accessed.
+
+  Settings are immutable (use :meth:`replace` to derive new ones) and
+  rendering never changes them, so they can be shared between threads.
+
+  The `wdiff` command (a name or path) can be set as *wdiff_cmd*. It's
+  used unless one is passed to the diff functions directly, and takes
+  precedence over the `WDIFFHTML_WDIFF` environment variable (see
+  :func:`utils.find_wdiff`).
 
   Context Variables
   -----------------
@@ -77,9 +161,13 @@ class Settings(object):
   `js`
     JS for the document.
 
-  `js`
+  `js2`
     Secondary JS for the document (loaded before the first, for frameworks…).
 
+  `css_url`, `js_url` and `js2_url`
+    Links to the CSS and JS (optional, used instead of including them, see
+    :mod:`assets`).
+
   `timestamp`
     :cls:`datetime.datetime` of the diff (optional).
 
@@ -88,21 +176,78 @@ class Settings(object):
 
   """
 
-  template = load_from_resource('template.jinja')
-
-  _context = {
-    'content': "",
-    'css': load_from_resource('styles.css'),
-    'js': load_from_resource('main.js'),
-    'js2': load_from_resource('secondary.js'),
-  }
-
-  def __init__(self, org_file, new_file, template=None, **context):
-    self.org_file = org_file
-    self.new_file = new_file
-    if template:
-      self.template = template
-    self.context = self._context.copy()
-    self.context['org_filename'] = Path(org_file).name
-    self.context['new_filename'] = Path(new_file).name
-    self.context.update(context)
+  __slots__ = (
+    'org_file', 'new_file', '_template', '_extra_context', 'wdiff_cmd',
+    '_context',
+  )
+
+  def __init__(
+    self, org_file, new_file, template=None, wdiff_cmd=None, **context
+  ):
+    self.__setstate__((org_file, new_file, template, context, wdiff_cmd))
+
+  def __getstate__(self):
+    return (
+      self.org_file, self.new_file, self._template, self._extra_context,
+      self.wdiff_cmd,
+    )
+
+  def __setstate__(self, state):
+    init = super(Settings, self).__setattr__
+    for name, value in zip(self.__slots__, state):
+      init(name, value)
+    init('_context', None)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("settings are immutable, use replace()")
+
+  def __delattr__(self, name):
+    raise AttributeError("settings are immutable, use replace()")
+
+  def __repr__(self):
+    return '{}({!r}, {!r})'.format(
+      type(self).__name__, self.org_file, self.new_file
+    )
+
+  @property
+  def template(self):
+    return self._template or load_from_resource('template.jinja')
+
+  @property
+  def context(self):
+    """
+    A read-only mapping with the context for the template.
+
+    The given context variables are looked up first, then the filenames
+    and the default context, which is shared by all settings.
+
+    """
+    if self._context is None:
+      names = {
+        'org_filename': input_name(self.org_file),
+        'new_filename': input_name(self.new_file),
+      }
+      context = MappingProxyType(
+        ChainMap(self._extra_context, names, _shared_context())
+      )
+      super(Settings, self).__setattr__('_context', context)
+    return self._context
+
+  def replace(
+    self, org_file=None, new_file=None, template=None, wdiff_cmd=None,
+    **context
+  ):
+    """
+    Returns new settings with the files, template, `wdiff` command and
+    context variables given here replaced.
+
+    """
+    extra_context = dict(self._extra_context)
+    extra_context.update(context)
+    return type(self)(
+      self.org_file if org_file is None else org_file,
+      self.new_file if new_file is None else new_file,
+      self._template if template is None else template,
+      self.wdiff_cmd if wdiff_cmd is None else wdiff_cmd,
+      **extra_context
+    )
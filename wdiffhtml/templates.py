@@ -0,0 +1,134 @@
+# -*- coding: UTF-8 -*-
+
+"""
+A cache for compiled Jinja2 templates.
+
+Compiling a template to Python code is expensive compared to rendering a
+small document, so compiled templates are kept in a bounded LRU cache
+(keyed by a hash of their source). Optionally the bytecode is also stored
+on disk, so new processes don't need to compile them either.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+
+from jinja2 import (
+  Environment,
+  FileSystemBytecodeCache,
+)
+
+from .settings import CACHE_DIR
+
+
+__all__ = [
+  'TemplateCache',
+  'get_template',
+  'configure_template_cache',
+]
+
+
+TEMPLATE_CACHE_SIZE = 16
+
+TEMPLATE_CACHE_DIR = os.path.join(CACHE_DIR, 'templates')
+
+
+class TemplateCache(object):
+
+  """
+  Holds up to *size* compiled templates (least recently used ones are
+  evicted first).
+
+  If *directory* is set, the compiled bytecode is also stored there.
+
+  The cache can be shared between threads (compiled templates are safe to
+  render concurrently).
+
+  """
+
+  def __init__(self, size=TEMPLATE_CACHE_SIZE, directory=None):
+    self.size = size
+    self.directory = directory
+    self.templates = OrderedDict()
+    self._lock = threading.Lock()
+    bytecode_cache = None
+    if directory:
+      try:
+        os.makedirs(directory)
+      except OSError:
+        pass
+      if os.path.isdir(directory):
+        bytecode_cache = FileSystemBytecodeCache(directory)
+    self.environment = Environment(bytecode_cache=bytecode_cache)
+
+  def get(self, source):
+    """
+    Returns the compiled template for *source*.
+
+    """
+    key = hashlib.sha1(source.encode('utf-8')).hexdigest()
+    with self._lock:
+      try:
+        template = self.templates.pop(key)
+      except KeyError:
+        template = self.compile(key, source)
+      self.templates[key] = template
+      while len(self.templates) > self.size:
+        self.templates.popitem(last=False)
+    return template
+
+  def compile(self, name, source):
+    """
+    Returns *source* compiled as template *name*, using the bytecode cache
+    if available.
+
+    """
+    env = self.environment
+    bytecode_cache = env.bytecode_cache
+    code = None
+    if bytecode_cache is not None:
+      bucket = bytecode_cache.get_bucket(env, name, None, source)
+      code = bucket.code
+    if code is None:
+      code = env.compile(source, name)
+      if bytecode_cache is not None:
+        bucket.code = code
+        try:
+          bytecode_cache.set_bucket(bucket)
+        except EnvironmentError:
+          pass
+    return env.template_class.from_code(env, code, env.make_globals(None))
+
+  def clear(self):
+    """
+    Removes all templates from the (in memory) cache.
+
+    """
+    self.templates.clear()
+
+
+_CACHE = [TemplateCache()]
+
+
+def configure_template_cache(size=TEMPLATE_CACHE_SIZE, directory=None):
+  """
+  Replaces the global template cache with a new one (see
+  :cls:`TemplateCache` for the arguments) and returns it.
+
+  """
+  _CACHE[0] = TemplateCache(size, directory)
+  return _CACHE[0]
+
+
+def get_template(source):
+  """
+  Returns the compiled template for *source* from the global cache.
+
+  """
+  return _CACHE[0].get(source)
@@ -0,0 +1,185 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Diff two directory trees.
+
+The files are paired by their path relative to the directories. Files with
+the same contents are skipped (their sizes are compared first, the contents
+only if they match), the others are diffed in parallel with
+:func:`batch.run_batch`. Each report is written to the output directory
+under the relative path of its file (with `.html` added) and an index page
+links them all, along with the lists of added and removed files.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import os
+
+from collections import namedtuple
+
+from .batch import Job
+from .settings import (
+  load_from_resource,
+  default_context,
+)
+
+
+__all__ = [
+  'TreeDiff',
+  'iter_files',
+  'same_content',
+  'compare_trees',
+  'report_path',
+  'prepare_report',
+  'tree_jobs',
+  'write_index',
+]
+
+
+TreeDiff = namedtuple('TreeDiff', 'changed added removed unchanged')
+
+REPORT_SUFFIX = '.html'
+
+INDEX_NAME = 'index.html'
+
+BLOCK_SIZE = 64 * 1024
+
+
+def iter_files(directory):
+  """
+  Yields the paths of all files below *directory*, relative to it.
+
+  """
+  for root, dirs, files in os.walk(directory):
+    dirs.sort()
+    for name in sorted(files):
+      path = os.path.join(root, name)
+      if os.path.isfile(path):
+        yield os.path.relpath(path, directory)
+
+
+def same_content(path1, path2):
+  """
+  Returns `True` if the files *path1* and *path2* have the same contents.
+
+  The sizes are compared first, the contents (block by block) only if they
+  match.
+
+  """
+  if os.path.getsize(path1) != os.path.getsize(path2):
+    return False
+  with open(path1, 'rb') as fh1:
+    with open(path2, 'rb') as fh2:
+      while True:
+        block = fh1.read(BLOCK_SIZE)
+        if block != fh2.read(BLOCK_SIZE):
+          return False
+        if not block:
+          return True
+
+
+def compare_trees(org_dir, new_dir):
+  """
+  Returns a :cls:`TreeDiff` with the sorted lists of the relative paths of
+  the files that changed, were added, removed or are unchanged between
+  *org_dir* and *new_dir*.
+
+  """
+  org_files = set(iter_files(org_dir))
+  new_files = set(iter_files(new_dir))
+  changed = []
+  unchanged = []
+  for path in sorted(org_files & new_files):
+    if same_content(
+      os.path.join(org_dir, path), os.path.join(new_dir, path)
+    ):
+      unchanged.append(path)
+    else:
+      changed.append(path)
+  return TreeDiff(
+    changed, sorted(new_files - org_files), sorted(org_files - new_files),
+    unchanged
+  )
+
+
+def report_path(out_dir, path, suffix=REPORT_SUFFIX):
+  """
+  Returns the path of the report for the relative *path* in *out_dir*.
+
+  """
+  return os.path.join(out_dir, path + suffix)
+
+
+def prepare_report(out_dir, path, suffix=REPORT_SUFFIX):
+  """
+  Returns the path of the report for the relative *path* in *out_dir* and
+  creates its directory.
+
+  """
+  output = report_path(out_dir, path, suffix)
+  directory = os.path.dirname(output)
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+  return output
+
+
+def tree_jobs(tree, org_dir, new_dir, out_dir, suffix=REPORT_SUFFIX):
+  """
+  Returns the :cls:`batch.Job` tuples for the changed files of the
+  :cls:`TreeDiff` *tree* (and creates the directories for the reports).
+
+  """
+  return [
+    Job(
+      os.path.join(org_dir, path), os.path.join(new_dir, path),
+      prepare_report(out_dir, path, suffix)
+    )
+    for path in tree.changed
+  ]
+
+
+def write_index(
+  out_dir, tree, results=(), context=None, suffix=REPORT_SUFFIX,
+  template=None
+):
+  """
+  Writes the index page for the :cls:`TreeDiff` *tree* to *out_dir* and
+  returns its path.
+
+  *results* are the :cls:`batch.Result` tuples of the reports (the errors
+  are shown instead of the links). The page is rendered from *template*
+  (else `index.jinja` from the resources) with the default *context*
+  updated by the given one (`org_filename` and `new_filename` should be
+  set to the names of the directories).
+
+  """
+  from .templates import get_template
+  errors = {}
+  for result in results:
+    if result.error:
+      errors[os.path.abspath(result.job.output)] = result.error
+  changed = []
+  for path in tree.changed:
+    output = report_path(out_dir, path, suffix)
+    changed.append({
+      'path': path,
+      'url': os.path.relpath(output, out_dir).replace(os.sep, '/'),
+      'error': errors.get(os.path.abspath(output)),
+    })
+  index_context = default_context()
+  index_context.update(context or {})
+  index_context.update({
+    'changed': changed,
+    'added': tree.added,
+    'removed': tree.removed,
+    'unchanged': tree.unchanged,
+  })
+  template = get_template(template or load_from_resource('index.jinja'))
+  index = os.path.join(out_dir, INDEX_NAME)
+  with io.open(index, 'w', encoding='utf-8') as fh:
+    fh.write(template.render(**index_context))
+    fh.write('\n')
+  return index
@@ -8,75 +8,362 @@ Some functions to generate HTMLified diffs with `wdiff`.
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import codecs
 import subprocess as sub
 import os
 
-from jinja2 import Template
+from collections import deque
+from contextlib import contextmanager
+
+try:
+  from shutil import which
+except ImportError:  # Python 2
+  from distutils.spawn import find_executable as which
 
 from .exceptions import (
   WdiffNotFoundError,
   ContextError,
 )
+from .engine import iter_pydiff
+from .inputs import (
+  load_input,
+  transcode_input,
+  input_path,
+)
 from .settings import (
   CMD_WDIFF,
+  ENV_WDIFF,
+  BACKEND_WDIFF,
+  BACKEND_PYTHON,
+  BACKENDS,
   OPTIONS_LINEBREAK,
   OPTIONS_OUTPUT,
 )
 
 
 __all__ = [
+  'find_wdiff',
+  'clear_wdiff_cache',
   'check_for_wdiff',
+  'wdiff_command',
+  'check_wdiff_returncode',
+  'iter_wdiff_bytes',
+  'iter_wdiff',
   'generate_wdiff',
+  'diff_texts',
   'build_paragraph',
+  'iter_paragraphs',
+  'iter_wrap_paragraphs',
   'wrap_paragraphs',
+  'iter_wrap_changes',
+  'wrap_changes',
+  'iter_wrap_content',
   'wrap_content',
 ]
 
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_MARKER = '\x00wdiffhtml-content\x00'
+
+OPEN_TAGS = ('<ins>', '<del>')
+
+CLOSE_TAGS = ('</ins>', '</del>')
+
+SKIPPED_BUTTON = (
+  '\n</template><button data-count="{}">{}</button></div>'
+)
+
+SKIPPED_LABEL = '<div class="skipped" data-count="{}"><span>{}</span></div>'
+
+
+_WDIFF_PATHS = {}
+
+
+class NullProfiler(object):
 
-def check_for_wdiff():
   """
-  Checks if the `wdiff` command can be found.
+  A profiler which doesn't record anything (used if none is given, see
+  :cls:`profiling.Profiler`).
+
+  """
+
+  @contextmanager
+  def stage(self, name, data=None):
+    yield
+
+  def iter_stage(self, name, chunks):
+    return chunks
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def find_wdiff(cmd=None):
+  """
+  Returns the absolute path of the `wdiff` command.
+
+  The command is *cmd* if given, else the one set in the environment
+  variable `WDIFFHTML_WDIFF` or plain `wdiff`. It is looked up in `PATH`
+  only once per process, later calls return the memoized result (see
+  :func:`clear_wdiff_cache`).
 
   Raises:
 
     WdiffNotFoundError: if ``wdiff`` is not found.
 
   """
-  cmd = ['which', CMD_WDIFF]
-  DEVNULL = open(os.devnull, 'wb')
-  proc = sub.Popen(cmd, stdout=DEVNULL)
-  proc.wait()
-  DEVNULL.close()
-  if proc.returncode != 0:
-    msg = "the `{}` command can't be found".format(CMD_WDIFF)
+  if cmd is None:
+    cmd = os.environ.get(ENV_WDIFF) or CMD_WDIFF
+  try:
+    return _WDIFF_PATHS[cmd]
+  except KeyError:
+    pass
+  path = which(cmd)
+  if path is None:
+    msg = "the `{}` command can't be found".format(cmd)
     raise WdiffNotFoundError(msg)
+  path = os.path.abspath(path)
+  _WDIFF_PATHS[cmd] = path
+  return path
+
+
+def clear_wdiff_cache():
+  """
+  Forgets all paths memoized by :func:`find_wdiff`.
+
+  """
+  _WDIFF_PATHS.clear()
+
+
+def check_for_wdiff(cmd=None):
+  """
+  Checks if the `wdiff` command can be found.
+
+  Raises:
+
+    WdiffNotFoundError: if ``wdiff`` is not found.
+
+  """
+  find_wdiff(cmd)
+
+
+def iter_wdiff_bytes(
+  org_file, new_file, fold_tags=False, html=True, backend=BACKEND_WDIFF,
+  wdiff_cmd=None, cache=None, profiler=None, encoding=None, base_index=None
+):
+  """
+  Yields the raw results from the `wdiff` command (UTF-8 encoded) as chunks
+  of bytes, without decoding them. See :func:`generate_wdiff` for the
+  arguments.
+
+  If a *base_index* (an :cls:`engine.BaseIndex` of *org_file*) is given,
+  *new_file* is diffed against it with the Python engine (the *backend* and
+  the *cache* are not used then).
+
+  """
+  if profiler is None:
+    profiler = NULL_PROFILER
+  if base_index is not None:
+    new_file = load_input(new_file)
+    if encoding is not None:
+      with profiler.stage('transcode'):
+        new_file = transcode_input(new_file, encoding)
+    return profiler.iter_stage(
+      'diff', base_index.iter_diff(new_file, fold_tags, html)
+    )
+  org_file = load_input(org_file)
+  new_file = load_input(new_file)
+  if encoding is not None:
+    with profiler.stage('transcode'):
+      org_file = transcode_input(org_file, encoding)
+      new_file = transcode_input(new_file, encoding)
+  return profiler.iter_stage('diff', _iter_cached_diff_bytes(
+    org_file, new_file, fold_tags, html, backend, wdiff_cmd, cache, profiler
+  ))
+
+
+def iter_wdiff(
+  org_file, new_file, fold_tags=False, html=True, backend=BACKEND_WDIFF,
+  wdiff_cmd=None, cache=None, profiler=None, encoding=None, base_index=None
+):
+  """
+  Yields the results from the `wdiff` command as chunks of text.
+
+  The output is read from the pipe and decoded incrementally, so the whole
+  diff is never held in memory. See :func:`generate_wdiff` for the
+  arguments.
+
+  """
+  if profiler is None:
+    profiler = NULL_PROFILER
+  chunks = iter_wdiff_bytes(
+    org_file, new_file, fold_tags, html, backend, wdiff_cmd, cache,
+    profiler, encoding, base_index
+  )
+  for text in profiler.iter_stage('decode', _iter_decode(chunks)):
+    yield text
 
 
-def generate_wdiff(org_file, new_file, fold_tags=False, html=True):
+def _iter_decode(chunks):
+  """
+  Yields the UTF-8 encoded *chunks* as text.
+
+  """
+  decoder = codecs.getincrementaldecoder('utf-8')()
+  for chunk in chunks:
+    text = decoder.decode(chunk)
+    if text:
+      yield text
+  text = decoder.decode(b'', final=True)
+  if text:
+    yield text
+
+
+def wdiff_command(org_path, new_path, fold_tags, html, wdiff_cmd=None):
+  """
+  Returns the arguments to run `wdiff` on the files *org_path* and
+  *new_path* (see :func:`generate_wdiff` for the other arguments).
+
+  """
+  cmd = [find_wdiff(wdiff_cmd)]
+  if html:
+    cmd.extend(OPTIONS_OUTPUT)
+  if not fold_tags:
+    cmd.extend(OPTIONS_LINEBREAK)
+  cmd.extend([org_path, new_path])
+  return cmd
+
+
+def check_wdiff_returncode(returncode, cmd, output=None):
+  """
+  Raises a :exc:`subprocess.CalledProcessError` if `wdiff` (run as *cmd*)
+  failed.
+
+  `wdiff` exits with `0` if the files are the same and `1` if they differ;
+  anything else (or being killed by a signal) is an error.
+
+  """
+  if returncode > 1 or returncode < 0:
+    raise sub.CalledProcessError(returncode, cmd, output)
+
+
+def _iter_cached_diff_bytes(
+  org_file, new_file, fold_tags, html, backend, wdiff_cmd, cache,
+  profiler=NULL_PROFILER
+):
+  """
+  Yields the raw output of the selected *backend* from the *cache* (a
+  :cls:`cache.DiffCache`) if possible and stores it there otherwise.
+
+  """
+  if backend == BACKEND_PYTHON:
+    wdiff_path = None
+  elif backend in BACKENDS:
+    with profiler.stage('resolve'):
+      wdiff_path = find_wdiff(wdiff_cmd)
+  else:
+    raise ValueError("unknown backend: {}".format(backend))
+  if cache is None:
+    return _iter_diff_bytes(
+      org_file, new_file, fold_tags, html, backend, wdiff_path
+    )
+  with profiler.stage('cache'):
+    key = cache.key(
+      org_file, new_file, fold_tags, html, backend, wdiff_path
+    )
+    chunks = cache.iter_get(key)
+  if chunks is None:
+    chunks = cache.iter_set(key, _iter_diff_bytes(
+      org_file, new_file, fold_tags, html, backend, wdiff_path
+    ))
+  return chunks
+
+
+def _iter_diff_bytes(org_file, new_file, fold_tags, html, backend, wdiff_cmd):
+  """
+  Yields the raw output of the selected *backend* in chunks.
+
+  Raises:
+
+    CalledProcessError: after the last chunk, if `wdiff` failed.
+
+  """
+  if backend == BACKEND_PYTHON:
+    for chunk in iter_pydiff(org_file, new_file, fold_tags, html):
+      yield chunk
+    return
+  if backend not in BACKENDS:
+    raise ValueError("unknown backend: {}".format(backend))
+  with input_path(org_file) as (org_path, org_fds):
+    with input_path(new_file) as (new_path, new_fds):
+      cmd = wdiff_command(org_path, new_path, fold_tags, html, wdiff_cmd)
+      proc = sub.Popen(cmd, stdout=sub.PIPE, pass_fds=org_fds + new_fds)
+      try:
+        for chunk in iter(lambda: proc.stdout.read(CHUNK_SIZE), b''):
+          yield chunk
+      finally:
+        proc.stdout.close()
+        proc.wait()
+      check_wdiff_returncode(proc.returncode, cmd)
+
+
+def generate_wdiff(
+  org_file, new_file, fold_tags=False, html=True, backend=BACKEND_WDIFF,
+  wdiff_cmd=None, cache=None, profiler=None, encoding=None
+):
   """
   Returns the results from the `wdiff` command as a string.
 
+  *org_file* and *new_file* are paths, or the contents to compare (as bytes
+  or file objects, see :mod:`inputs` and :func:`diff_texts`).
+
   HTML `<ins>` and `<del>` tags will be used instead of the default markings,
   unless *html* is set to `False`.
 
   If *fold_tags* is set, `<ins>` and `<del>` tags are allowed to span line
   breaks (option `-n` is not used).
 
+  The *backend* selects the diff engine: `wdiff` runs the `wdiff` command,
+  `python` uses the in-process :mod:`engine` (same output, no subprocess).
+
+  The `wdiff` command is resolved by :func:`find_wdiff` (use *wdiff_cmd* to
+  set an explicit name or path).
+
+  If a *cache* (:cls:`cache.DiffCache`) is given, the results are taken
+  from it if possible and stored in it otherwise.
+
+  A :cls:`profiling.Profiler` can be passed in as *profiler* to record the
+  time spent in each stage.
+
+  The inputs are expected to be UTF-8, unless their *encoding* is given
+  (`auto` to detect it, see :func:`inputs.transcode_input`).
+
   Raises:
 
+    ValueError: on an unknown *backend*
+    WdiffNotFoundError: if ``wdiff`` is not found.
     subrocess.CalledProcessError: on any `wdiff` process errors
 
   """
-  check_for_wdiff()
-  cmd = [CMD_WDIFF]
-  if html:
-    cmd.extend(OPTIONS_OUTPUT)
-  if not fold_tags:
-    cmd.extend(OPTIONS_LINEBREAK)
-  cmd.extend([org_file, new_file])
-  proc = sub.Popen(cmd, stdout=sub.PIPE)
-  diff, _ = proc.communicate()
-  return diff.decode('utf-8')
+  return ''.join(iter_wdiff(
+    org_file, new_file, fold_tags, html, backend, wdiff_cmd, cache, profiler,
+    encoding
+  ))
+
+
+def diff_texts(org_text, new_text, fold_tags=False, html=True, **kwargs):
+  """
+  Returns the diff of the texts *org_text* and *new_text* (strings are
+  encoded as UTF-8, bytes are used as they are).
+
+  The other arguments are the same as for :func:`generate_wdiff`.
+
+  """
+  if not isinstance(org_text, bytes):
+    org_text = org_text.encode('utf-8')
+  if not isinstance(new_text, bytes):
+    new_text = new_text.encode('utf-8')
+  return generate_wdiff(org_text, new_text, fold_tags, html, **kwargs)
 
 
 def build_paragraph(content, hard_breaks=False):
@@ -93,6 +380,95 @@ def build_paragraph(content, hard_breaks=False):
   return "<p>{}</p>".format('\n'.join(lines))
 
 
+def iter_paragraphs(chunks):
+  """
+  Yields the paragraphs from the text *chunks* as tuples of their lines.
+
+  Paragraphs are separated the same way as by :func:`iter_wrap_paragraphs`:
+  by empty lines. The lines are stripped and blank ones are dropped.
+
+  """
+  para = []
+  pending = []
+  for chunk in chunks:
+    if '\n' not in chunk:
+      pending.append(chunk)
+      continue
+    if pending:
+      pending.append(chunk)
+      chunk = ''.join(pending)
+    lines = chunk.split('\n')
+    pending = [lines.pop()]
+    for line in lines:
+      if not line:
+        if para:
+          yield tuple(para)
+          para = []
+        continue
+      line = line.strip()
+      if line:
+        para.append(line)
+  line = ''.join(pending).strip()
+  if line:
+    para.append(line)
+  if para:
+    yield tuple(para)
+
+
+def iter_wrap_paragraphs(chunks, hard_breaks=False):
+  """
+  Yields the paragraphs from the text *chunks* wrapped in `<p>` tags.
+
+  The text is scanned once, line by line: empty lines separate the
+  paragraphs, the other lines are stripped and those left blank are dropped.
+  Output is yielded for each chunk as soon as its lines are complete, so
+  joining the results is the same as calling :func:`wrap_paragraphs` on the
+  joined *chunks*.
+
+  If *hard_breaks* is set, line breaks are converted to `<br />` tags.
+
+  """
+  line_break = '<br />\n' if hard_breaks else '\n'
+  para_start = '<p>'
+  in_para = False
+  pending = []
+  for chunk in chunks:
+    if '\n' not in chunk:
+      pending.append(chunk)
+      continue
+    if pending:
+      pending.append(chunk)
+      chunk = ''.join(pending)
+    lines = chunk.split('\n')
+    pending = [lines.pop()]
+    out = []
+    for line in lines:
+      if not line:
+        if in_para:
+          out.append('</p>')
+          in_para = False
+        continue
+      line = line.strip()
+      if not line:
+        continue
+      if in_para:
+        out.append(line_break)
+      else:
+        out.append(para_start)
+        para_start = '\n<p>'
+        in_para = True
+      out.append(line)
+    if out:
+      yield ''.join(out)
+  line = ''.join(pending).strip()
+  if line:
+    yield line_break if in_para else para_start
+    yield line
+    in_para = True
+  if in_para:
+    yield '</p>'
+
+
 def wrap_paragraphs(content, hard_breaks=False):
   """
   Returns *content* with all paragraphs wrapped in `<p>` tags.
@@ -100,22 +476,194 @@ def wrap_paragraphs(content, hard_breaks=False):
   If *hard_breaks* is set, line breaks are converted to `<br />` tags.
 
   """
-  paras = filter(None, [para.strip() for para in content.split('\n\n')])
-  paras = [build_paragraph(para, hard_breaks) for para in paras]
-  return '\n'.join(paras)
+  return ''.join(iter_wrap_paragraphs(_iter_slices(content), hard_breaks))
+
+
+def _skipped_label(count):
+  return '{} unchanged paragraph{}'.format(count, '' if count == 1 else 's')
+
+
+def iter_wrap_changes(chunks, hard_breaks=False, context=3, expand=True):
+  """
+  Yields only the changed paragraphs (those with `<ins>` or `<del>` tags)
+  from the text *chunks* wrapped in `<p>` tags, along with *context*
+  unchanged paragraphs before and after each of them.
+
+  Each run of other unchanged paragraphs is replaced by a placeholder
+  (`<div class="skipped">`). If *expand* is set, the placeholder keeps the
+  paragraphs in a `<template>` (which browsers don't render) and a button
+  to show them, else only their number.
+
+  Paragraphs are separated the same way as by :func:`iter_wrap_paragraphs`
+  and only *context* paragraphs are held back at a time. If *hard_breaks*
+  is set, line breaks are converted to `<br />` tags.
+
+  """
+  line_break = '<br />\n' if hard_breaks else '\n'
+  before = deque()
+  after = 0
+  skipped = 0
+  open_tags = 0
+  separator = ''
+
+  def skip(para):
+    if skipped:
+      return '\n' + para
+    return '{}<div class="skipped"><template>\n{}'.format(separator, para)
+
+  def placeholder():
+    if expand:
+      return SKIPPED_BUTTON.format(skipped, _skipped_label(skipped))
+    return separator + SKIPPED_LABEL.format(skipped, _skipped_label(skipped))
+
+  for lines in iter_paragraphs(chunks):
+    para = '<p>{}</p>'.format(line_break.join(lines))
+    # folded tags can span paragraphs
+    changed = bool(open_tags)
+    for tag in OPEN_TAGS:
+      count = para.count(tag)
+      changed = changed or bool(count)
+      open_tags += count
+    for tag in CLOSE_TAGS:
+      count = para.count(tag)
+      changed = changed or bool(count)
+      open_tags -= count
+    if changed:
+      if skipped:
+        yield placeholder()
+        separator = '\n'
+        skipped = 0
+      while before:
+        yield separator + before.popleft()
+        separator = '\n'
+      yield separator + para
+      separator = '\n'
+      after = context
+    elif after:
+      yield separator + para
+      separator = '\n'
+      after -= 1
+    else:
+      before.append(para)
+      if len(before) > context:
+        hidden = before.popleft()
+        if expand:
+          yield skip(hidden)
+        skipped += 1
+  while before:
+    hidden = before.popleft()
+    if expand:
+      yield skip(hidden)
+    skipped += 1
+  if skipped:
+    yield placeholder()
+
+
+def wrap_changes(content, hard_breaks=False, context=3, expand=True):
+  """
+  Returns the changed paragraphs of *content* wrapped in `<p>` tags, with
+  the unchanged ones replaced by placeholders (see
+  :func:`iter_wrap_changes`).
+
+  """
+  return ''.join(iter_wrap_changes(
+    _iter_slices(content), hard_breaks, context, expand
+  ))
+
+
+def _iter_slices(content, size=CHUNK_SIZE):
+  """
+  Yields *content* in slices of about *size* characters, split after line
+  breaks (to keep the lines in one piece).
+
+  """
+  start = 0
+  while start < len(content):
+    end = content.find('\n', start + size) + 1 or len(content)
+    if start == 0 and end == len(content):
+      yield content
+    else:
+      yield content[start:end]
+    start = end
+
+
+def iter_wrap_content(
+  chunks, settings, hard_breaks=False, template=None, wrapper=None,
+  profiler=None
+):
+  """
+  Yields the text *chunks* wrapped in a HTML structure.
+
+  The template is rendered with :meth:`jinja2.Template.generate` and the
+  paragraphs are streamed into the place of the `content` variable.
+
+  If *hard_breaks* is set, line breaks are converted to `<br />` tags.
+
+  A precompiled *template* can be passed in, else the one from *settings*
+  is taken from the template cache (see :mod:`templates`).
+
+  The paragraphs are wrapped by *wrapper*, a function with the same
+  signature as :func:`iter_wrap_paragraphs` (the default).
+
+  The stages are recorded by *profiler* (a :cls:`profiling.Profiler`), if
+  given.
+
+  """
+  if wrapper is None:
+    wrapper = iter_wrap_paragraphs
+  if profiler is None:
+    profiler = NULL_PROFILER
+  if template is None:
+    from .templates import get_template
+    with profiler.stage('template'):
+      template = get_template(settings.template)
+  context = dict(settings.context, content=CONTENT_MARKER)
+  try:
+    parts = profiler.iter_stage('render', template.generate(**context))
+    for part in parts:
+      if CONTENT_MARKER not in part:
+        yield part
+        continue
+      head, tail = part.split(CONTENT_MARKER, 1)
+      yield head
+      for para in profiler.iter_stage(
+        'wrap_paragraphs', wrapper(chunks, hard_breaks)
+      ):
+        yield para
+      yield tail.replace(CONTENT_MARKER, '')
+  except KeyError as error:
+    msg = "missing context setting: {}".format(error)
+    raise ContextError(msg)
 
 
-def wrap_content(content, settings, hard_breaks=False):
+def wrap_content(
+  content, settings, hard_breaks=False, template=None, profiler=None
+):
   """
   Returns *content* wrapped in a HTML structure.
 
   If *hard_breaks* is set, line breaks are converted to `<br />` tags.
 
+  A precompiled *template* can be passed in, else the one from *settings*
+  is taken from the template cache (see :mod:`templates`).
+
+  The stages are recorded by *profiler* (a :cls:`profiling.Profiler`), if
+  given.
+
   """
-  settings.context['content'] = wrap_paragraphs(content, hard_breaks)
-  template = Template(settings.template)
+  if profiler is None:
+    profiler = NULL_PROFILER
+  with profiler.stage('wrap_paragraphs'):
+    context = dict(
+      settings.context, content=wrap_paragraphs(content, hard_breaks)
+    )
+  if template is None:
+    from .templates import get_template
+    with profiler.stage('template'):
+      template = get_template(settings.template)
   try:
-    return template.render(**settings.context)
+    with profiler.stage('render'):
+      return template.render(**context)
   except KeyError as error:
     msg = "missing context setting: {}".format(error)
     raise ContextError(msg)
@@ -0,0 +1,369 @@
+# -*- coding: UTF-8 -*-
+
+"""
+Watch the input files and re-render the diff when they change.
+
+Changes are detected with `inotify` where available (Linux) and by polling
+the files otherwise. Bursts of changes (an editor saving a file in several
+steps) are debounced.
+
+A :cls:`ParagraphCache` keeps the results of the last run, keyed by the
+content of the paragraphs, so only the paragraphs which changed since are
+diffed and wrapped again.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+from .chunked import (
+  _Paragraphs,
+  _diff_block,
+)
+from .engine import diff_tokens
+from .inputs import (
+  read_input,
+  transcode_input,
+)
+from .settings import (
+  BACKEND_WDIFF,
+  BACKEND_PYTHON,
+)
+from .utils import (
+  find_wdiff,
+  wrap_paragraphs,
+  iter_wrap_content,
+)
+
+
+__all__ = [
+  'InotifyWatcher',
+  'PollingWatcher',
+  'make_watcher',
+  'iter_changes',
+  'ParagraphCache',
+]
+
+
+DEBOUNCE = 0.2
+
+POLL_INTERVAL = 0.5
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+IN_MASK = (
+  IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWatcher(object):
+
+  """
+  Detects changes of the files *paths* by comparing their status every
+  *interval* seconds.
+
+  """
+
+  def __init__(self, paths, interval=POLL_INTERVAL):
+    self.paths = [os.path.abspath(path) for path in paths]
+    self.interval = interval
+    self._state = self._snapshot()
+
+  def _snapshot(self):
+    state = []
+    for path in self.paths:
+      try:
+        stat = os.stat(path)
+      except OSError:
+        state.append(None)
+      else:
+        state.append((stat.st_mtime, stat.st_size, stat.st_ino))
+    return state
+
+  def wait(self, timeout=None):
+    """
+    Waits until a file changes or *timeout* seconds have passed (forever
+    if it's `None`).
+
+    Returns `True` if a file changed.
+
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+      state = self._snapshot()
+      if state != self._state:
+        self._state = state
+        return True
+      if deadline is None:
+        time.sleep(self.interval)
+        continue
+      remaining = deadline - time.time()
+      if remaining <= 0:
+        return False
+      time.sleep(min(self.interval, remaining))
+
+  def close(self):
+    pass
+
+
+class InotifyWatcher(object):
+
+  """
+  Detects changes of the files *paths* with `inotify`.
+
+  The directories of the files are watched (not the files themselves), so
+  files replaced by editors are still tracked.
+
+  Raises:
+
+    OSError: if `inotify` isn't available.
+
+  """
+
+  def __init__(self, paths):
+    libc = _load_libc()
+    self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if self.fd < 0:
+      raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    self._names = {}
+    try:
+      for path in paths:
+        directory, name = os.path.split(os.path.abspath(path))
+        wd = libc.inotify_add_watch(
+          self.fd, directory.encode('utf-8'), IN_MASK
+        )
+        if wd < 0:
+          msg = "can't watch {}".format(directory)
+          raise OSError(ctypes.get_errno(), msg)
+        self._names.setdefault(wd, set()).add(name.encode('utf-8'))
+    except OSError:
+      os.close(self.fd)
+      raise
+
+  def _read_events(self):
+    """
+    Returns `True` if any of the pending events concerns the files.
+
+    """
+    changed = False
+    while True:
+      try:
+        data = os.read(self.fd, 64 * 1024)
+      except OSError as err:
+        if err.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+          return changed
+        raise
+      offset = 0
+      while offset < len(data):
+        wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+        offset += EVENT_HEADER.size
+        name = data[offset:offset + length].rstrip(b'\0')
+        offset += length
+        if name in self._names.get(wd, ()):
+          changed = True
+
+  def wait(self, timeout=None):
+    """
+    Waits until a file changes or *timeout* seconds have passed (forever
+    if it's `None`).
+
+    Returns `True` if a file changed.
+
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+      remaining = None if deadline is None else deadline - time.time()
+      if remaining is not None and remaining <= 0:
+        return False
+      readable, _, _ = select.select([self.fd], [], [], remaining)
+      if readable and self._read_events():
+        return True
+
+  def close(self):
+    os.close(self.fd)
+
+
+def _load_libc():
+  """
+  Returns the C library, if it supports `inotify`.
+
+  Raises:
+
+    OSError: if it doesn't.
+
+  """
+  libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+  if not hasattr(libc, 'inotify_init1'):
+    raise OSError(errno.ENOSYS, "inotify is not available")
+  return libc
+
+
+def make_watcher(paths, interval=POLL_INTERVAL):
+  """
+  Returns an :cls:`InotifyWatcher` for *paths* if possible, else a
+  :cls:`PollingWatcher` (checking every *interval* seconds).
+
+  """
+  try:
+    return InotifyWatcher(paths)
+  except (OSError, AttributeError, TypeError):
+    return PollingWatcher(paths, interval)
+
+
+def iter_changes(paths, debounce=DEBOUNCE, watcher=None):
+  """
+  Yields each time the files *paths* changed.
+
+  A change is only reported once there were no further changes for
+  *debounce* seconds.
+
+  """
+  if watcher is None:
+    watcher = make_watcher(paths)
+  try:
+    while True:
+      watcher.wait()
+      while watcher.wait(debounce):
+        pass
+      yield
+  finally:
+    watcher.close()
+
+
+def _iter_spans(opcodes):
+  """
+  Yields each unchanged paragraph and each block of changed ones from the
+  *opcodes* of the paragraph alignment, as `(equal, i1, i2, j1, j2)`.
+
+  """
+  for tag, i1, i2, j1, j2 in opcodes:
+    if tag != 'equal':
+      yield False, i1, i2, j1, j2
+      continue
+    for offset in range(i2 - i1):
+      i, j = i1 + offset, j1 + offset
+      yield True, i, i + 1, j, j + 1
+
+
+class ParagraphCache(object):
+
+  """
+  Diffs two files paragraph by paragraph and keeps the results of the last
+  run, so the next one only diffs and wraps the paragraphs which changed.
+
+  The paragraphs are aligned by their hashes, like in :mod:`chunked` (and
+  the results are the same as from :func:`chunked.iter_chunked_wdiff`).
+  Each unchanged paragraph and each block of changed ones is keyed by the
+  hashes of its paragraphs in both files.
+
+  The number of reused and newly diffed blocks of the last run are counted
+  in :attr:`hits` and :attr:`misses`.
+
+  """
+
+  def __init__(self, fold_tags=False, backend=BACKEND_WDIFF, wdiff_cmd=None):
+    self.fold_tags = fold_tags
+    self.backend = backend
+    self.wdiff_cmd = wdiff_cmd
+    self._blocks = {}
+    self.hits = 0
+    self.misses = 0
+
+  def _iter_blocks(self, org_file, new_file, hard_breaks, encoding):
+    """
+    Yields the blocks of the diff, wrapped in `<p>` tags unless
+    *hard_breaks* is `None`.
+
+    """
+    if self.backend == BACKEND_PYTHON:
+      wdiff_path = None
+    else:
+      wdiff_path = find_wdiff(self.wdiff_cmd)
+    org = _Paragraphs(read_input(transcode_input(org_file, encoding)))
+    new = _Paragraphs(read_input(transcode_input(new_file, encoding)))
+    blocks = {}
+    self.hits = self.misses = 0
+    opcodes = diff_tokens(org.hashes, new.hashes)
+    for equal, i1, i2, j1, j2 in _iter_spans(opcodes):
+      key = (
+        hard_breaks, tuple(org.hashes[i1:i2]), tuple(new.hashes[j1:j2])
+      )
+      block = self._blocks.get(key)
+      if block is None:
+        self.misses += 1
+        if equal:
+          block = new.join(j1, j2)
+        else:
+          block = _diff_block((
+            org.join(i1, i2), new.join(j1, j2), self.fold_tags, True,
+            self.backend, wdiff_path
+          ))
+        block = block.decode('utf-8')
+        if hard_breaks is not None:
+          block = wrap_paragraphs(block, hard_breaks)
+      else:
+        self.hits += 1
+      blocks[key] = block
+      yield block
+    self._blocks = blocks
+
+  def iter_wdiff(self, org_file, new_file, encoding=None):
+    """
+    Yields the diff of *org_file* and *new_file* (converted from
+    *encoding*, see :func:`inputs.transcode_input`) as chunks of text.
+
+    """
+    separator = ''
+    for block in self._iter_blocks(org_file, new_file, None, encoding):
+      if block:
+        yield separator + block
+        separator = '\n\n'
+
+  def iter_wrap(self, org_file, new_file, hard_breaks=False, encoding=None):
+    """
+    Yields the diff of *org_file* and *new_file* with its paragraphs wrapped
+    in `<p>` tags (like :func:`utils.iter_wrap_paragraphs`).
+
+    """
+    separator = ''
+    for block in self._iter_blocks(
+      org_file, new_file, hard_breaks, encoding
+    ):
+      if block:
+        yield separator + block
+        separator = '\n'
+
+  def iter_render(
+    self, settings, wrap_with_html=False, hard_breaks=False, template=None,
+    encoding=None
+  ):
+    """
+    Yields the diff of the files of *settings* as chunks of text, wrapped
+    in a HTML document if *wrap_with_html* is set (see
+    :func:`utils.iter_wrap_content`).
+
+    """
+    org_file, new_file = settings.org_file, settings.new_file
+    if not wrap_with_html:
+      return self.iter_wdiff(org_file, new_file, encoding)
+
+    def wrapper(chunks, hard_breaks):
+      return self.iter_wrap(org_file, new_file, hard_breaks, encoding)
+
+    return iter_wrap_content((), settings, hard_breaks, template, wrapper)